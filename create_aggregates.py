@@ -8,6 +8,7 @@ aggregates = Table(
     Column("ts", DateTime(timezone=True), primary_key=True),
     Column("symbol", String, primary_key=True),
     Column("avg_sentiment", Float),
+    Column("sentiment_strength", Float),
     Column("post_count", Integer),
     Column("open_price", Float),
     Column("close_price", Float),
@@ -1,24 +1,29 @@
 from src.storage import db as dbmod
-from sqlalchemy import text
+from sqlalchemy import inspect, text
 
-create_sql = """
+postgres = dbmod.engine.dialect.name == "postgresql"
+ts_type = "TIMESTAMP WITH TIME ZONE" if postgres else "TIMESTAMP"
+float_type = "DOUBLE PRECISION" if postgres else "REAL"
+
+create_sql = f"""
 CREATE TABLE IF NOT EXISTS aggregates (
-  ts TIMESTAMP,
+  ts {ts_type},
   symbol TEXT,
-  avg_sentiment REAL,
+  avg_sentiment {float_type},
+  sentiment_strength {float_type},
   post_count INTEGER,
-  open_price REAL,
-  close_price REAL,
-  high_price REAL,
-  low_price REAL,
-  volume REAL,
-  price_change_pct REAL,
+  open_price {float_type},
+  close_price {float_type},
+  high_price {float_type},
+  low_price {float_type},
+  volume {float_type},
+  price_change_pct {float_type},
   PRIMARY KEY (ts, symbol)
 );
 """
 
 with dbmod.engine.begin() as conn:
     conn.execute(text(create_sql))
-    # show tables now
-    res = conn.execute(text("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name;")).fetchall()
-    print("Tables in sqlite_master:", res)
+
+# show tables now
+print("Tables in database:", sorted(inspect(dbmod.engine).get_table_names()))
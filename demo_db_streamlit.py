@@ -4,12 +4,16 @@ import numpy as np
 from datetime import datetime, timezone
 import uuid
 
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from sqlalchemy import insert
-
 from src.storage import db as dbmod
+from src.processing.sentiment import score_texts
 from src.rag.retriever import retrieve_context
 from src.rag.generator import generate_answer
+from src.observability import readiness
+
+# load the embedding model / RAG index in the background while the page
+# renders (once per process; Streamlit reruns just find it running or done)
+if readiness.WARMUP:
+    readiness.warm_up()
 
 # ---------------------------------------------------
 # Page config
@@ -17,8 +21,6 @@ from src.rag.generator import generate_answer
 st.set_page_config(layout="wide", page_title="Crypto Sentiment Dashboard")
 st.title("🚀 Crypto Sentiment & Market Insight Dashboard")
 
-ANALYZER = SentimentIntensityAnalyzer()
-
 # ---------------------------------------------------
 # Sidebar
 # ---------------------------------------------------
@@ -43,17 +45,17 @@ SAMPLE_POSTS = [
 ]
 
 if st.sidebar.button("Seed Sample Reddit Posts"):
-    for _ in range(20):
-        txt = np.random.choice(SAMPLE_POSTS)
-        stmt = insert(dbmod.reddit_posts).values(
+    rows = []
+    texts = [str(np.random.choice(SAMPLE_POSTS)) for _ in range(20)]
+    for txt, sentiment in zip(texts, score_texts(texts)):
+        rows.append(dict(
             id=str(uuid.uuid4()),
             subreddit="CryptoCurrency",
             text=txt,
-            sentiment=ANALYZER.polarity_scores(txt)["compound"],
+            sentiment=sentiment,
             created_utc=datetime.now(timezone.utc)
-        )
-        with dbmod.engine.begin() as conn:
-            conn.execute(stmt)
+        ))
+    dbmod.upsert_reddit_posts_bulk(rows)
     st.sidebar.success("Sample posts inserted")
 
 # ---------------------------------------------------
@@ -5,35 +5,46 @@ import plotly.graph_objects as go
 from datetime import timezone
 from sqlalchemy import select
 from src.storage import db as dbmod
+from src.processing.rollups import RESOLUTION_MINUTES, get_bars, pick_resolution
 
 st.set_page_config(layout="wide", page_title="Crypto Candles + Sentiment")
 
 st.sidebar.title("Controls")
 SYMBOL = st.sidebar.selectbox("Symbol", ["BTC-USD", "ETH-USD", "USDT-USD"])
-minutes = st.sidebar.slider("Minutes (display)", min_value=15, max_value=720, value=120, step=15)
+HISTORY = {
+    "15 minutes": 15, "1 hour": 60, "2 hours": 120, "6 hours": 360, "12 hours": 720,
+    "1 day": 1440, "3 days": 4320, "1 week": 10080, "2 weeks": 20160, "4 weeks": 40320,
+}
+history = st.sidebar.selectbox("History", list(HISTORY), index=2)
+minutes = HISTORY[history]
+resolution = st.sidebar.selectbox("Resolution", ["auto"] + list(RESOLUTION_MINUTES))
+if resolution == "auto":
+    resolution = pick_resolution(minutes)
 refresh = st.sidebar.button("Refresh now")
 amount = st.sidebar.number_input("Enter amount (USD) to compute units", value=2300.00, step=10.0, format="%.2f")
 
 st.title("Crypto — Candles & Sentiment")
 
-def load_aggregates(symbol: str, minutes_display: int) -> pd.DataFrame:
+def load_aggregates(symbol: str, minutes_display: int, resolution: str = "1m") -> pd.DataFrame:
     """
-    Load recent aggregate rows for `symbol`.
-    Prefer the project's helper; if that fails, query aggregates table directly.
+    Load aggregate bars for `symbol` covering the last `minutes_display` minutes
+    at `resolution` (1m bars or a 5m/15m/1h/1d rollup).
+    Prefer the rollups helper; if that fails, query aggregates table directly.
     Returns a DataFrame with parsed datetimes and numeric columns when possible.
     """
+    n_bars = -(-minutes_display // RESOLUTION_MINUTES[resolution])
     try:
-        # prefer helper if available (returns sequence of dict-like rows)
-        rows = dbmod.get_recent_aggregates(symbol, limit=minutes_display)
+        rows = get_bars(symbol, resolution, limit=n_bars)
         df = pd.DataFrame(rows) if rows else pd.DataFrame()
     except Exception:
         # fallback direct select
         try:
-            with dbmod.engine.connect() as conn:
-                agg = dbmod.metadata.tables.get("aggregates")
+            with dbmod.read_engine.connect() as conn:
+                name = "aggregates" if resolution == "1m" else f"aggregates_{resolution}"
+                agg = dbmod.metadata.tables.get(name)
                 if agg is None:
                     return pd.DataFrame()
-                q = select(agg).where(agg.c.symbol == symbol).order_by(agg.c.ts.desc()).limit(minutes_display)
+                q = select(agg).where(agg.c.symbol == symbol).order_by(agg.c.ts.desc()).limit(n_bars)
                 rows = conn.execute(q).all()
             df = pd.DataFrame([dict(r._mapping) for r in rows]) if rows else pd.DataFrame()
         except Exception:
@@ -64,7 +75,7 @@ def load_aggregates(symbol: str, minutes_display: int) -> pd.DataFrame:
 if refresh:
     st.experimental_rerun()
 
-df = load_aggregates(SYMBOL, minutes)
+df = load_aggregates(SYMBOL, minutes, resolution)
 
 if df.empty:
     st.info("No aggregate rows found for this symbol yet. Ensure ingestion + aggregator are running, then click Refresh.")
@@ -145,5 +156,5 @@ else:
         present = [c for c in tail_cols if c in df.columns]
         st.dataframe(df[present].tail(30).reset_index(drop=True))
 
-        st.caption("Candlesticks use 1-minute aggregates. If candles look sparse, increase Minutes or ensure the aggregator is running and creating rows.")
+        st.caption(f"Candlesticks use {resolution} aggregates. If candles look sparse, increase History or ensure the aggregator is running and creating rows.")
 
@@ -1,13 +1,35 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 
 from src.api.market import router as market_router
 from src.api.investment import router as investment_router
 from src.api.chat import router as chat_router
+from src.api.admin import router as admin_router
+from src.observability import metrics, readiness, tracing
+
+# imported by the warm-up thread rather than at app import (faiss, torch)
+WARMUP_MODULES = ["src.rag.retriever"]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the routers only register their heavy parts (schema, reflected tables,
+    # embedding model, RAG index); import / load them in the background so
+    # market data is served at once
+    if readiness.WARMUP:
+        readiness.warm_up(modules=WARMUP_MODULES)
+    yield
+
 
 app = FastAPI(
     title="Crypto Sentiment Backend API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -18,10 +40,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+HTTP_SECONDS = metrics.histogram(
+    "http_request_seconds", "API request latency", ["method", "route", "status"]
+)
+
+
+def _route_template(request: Request) -> str:
+    """Matched route template incl. router prefix (/api/market/{symbol}), not the raw path."""
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = request.scope.get("path", "")
+    try:
+        concrete = route.path_format.format(**request.scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return route.path
+    # routes of included routers may carry only their own part of the path
+    return path[: len(path) - len(concrete)] + route.path if path.endswith(concrete) else route.path
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    t0 = time.perf_counter()
+    # root span of the request; X-Trace: 1 bypasses sampling while tracing is on
+    with tracing.span("http", force=request.headers.get("x-trace") == "1") as sp:
+        response = await call_next(request)
+        route = _route_template(request)
+        sp.set(status=response.status_code)
+        if isinstance(sp, tracing.Span):
+            sp.name = f"{request.method} {route}"
+    HTTP_SECONDS.labels(request.method, route, response.status_code).observe(time.perf_counter() - t0)
+    return response
+
+
 app.include_router(market_router, prefix="/api/market")
 app.include_router(investment_router, prefix="/api/investment")
 app.include_router(chat_router, prefix="/api/chat")
+app.include_router(admin_router, prefix="/admin")
 
 @app.get("/")
 def root():
     return {"status": "ok"}
+
+@app.get("/ready")
+def ready(response: Response, component: Optional[List[str]] = Query(default=None)):
+    """503 until every warm-up component (or each `component` given) is loaded."""
+    status = readiness.status(component)
+    if not status["ready"]:
+        response.status_code = 503
+    return status
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
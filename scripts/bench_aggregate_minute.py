@@ -0,0 +1,108 @@
+# bench_aggregate_minute.py
+"""
+Benchmark the bar computation inside aggregate_minute: the old per-symbol
+filter/sort loop vs. the single-groupby compute_bars with the precompiled
+keyword matcher, for 10 / 100 / 1000 symbols (no database involved).
+
+Run:
+python scripts/bench_aggregate_minute.py
+python scripts/bench_aggregate_minute.py --symbols 10 100 1000 --ticks-per-symbol 60 --posts 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.processing import aggregator as agg
+
+
+def make_data(n_symbols, ticks_per_symbol, n_posts):
+    start = datetime(2024, 1, 1)
+    symbols = [f"S{i:04d}-USD" for i in range(n_symbols)]
+    keywords = {s: [s.split("-")[0].lower(), f"coin{i:04d}"] for i, s in enumerate(symbols)}
+    ticks = pd.DataFrame({
+        "symbol": [s for s in symbols for _ in range(ticks_per_symbol)],
+        "price": [random.uniform(1, 100) for _ in range(n_symbols * ticks_per_symbol)],
+        "volume": [random.random() for _ in range(n_symbols * ticks_per_symbol)],
+        # distinct timestamps so open/close do not depend on sort stability
+        "ts": [start + timedelta(microseconds=t)
+               for t in random.sample(range(60_000_000), n_symbols * ticks_per_symbol)],
+    }).sample(frac=1.0, random_state=0).reset_index(drop=True)
+    words = ["moon", "dump", "hodl", "rekt", "bullish", "bearish", "today"]
+    texts = []
+    for _ in range(n_posts):
+        parts = random.choices(words, k=12)
+        for s in random.sample(symbols, k=min(2, n_symbols)):
+            parts.insert(random.randrange(len(parts)), random.choice(keywords[s]).upper())
+        texts.append(" ".join(parts))
+    posts = pd.DataFrame({"text": texts, "sentiment": [random.uniform(-1, 1) for _ in texts]})
+    return start, ticks, posts, keywords
+
+
+def legacy(df_ticks, df_posts, keywords):
+    rows = []
+    for sym in df_ticks["symbol"].unique():
+        d = df_ticks[df_ticks["symbol"] == sym].sort_values("ts")
+        open_p = float(d.iloc[0]["price"])
+        close_p = float(d.iloc[-1]["price"])
+        high_p = float(d["price"].max())
+        low_p = float(d["price"].min())
+        volume = float(d["volume"].fillna(0).sum())
+        kws = keywords.get(sym, [])
+        text = df_posts["text"].astype(str).str.lower()
+        mask = text.apply(lambda t: any(k in t for k in kws))
+        df_sym = df_posts[mask]
+        s = df_sym["sentiment"] if not df_sym.empty else df_posts["sentiment"]
+        rows.append((sym, open_p, close_p, high_p, low_p, volume, float(s.mean()), len(s)))
+    return rows
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, nargs="+", default=[10, 100, 1000])
+    ap.add_argument("--ticks-per-symbol", type=int, default=60)
+    ap.add_argument("--posts", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'symbols':>8} {'legacy ms':>12} {'vectorized ms':>14} {'speedup':>8}")
+    for n in args.symbols:
+        random.seed(n)
+        start, ticks, posts, keywords = make_data(n, args.ticks_per_symbol, args.posts)
+        matcher = agg.KeywordMatcher(keywords)
+
+        repeat = 1 if n >= 1000 else args.repeat
+        old_rows = []
+        t_old = timeit(lambda: old_rows.__setitem__(slice(None), legacy(ticks, posts, keywords)), repeat)
+
+        # same bars either way
+        new = {r["symbol"]: r for r in agg.compute_bars(ticks, posts, start, matcher=matcher)}
+        for sym, o, c, h, l, v, avg, cnt in old_rows:
+            r = new[sym]
+            assert (r["open_price"], r["close_price"], r["high_price"], r["low_price"]) == (o, c, h, l)
+            assert r["post_count"] == cnt and abs(r["avg_sentiment"] - avg) < 1e-9
+
+        t_new = timeit(lambda: agg.compute_bars(ticks, posts, start, matcher=matcher), args.repeat)
+        print(f"{n:>8} {t_old * 1000:>12.1f} {t_new * 1000:>14.1f} {t_old / t_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
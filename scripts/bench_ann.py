@@ -0,0 +1,156 @@
+# bench_ann.py
+"""
+Recall / latency / memory of the RAG index kinds in src.rag.ann on a
+synthetic corpus, plus the metadata store (pickle vs SQLite side store).
+
+The corpus is a Gaussian mixture in 384-d (sentence embeddings cluster by
+topic; uniform random vectors would make every ANN index look bad).
+Queries come from the same mixture. Ground truth is the exact flat search.
+QPS is single-query, single-thread, the way the API searches.
+
+Run:
+python scripts/bench_ann.py
+python scripts/bench_ann.py --n 200000 --queries 1000 -k 10
+"""
+
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag import ann
+from src.rag.docstore import DocStore
+
+DIM = 384
+
+
+def make_corpus(n, nq, clusters, rnd):
+    centers = rnd.standard_normal((clusters, DIM)).astype("float32") * 4
+    def sample(m):
+        return (centers[rnd.integers(0, clusters, m)] + rnd.standard_normal((m, DIM))).astype("float32")
+    return sample(n), sample(nq)
+
+
+def recall(found, truth, k):
+    return float(np.mean([len(set(f[:k]) & set(t[:k])) / k for f, t in zip(found, truth)]))
+
+
+def run_queries(index, queries, k):
+    out = np.empty((len(queries), k), dtype="int64")
+    t0 = time.perf_counter()
+    for j in range(len(queries)):
+        _, I = index.search(queries[j:j + 1], k)
+        out[j] = I[0]
+    return out, len(queries) / (time.perf_counter() - t0)
+
+
+def bench_indexes(xb, xq, k, args):
+    ids = np.arange(len(xb), dtype="int64") * 7919 + 1  # arbitrary ids, as in the indexer
+    truth = None
+    configs = [
+        ("flat", "flat", {}, [None]),
+        ("ivf_flat", "ivf_flat", {"nlist": args.nlist}, [1, 4, 16, 64]),
+        (f"ivf_pq{args.pq_m}", "ivf_pq", {"nlist": args.nlist, "pq_m": args.pq_m}, [4, 16, 64]),
+        (f"ivf_pq{args.pq_m * 2}", "ivf_pq", {"nlist": args.nlist, "pq_m": args.pq_m * 2}, [16]),
+        (f"hnsw{args.hnsw_m}", "hnsw", {"hnsw_m": args.hnsw_m}, [16, 64, 256]),
+    ]
+    print(f"{'index':<10} {'param':<12} {'build s':>8} {'MB':>8} {'recall@' + str(k):>10} {'QPS':>9}")
+    for name, kind, params, knobs in configs:
+        params = {p: v for p, v in params.items() if v}
+        t0 = time.perf_counter()
+        index = ann.build(kind, xb, ids, **params)
+        build_s = time.perf_counter() - t0
+        mb = ann.memory_bytes(index) / 1e6
+        for knob in knobs:
+            if kind.startswith("ivf"):
+                ann.set_search_params(index, nprobe=knob)
+                label = f"nprobe={knob}"
+            elif kind == "hnsw":
+                ann.set_search_params(index, ef_search=knob)
+                label = f"efSearch={knob}"
+            else:
+                label = "exact"
+            found, qps = run_queries(index, xq, k)
+            if truth is None:
+                truth = found
+            print(f"{name:<10} {label:<12} {build_s:8.1f} {mb:8.1f} {recall(found, truth, k):10.3f} {qps:9.0f}")
+        del index
+
+
+def bench_metadata(n, rnd):
+    words = np.array("bitcoin eth moon dump hodl bullish bearish whales buy sell dip rally fud".split())
+    docs = {int(i): {"id": f"post:{i}", "text": " ".join(rnd.choice(words, 40)),
+                     "metadata": {"source": "reddit", "symbol": "BTC", "symbols": ["BTC"], "ts": float(i)}}
+            for i in range(n)}
+    tmp = tempfile.mkdtemp()
+    pkl = os.path.join(tmp, "meta.pkl")
+    with open(pkl, "wb") as f:
+        pickle.dump(docs, f, protocol=pickle.HIGHEST_PROTOCOL)
+    work = DocStore(os.path.join(tmp, "work.sqlite"), writable=True)
+    work.put_many(docs)
+    work.backup_to(os.path.join(tmp, "docs.sqlite"))
+    del docs
+
+    t0 = time.perf_counter()
+    with open(pkl, "rb") as f:
+        loaded = pickle.load(f)
+    pkl_open = time.perf_counter() - t0
+    tracemalloc.start()
+    with open(pkl, "rb") as f:
+        again = pickle.load(f)
+    pkl_mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del again
+
+    lookups = [rnd.integers(0, n, 5) for _ in range(2000)]
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    store = DocStore(os.path.join(tmp, "docs.sqlite"))
+    len(store)
+    db_open = time.perf_counter() - t0
+    for ids in lookups[:100]:
+        store.get_many(ids)
+    db_mem = tracemalloc.get_traced_memory()[0]  # SQLite's own page cache / mmap is not counted
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    for ids in lookups:
+        store.get_many(ids)
+    db_get = (time.perf_counter() - t0) / len(lookups)
+
+    t0 = time.perf_counter()
+    for ids in lookups:
+        [loaded[int(i)] for i in ids]
+    pkl_get = (time.perf_counter() - t0) / len(lookups)
+
+    print(f"\nmetadata, {n} docs (k=5 lookups)")
+    print(f"pickle  file {os.path.getsize(pkl) / 1e6:7.1f} MB  load {pkl_open:6.2f} s  "
+          f"heap {pkl_mem / 1e6:7.1f} MB  get {pkl_get * 1e6:6.1f} us")
+    print(f"sqlite  file {os.path.getsize(os.path.join(tmp, 'docs.sqlite')) / 1e6:7.1f} MB  open {db_open:6.2f} s  "
+          f"heap {db_mem / 1e6:7.1f} MB  get {db_get * 1e6:6.1f} us")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=50000)
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("-k", type=int, default=10)
+    ap.add_argument("--clusters", type=int, default=200)
+    ap.add_argument("--nlist", type=int, default=0, help="0 = 4*sqrt(n)")
+    ap.add_argument("--pq-m", type=int, default=ann.PQ_M)
+    ap.add_argument("--hnsw-m", type=int, default=ann.HNSW_M)
+    args = ap.parse_args()
+
+    faiss.omp_set_num_threads(1)
+    rnd = np.random.default_rng(0)
+    xb, xq = make_corpus(args.n, args.queries, args.clusters, rnd)
+    print(f"[bench] {args.n} x {DIM} vectors, {args.queries} queries, k={args.k}\n")
+    bench_indexes(xb, xq, args.k, args)
+    bench_metadata(args.n, rnd)
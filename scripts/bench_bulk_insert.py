@@ -0,0 +1,116 @@
+# bench_bulk_insert.py
+"""
+Rows/sec for the per-row write path (insert_ticker / insert_reddit_post,
+one transaction per row, duplicates raise) against insert_tickers_bulk /
+upsert_reddit_posts_bulk (chunked executemany with ON CONFLICT).
+
+The post runs include a re-insert of already stored posts, the common
+case for a poller re-fetching /new. Uses a throwaway SQLite file unless
+DATABASE_URL is set.
+
+Run:
+python scripts/bench_bulk_insert.py
+python scripts/bench_bulk_insert.py --ticks 200000 --posts 50000 --chunk 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bulk.db')}"
+
+from sqlalchemy import delete, func, select
+
+from src.storage import db as dbmod
+
+
+def make_ticks(n):
+    t = datetime(2024, 1, 1)
+    return [dict(symbol=random.choice(["BTC-USD", "ETH-USD"]), price=random.uniform(1, 100),
+                 volume=random.random(), ts=t + timedelta(milliseconds=i)) for i in range(n)]
+
+
+def make_posts(n, prefix):
+    t = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [dict(id=f"t3_{prefix}{i}", subreddit="CryptoCurrency", text=f"btc post {i}",
+                 sentiment=random.uniform(-1, 1), created_utc=t + timedelta(seconds=i)) for i in range(n)]
+
+
+def reset():
+    dbmod.ensure_schema()  # tables are created on first use, not at import
+    with dbmod.engine.begin() as conn:
+        conn.execute(delete(dbmod.tickers))
+        conn.execute(delete(dbmod.reddit_posts))
+
+
+def count(table):
+    with dbmod.read_engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table)).scalar()
+
+
+def timed(label, n, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    secs = time.perf_counter() - t0
+    print(f"{label:<44} {n:>8} rows {secs:>8.2f}s {n / secs:>12,.0f} rows/s  {out if out is not None else ''}")
+    return n / secs
+
+
+def per_row_posts(rows):
+    ok = dup = 0
+    for r in rows:
+        try:
+            dbmod.insert_reddit_post(r["id"], r["subreddit"], r["text"], r["sentiment"], r["created_utc"])
+            ok += 1
+        except Exception:
+            dup += 1
+    return {"inserted": ok, "skipped": dup}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ticks", type=int, default=100_000)
+    ap.add_argument("--posts", type=int, default=20_000)
+    ap.add_argument("--per-row-limit", type=int, default=5_000,
+                    help="rows used for the (slow) per-row path")
+    ap.add_argument("--chunk", type=int, default=dbmod.BULK_CHUNK)
+    args = ap.parse_args()
+
+    print(f"[bench] database: {dbmod.engine.url}\n")
+    reset()
+
+    ticks = make_ticks(args.per_row_limit)
+    row_rate = timed("ticks   per-row insert_ticker", len(ticks), lambda: [
+        dbmod.insert_ticker(r["symbol"], r["price"], r["volume"], r["ts"]) for r in ticks] and None)
+    reset()
+    ticks = make_ticks(args.ticks)
+    bulk_rate = timed("ticks   insert_tickers_bulk", len(ticks),
+                      lambda: dbmod.insert_tickers_bulk(ticks, chunk_size=args.chunk))
+    assert count(dbmod.tickers) == len(ticks)
+    print(f"{'':<44} -> {bulk_rate / row_rate:.0f}x\n")
+
+    reset()
+    posts = make_posts(args.per_row_limit, "a")
+    timed("posts   per-row insert_reddit_post (new)", len(posts), lambda: per_row_posts(posts))
+    row_rate = timed("posts   per-row insert_reddit_post (dupes)", len(posts), lambda: per_row_posts(posts))
+    reset()
+    posts = make_posts(args.posts, "b")
+    timed("posts   upsert_reddit_posts_bulk (new)", len(posts),
+          lambda: dbmod.upsert_reddit_posts_bulk(posts, chunk_size=args.chunk))
+    bulk_rate = timed("posts   upsert_reddit_posts_bulk (dupes)", len(posts),
+                      lambda: dbmod.upsert_reddit_posts_bulk(posts, chunk_size=args.chunk))
+    timed("posts   upsert_reddit_posts_bulk (update)", len(posts),
+          lambda: dbmod.upsert_reddit_posts_bulk(posts, update=True, chunk_size=args.chunk))
+    assert count(dbmod.reddit_posts) == len(posts)
+    print(f"{'':<44} -> {bulk_rate / row_rate:.0f}x on re-fetched posts")
+
+
+if __name__ == "__main__":
+    main()
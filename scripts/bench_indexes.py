@@ -0,0 +1,222 @@
+# bench_indexes.py
+"""
+Query plans and timings for the hot tickers / reddit_posts / aggregates
+scans, without and with the managed indexes (src.storage.migrations).
+
+Builds a synthetic database (10M ticks by default) in a throwaway SQLite
+file unless --db or DATABASE_URL is given; an existing populated database
+is reused as-is. Managed indexes are dropped for the "before" pass and
+re-created with ensure_indexes for the "after" pass; the pre-existing
+single-column symbol/subreddit indexes stay in place for both.
+
+Run:
+python scripts/bench_indexes.py
+python scripts/bench_indexes.py --ticks 1000000 --symbols 20
+python scripts/bench_indexes.py --db /tmp/bench.db --keep
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+START = datetime(2024, 1, 1)
+SQLITE_TS = "%Y-%m-%d %H:%M:%S.%f"  # SQLAlchemy's SQLite DateTime storage format
+CHUNK = 200_000
+# indexes the schema had before the managed set; kept for the "before" pass
+BASELINE_INDEXES = {"ix_tickers_symbol", "ix_reddit_posts_subreddit"}
+
+
+def _ts(dt, sqlite):
+    return dt.strftime(SQLITE_TS) if sqlite else dt
+
+
+def populate(n_ticks, n_symbols, n_posts):
+    from sqlalchemy import func, insert, select
+    from src.storage import db as dbmod
+    from src.processing import aggregator as agg
+
+    agg.ensure_schema()
+    with dbmod.engine.connect() as conn:
+        have = conn.execute(select(func.count()).select_from(dbmod.tickers)).scalar()
+    if have:
+        print(f"[bench] reusing database with {have:,} ticks")
+        return
+
+    sqlite = dbmod.engine.dialect.name == "sqlite"
+    symbols = [f"S{i:03d}-USD" for i in range(n_symbols)]
+    step_us = 5_000_000 // n_symbols  # ~one tick per symbol every 5s
+    span = timedelta(microseconds=step_us * n_ticks)
+    print(f"[bench] generating {n_ticks:,} ticks over {span}, {n_symbols} symbols, {n_posts:,} posts")
+
+    t0 = time.perf_counter()
+    prices = [random.uniform(1, 50_000) for _ in symbols]
+    with dbmod.engine.begin() as conn:
+        for lo in range(0, n_ticks, CHUNK):
+            rows = []
+            for i in range(lo, min(lo + CHUNK, n_ticks)):
+                s = i % n_symbols
+                prices[s] *= 1 + random.gauss(0, 0.0005)
+                ts = _ts(START + timedelta(microseconds=i * step_us), sqlite)
+                rows.append((symbols[s], prices[s], random.random(), ts))
+            if sqlite:
+                conn.exec_driver_sql(
+                    "INSERT INTO tickers (symbol, price, volume, ts) VALUES (?, ?, ?, ?)", rows
+                )
+            else:
+                conn.execute(insert(dbmod.tickers), [
+                    dict(symbol=r[0], price=r[1], volume=r[2], ts=r[3]) for r in rows
+                ])
+
+        posts = []
+        for i in range(n_posts):
+            created = START + timedelta(seconds=random.uniform(0, span.total_seconds()))
+            posts.append(dict(id=f"t3_{i}", subreddit="CryptoCurrency",
+                              text=f"{random.choice(symbols).lower()} post {i}",
+                              sentiment=random.uniform(-1, 1), created_utc=created))
+        for lo in range(0, n_posts, CHUNK):
+            conn.execute(insert(dbmod.reddit_posts), posts[lo:lo + CHUNK])
+
+        minutes = int(span.total_seconds() // 60)
+        bars = []
+        for m in range(minutes):
+            ts = START + timedelta(minutes=m)
+            for sym in symbols:
+                bars.append(dict(ts=ts, symbol=sym, avg_sentiment=0.0, sentiment_strength=0.0,
+                                 post_count=0, open_price=1.0, close_price=1.0, high_price=1.0,
+                                 low_price=1.0, volume=1.0, price_change_pct=0.0))
+            if len(bars) >= CHUNK:
+                conn.execute(insert(agg.aggregates), bars)
+                bars = []
+        if bars:
+            conn.execute(insert(agg.aggregates), bars)
+    print(f"[bench] populated in {time.perf_counter() - t0:.1f}s")
+
+
+def queries(n_ticks, n_symbols):
+    """name -> (SQL, params); each mirrors a query in the codebase."""
+    step_us = 5_000_000 // n_symbols
+    mid = START + timedelta(microseconds=step_us * n_ticks // 2)
+    minute = mid.replace(second=0, microsecond=0)
+    return {
+        "aggregate_minute ticks": (
+            "SELECT * FROM tickers WHERE ts >= :start AND ts < :end",
+            {"start": minute, "end": minute + timedelta(minutes=1)},
+        ),
+        "get_latest_ticker_time": (
+            "SELECT ts FROM tickers ORDER BY ts DESC LIMIT 1", {},
+        ),
+        "get_recent_aggregates": (
+            "SELECT * FROM tickers WHERE symbol = :symbol ORDER BY ts DESC LIMIT 200",
+            {"symbol": "S001-USD"},
+        ),
+        "_fetch_posts_window": (
+            "SELECT * FROM reddit_posts WHERE created_utc >= :start AND created_utc < :end",
+            {"start": minute, "end": minute + timedelta(minutes=1)},
+        ),
+        "market api bars": (
+            "SELECT * FROM aggregates WHERE symbol = :symbol ORDER BY ts DESC LIMIT 120",
+            {"symbol": "S001-USD"},
+        ),
+    }
+
+
+def _stmt(sql, params, prefix=""):
+    from sqlalchemy import DateTime, bindparam, text
+
+    binds = [bindparam(k, type_=DateTime(timezone=True)) for k, v in params.items()
+             if isinstance(v, datetime)]
+    return text(prefix + sql).bindparams(*binds)
+
+
+def explain(conn, sql, params):
+    if conn.engine.dialect.name == "sqlite":
+        rows = conn.execute(_stmt(sql, params, "EXPLAIN QUERY PLAN "), params).all()
+        return [r[-1] for r in rows]
+    return [r[0] for r in conn.execute(_stmt(sql, params, "EXPLAIN "), params).all()]
+
+
+def timed(conn, sql, params, repeat):
+    stmt = _stmt(sql, params)
+    times = []
+    n = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = len(conn.execute(stmt, params).all())
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), n
+
+
+def run_pass(label, qs, repeat):
+    from src.storage import db as dbmod
+
+    print(f"\n=== {label} ===")
+    out = {}
+    with dbmod.engine.connect() as conn:
+        for name, (sql, params) in qs.items():
+            plan = explain(conn, sql, params)
+            secs, n = timed(conn, sql, params, repeat)
+            out[name] = secs
+            print(f"{name:<24} {secs * 1000:>10.2f} ms  ({n} rows)")
+            for line in plan:
+                print(f"    {line}")
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ticks", type=int, default=10_000_000)
+    ap.add_argument("--symbols", type=int, default=50)
+    ap.add_argument("--posts", type=int, default=200_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--db", help="SQLite file to build/reuse (default: temp file)")
+    ap.add_argument("--keep", action="store_true", help="leave the temp database in place")
+    args = ap.parse_args()
+
+    tmp = None
+    if args.db:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    elif "DATABASE_URL" not in os.environ:
+        tmp = os.path.join(tempfile.mkdtemp(), "bench_indexes.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}"
+
+    from sqlalchemy import text
+    from src.storage import db as dbmod
+    from src.storage import migrations
+
+    print(f"[bench] database: {dbmod.engine.url}")
+    populate(args.ticks, args.symbols, args.posts)
+
+    managed = [ix for t in migrations.managed_tables() for ix in t.indexes
+               if ix.name not in BASELINE_INDEXES]
+    with dbmod.engine.begin() as conn:
+        for ix in managed:
+            ix.drop(conn, checkfirst=True)
+        conn.execute(text("ANALYZE"))
+
+    qs = queries(args.ticks, args.symbols)
+    before = run_pass("without managed indexes", qs, args.repeat)
+
+    t0 = time.perf_counter()
+    created = migrations.ensure_indexes()
+    print(f"\n[bench] migration created {len(created)} indexes in {time.perf_counter() - t0:.1f}s")
+    after = run_pass("with managed indexes", qs, args.repeat)
+
+    print("\nquery                      before ms     after ms   speedup")
+    for name in qs:
+        b, a = before[name] * 1000, after[name] * 1000
+        print(f"{name:<24} {b:>11.2f} {a:>12.2f} {b / a if a else float('inf'):>8.1f}x")
+
+    if tmp and not args.keep:
+        dbmod.engine.dispose()
+        os.remove(tmp)
+
+
+if __name__ == "__main__":
+    main()
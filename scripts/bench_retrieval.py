@@ -0,0 +1,83 @@
+# bench_retrieval.py
+"""
+Symbol-filtered retrieval on synthetic corpora of growing size: the old
+global top-k + post-filter against src.rag.retriever.search_snapshot
+(per-symbol partitions, recency window, adaptive over-fetch).
+
+Symbols are skewed (BTC ~50% of documents, the rarest well under 5%), and
+timestamps spread over a week. Reported per corpus size and symbol: docs
+returned out of k and mean latency per query. Partition build time is
+what a snapshot swap pays once, off the request path.
+
+Run:
+python scripts/bench_retrieval.py
+python scripts/bench_retrieval.py --sizes 10000,100000 --queries 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.rag import retriever
+from src.rag.docstore import DocStore
+
+DIM = 384
+SYMBOLS = ["BTC", "ETH", "SOL", "XRP", "ADA", "DOGE", "LTC", "DOT"]
+WEIGHTS = np.array([50, 20, 10, 8, 5, 4, 2, 1], dtype=float)
+
+
+def make_snapshot(n, rnd):
+    vecs = rnd.standard_normal((n, DIM)).astype("float32")
+    ids = np.arange(1, n + 1, dtype="int64") * 7919
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(DIM))
+    index.add_with_ids(vecs, ids)
+    syms = rnd.choice(SYMBOLS, size=n, p=WEIGHTS / WEIGHTS.sum())
+    now = time.time()
+    ts = now - rnd.uniform(0, 7 * 86400, size=n)
+    docs = {int(i): {"id": str(i), "text": f"doc {i}",
+                     "metadata": {"symbol": str(s), "symbols": [str(s)], "ts": float(t)}}
+            for i, s, t in zip(ids, syms, ts)}
+    store = DocStore.in_memory(docs)
+    t0 = time.perf_counter()
+    snap = retriever.Snapshot(index, store, "bench")
+    return snap, time.perf_counter() - t0, now
+
+
+def legacy(snap, q, k, symbol):
+    _, I = snap.index.search(q, k)
+    return [snap.doc(i) for i in I[0] if i >= 0 and snap.doc(i)["metadata"]["symbol"] == symbol]
+
+
+def timed(fn, queries):
+    got = 0
+    t0 = time.perf_counter()
+    for q in queries:
+        got += len(fn(q))
+    return got / len(queries), (time.perf_counter() - t0) / len(queries) * 1000
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,50000,200000")
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("-k", type=int, default=5)
+    args = ap.parse_args()
+
+    rnd = np.random.default_rng(0)
+    queries = [rnd.standard_normal((1, DIM)).astype("float32") for _ in range(args.queries)]
+    k = args.k
+    for n in (int(s) for s in args.sizes.split(",")):
+        snap, build_s, now = make_snapshot(n, rnd)
+        since = now - 24 * 3600
+        print(f"[bench] {n} docs, partitions built in {build_s * 1000:.0f} ms")
+        for sym in ("BTC", "SOL", "DOT"):
+            old_n, old_ms = timed(lambda q: legacy(snap, q, k, sym), queries)
+            new_n, new_ms = timed(lambda q: retriever.search_snapshot(snap, q, k, sym, since), queries)
+            print(f"[bench]   {sym:<4} post-filter {old_n:4.1f}/{k} docs {old_ms:7.2f} ms   "
+                  f"prefiltered {new_n:4.1f}/{k} docs {new_ms:7.2f} ms")
@@ -0,0 +1,101 @@
+# bench_sentiment.py
+"""
+Posts/sec for sentiment scoring: the per-post loop the ingester used
+(four re.sub passes + polarity_scores per post) against score_texts,
+in-process and over the process pool with a cold cache, then with the
+score cache warm in memory and loaded from the on-disk tier after a
+"restart".
+
+Posts are synthetic Reddit-like titles + bodies; --dup-ratio of them
+repeat an earlier post (reposts, bot comments, crossposts).
+
+Run:
+python scripts/bench_sentiment.py
+python scripts/bench_sentiment.py --posts 100000 --dup-ratio 0.2 --workers 4
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.processing import sentiment, sentiment_cache
+
+WORDS = ("bitcoin btc eth ethereum moon dump pump hodl rekt bullish bearish whales sell buy "
+         "dip crash rally great terrible amazing scam fud love hate fear greed today tomorrow "
+         "fees staking etf sec halving support resistance breakout rug exit liquidity").split()
+
+
+def make_posts(n, dup_ratio, seed=0):
+    rnd = random.Random(seed)
+    posts = []
+    for i in range(n):
+        if posts and rnd.random() < dup_ratio:
+            posts.append(rnd.choice(posts))
+            continue
+        title = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(4, 14))).capitalize()
+        body = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(0, 50)))
+        extra = rnd.choice(["", "!!", " :)", " https://example.com/p/%d" % i, "\n\nEdit: typo", " $BTC"])
+        posts.append((title + " " + body + extra).strip())
+    return posts
+
+
+def legacy_score(text):
+    # the old per-call path, with the cleaning patterns fixed
+    text = re.sub(r"http\S+", "", text)
+    text = re.sub(r"[\r\n\t]+", " ", text)
+    text = re.sub(r"[^\w\s\-'\"]+", " ", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return float(sentiment.get_analyzer().polarity_scores(text)["compound"])
+
+
+def timed(label, n, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    secs = time.perf_counter() - t0
+    print(f"{label:<40} {n:>8} posts {secs:>8.2f}s {n / secs:>10,.0f} posts/s")
+    return out, n / secs
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=100_000)
+    ap.add_argument("--dup-ratio", type=float, default=0.2)
+    ap.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 2))
+    args = ap.parse_args()
+
+    posts = make_posts(args.posts, args.dup_ratio)
+    print(f"[bench] {len(posts)} posts, {len(set(posts))} distinct, {os.cpu_count()} CPUs\n")
+    sentiment.get_analyzer()  # lexicon load is not part of the measurement
+    disk_path = os.path.join(tempfile.mkdtemp(), "sentiment_cache.db")
+    sentiment._cache = sentiment_cache.SentimentCache(sentiment.scorer_version(), size=len(posts), path=disk_path)
+    cache = sentiment.get_cache()
+
+    def run(label, **kw):
+        got, rate = timed(label, len(posts), lambda: sentiment.score_texts(posts, **kw))
+        assert got == ref
+        print(f"{'':<40} -> {rate / base:.1f}x")
+
+    ref, base = timed("per-post loop (legacy cleaning)", len(posts), lambda: [legacy_score(t) for t in posts])
+
+    cache.clear()
+    run("score_texts, in-process, cold cache", workers=1)
+    cache.clear()
+    sentiment.PARALLEL_MIN = 0
+    run(f"score_texts, {args.workers} workers, cold cache", workers=args.workers)
+    run("score_texts, warm memory cache", workers=1)
+    print(f"[bench] cache: {cache.stats()}\n")
+
+    # new process: empty LRU, scores come from the disk tier
+    sentiment._cache = sentiment_cache.SentimentCache(sentiment.scorer_version(), size=len(posts), path=disk_path)
+    run("score_texts, after restart (disk tier)", workers=1)
+    print(f"[bench] cache: {sentiment.get_cache().stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench_sentiment_backends.py
+"""
+Compare sentiment backends on CPU: throughput (posts/sec for one large
+score_batch) and latency (p50/p99 ms for single posts and for small
+batches, like an ingester scoring a fresh listing).
+
+Backends: vader, transformer (fp32) and transformer (int8 dynamic
+quantization). The transformer rows need torch + transformers and
+download the model on first use; they are skipped if that fails. The
+score cache is bypassed.
+
+Run:
+python scripts/bench_sentiment_backends.py
+python scripts/bench_sentiment_backends.py --posts 2000 --threads 4 --model ElKulako/cryptobert
+python scripts/bench_sentiment_backends.py --backends vader transformer-int8 --batch 64
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.processing import sentiment_backends
+from src.processing.sentiment import clean_text
+from bench_sentiment import make_posts
+
+
+def build(label, args):
+    if label == "vader":
+        return sentiment_backends.make_backend("vader")
+    return sentiment_backends.make_backend(
+        "transformer", model=args.model, batch_size=args.batch, max_batch_tokens=args.batch_tokens,
+        max_length=args.max_length, threads=args.threads, quantize=label == "transformer-int8",
+    )
+
+
+def latencies_ms(backend, texts, size, rounds):
+    out = []
+    for i in range(rounds):
+        part = [texts[(i * size + j) % len(texts)] for j in range(size)]
+        t0 = time.perf_counter()
+        backend.score_batch(part)
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(p / 100 * len(xs)))]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--posts", type=int, default=2000)
+    ap.add_argument("--backends", nargs="+", default=["vader", "transformer", "transformer-int8"],
+                    choices=["vader", "transformer", "transformer-int8"])
+    ap.add_argument("--model", default=sentiment_backends.MODEL)
+    ap.add_argument("--threads", type=int, default=sentiment_backends.TORCH_THREADS)
+    ap.add_argument("--batch", type=int, default=sentiment_backends.BATCH_SIZE)
+    ap.add_argument("--batch-tokens", type=int, default=sentiment_backends.BATCH_TOKENS)
+    ap.add_argument("--max-length", type=int, default=sentiment_backends.MAX_LENGTH)
+    ap.add_argument("--rounds", type=int, default=50, help="latency samples per size")
+    args = ap.parse_args()
+
+    texts = [clean_text(t) for t in make_posts(args.posts, dup_ratio=0.0)]
+    print(f"[bench] {len(texts)} posts, {os.cpu_count()} CPUs\n")
+    print(f"{'backend':<18} {'load s':>7} {'posts/s':>10} {'1 post p50/p99 ms':>20} {'25 posts p50/p99 ms':>22}")
+
+    for label in args.backends:
+        t0 = time.perf_counter()
+        try:
+            backend = build(label, args)
+        except Exception as e:  # torch / transformers missing, model download failed
+            print(f"{label:<18} skipped: {type(e).__name__}: {e}")
+            continue
+        load = time.perf_counter() - t0
+        backend.score_batch(texts[:8])  # warm-up
+
+        t0 = time.perf_counter()
+        backend.score_batch(texts)
+        rate = len(texts) / (time.perf_counter() - t0)
+        one = latencies_ms(backend, texts, 1, args.rounds)
+        small = latencies_ms(backend, texts, 25, args.rounds)
+        print(f"{label:<18} {load:>7.1f} {rate:>10,.0f} "
+              f"{statistics.median(one):>9.2f} / {pct(one, 99):>8.2f} "
+              f"{statistics.median(small):>10.2f} / {pct(small, 99):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
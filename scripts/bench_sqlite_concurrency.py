@@ -0,0 +1,173 @@
+# bench_sqlite_concurrency.py
+"""
+N writer threads + M reader threads against one SQLite file, with the
+default engine (rollback journal, shared pool) and with the production
+profile (WAL, pragmas, single writer connection, read-only reader pool;
+see src/storage/sqlite_profile.py). Reports throughput, p50/p99/max
+latency and errors ("database is locked") per role.
+
+Writers insert `--batch` ticks per transaction, like the tick writer;
+readers run the per-symbol "latest 200 ticks" query used by the API.
+Workers are separate processes by default, like the ingestion, aggregator
+and API processes sharing crypto.db; --threads runs them in one process.
+
+Run:
+python scripts/bench_sqlite_concurrency.py
+python scripts/bench_sqlite_concurrency.py --writers 4 --readers 8 --seconds 15
+python scripts/bench_sqlite_concurrency.py --mode profile --threads
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(TMP, 'unused.db')}")
+
+from sqlalchemy import insert, select
+
+from src.storage import db as dbmod
+from src.storage.sqlite_profile import make_engines
+
+SYMBOLS = [f"S{i:02d}-USD" for i in range(20)]
+
+
+def _rows(n, t):
+    return [
+        dict(symbol=random.choice(SYMBOLS), price=random.uniform(1, 100),
+             volume=random.random(), ts=t + timedelta(microseconds=i))
+        for i in range(n)
+    ]
+
+
+def _pct(samples, q):
+    if not samples:
+        return 0.0
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * q))]
+
+
+def _loop(role, write_engine, read_engine, batch, deadline):
+    """Run one writer or reader until `deadline`; returns (latencies, errors, rows)."""
+    t = dbmod.tickers
+    lat, errs, n = [], 0, 0
+    while time.time() < deadline:
+        s = time.perf_counter()
+        try:
+            if role == "write":
+                rows = _rows(batch, datetime.utcnow())
+                with write_engine.begin() as conn:
+                    conn.execute(insert(t), rows)
+                n += len(rows)
+            else:
+                stmt = select(t).where(t.c.symbol == random.choice(SYMBOLS)).order_by(t.c.ts.desc()).limit(200)
+                with read_engine.connect() as conn:
+                    conn.execute(stmt).all()
+            lat.append(time.perf_counter() - s)
+        except Exception:
+            errs += 1
+    return lat, errs, n
+
+
+def _proc_worker(role, url, profile, batch, deadline, out):
+    write_engine, read_engine = make_engines(url, profile=profile)
+    out.put((role,) + _loop(role, write_engine, read_engine, batch, deadline))
+
+
+def run(mode, writers, readers, seconds, batch, seed_rows, use_threads):
+    path = os.path.join(TMP, f"{mode}.db")
+    url = f"sqlite:///{path}"
+    profile = "wal" if mode == "profile" else "off"
+    write_engine, read_engine = make_engines(url, profile=profile)
+    dbmod.metadata.create_all(write_engine)
+
+    t0 = datetime(2024, 1, 1)
+    with write_engine.begin() as conn:
+        for lo in range(0, seed_rows, 10_000):
+            conn.execute(insert(dbmod.tickers), _rows(10_000, t0 + timedelta(seconds=lo)))
+
+    roles = ["write"] * writers + ["read"] * readers
+    results = []
+    deadline = time.time() + 1.0 + seconds  # 1s for workers to start
+    if use_threads:
+        lock = threading.Lock()
+
+        def target(role):
+            r = _loop(role, write_engine, read_engine, batch, deadline)
+            with lock:
+                results.append((role,) + r)
+
+        workers = [threading.Thread(target=target, args=(r,)) for r in roles]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    else:
+        write_engine.dispose()
+        read_engine.dispose()
+        out = mp.Queue()
+        workers = [mp.Process(target=_proc_worker, args=(r, url, profile, batch, deadline, out))
+                   for r in roles]
+        for w in workers:
+            w.start()
+        results = [out.get() for _ in workers]
+        for w in workers:
+            w.join()
+
+    write_engine.dispose()
+    read_engine.dispose()
+
+    kind = "threads" if use_threads else "processes"
+    print(f"\n=== {mode}: {writers} writers x {batch} rows/txn, {readers} readers ({kind}), {seconds:.0f}s ===")
+    print(f"{'role':<6} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}")
+    out_stats = {}
+    rows_written = sum(r[3] for r in results)
+    for role in ("write", "read"):
+        s = [x for r in results if r[0] == role for x in r[1]]
+        errs = sum(r[2] for r in results if r[0] == role)
+        ops = len(s) / seconds
+        p50 = statistics.median(s) * 1000 if s else 0.0
+        p99 = _pct(s, 0.99) * 1000
+        mx = max(s) * 1000 if s else 0.0
+        print(f"{role:<6} {ops:>9.0f} {p50:>9.2f} {p99:>9.2f} {mx:>9.2f} {errs:>7}")
+        out_stats[role] = (ops, p99, errs)
+    print(f"rows written/s: {rows_written / seconds:,.0f}")
+    return out_stats
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--writers", type=int, default=3)
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--seconds", type=float, default=10)
+    ap.add_argument("--batch", type=int, default=20, help="rows per write transaction")
+    ap.add_argument("--seed-rows", type=int, default=200_000)
+    ap.add_argument("--mode", choices=["both", "default", "profile"], default="both")
+    ap.add_argument("--threads", action="store_true",
+                    help="run workers as threads of one process instead of separate processes")
+    args = ap.parse_args()
+
+    modes = ["default", "profile"] if args.mode == "both" else [args.mode]
+    results = {m: run(m, args.writers, args.readers, args.seconds, args.batch, args.seed_rows, args.threads)
+               for m in modes}
+
+    if len(results) == 2:
+        d, p = results["default"], results["profile"]
+        print("\nprofile vs default:")
+        for role in ("write", "read"):
+            ratio = p[role][0] / d[role][0] if d[role][0] else float("inf")
+            print(f"  {role}: {ratio:.1f}x throughput, p99 {d[role][1]:.1f} -> {p[role][1]:.1f} ms, "
+                  f"errors {d[role][2]} -> {p[role][2]}")
+
+
+if __name__ == "__main__":
+    main()
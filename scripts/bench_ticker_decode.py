@@ -0,0 +1,123 @@
+# bench_ticker_decode.py
+"""
+Micro-benchmark: legacy handle_message decode vs. src.ingestion.ticker_decode.
+
+Uses a message corpus (one raw frame per line) when --corpus is given,
+otherwise synthesizes one with the feed's usual mix of ticker,
+heartbeat and subscriptions frames. --save writes the synthetic corpus
+so later runs compare against the same input.
+
+Run:
+python scripts/bench_ticker_decode.py
+python scripts/bench_ticker_decode.py --corpus frames.jsonl
+python scripts/bench_ticker_decode.py --capture feed.cap
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ingestion import ticker_decode
+
+
+def synthetic_corpus(n, ticker_share=0.8):
+    products = ["BTC-USD", "ETH-USD", "USDT-USD", "SOL-USD", "DOGE-USD"]
+    t = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    out = []
+    for i in range(n):
+        t += timedelta(microseconds=random.randint(100, 5000))
+        r = random.random()
+        if r < ticker_share:
+            p = random.choice(products)
+            out.append(json.dumps({
+                "type": "ticker", "sequence": i, "product_id": p,
+                "price": f"{random.uniform(1, 50000):.2f}",
+                "open_24h": "42000.00", "volume_24h": "12345.678",
+                "low_24h": "41000.00", "high_24h": "43000.00",
+                "best_bid": "42100.00", "best_ask": "42100.01",
+                "side": "buy", "time": t.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                "trade_id": i, "last_size": f"{random.random():.8f}",
+            }, separators=(",", ":")))
+        elif r < 0.99:
+            out.append(json.dumps({
+                "type": "heartbeat", "last_trade_id": i,
+                "product_id": random.choice(products), "sequence": i,
+                "time": t.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            }, separators=(",", ":")))
+        else:
+            out.append(json.dumps({
+                "type": "subscriptions",
+                "channels": [{"name": "ticker", "product_ids": products}],
+            }, separators=(",", ":")))
+    return out
+
+
+def legacy_decode(msg):
+    # the pre-fast-path body of coinbase_ws.handle_message
+    data = json.loads(msg)
+    if data.get("type") != "ticker":
+        return None
+    return {
+        "symbol": data["product_id"],
+        "price": float(data["price"]),
+        "volume": float(data.get("last_size", 0.0)),
+        "ts": datetime.fromisoformat(data["time"].replace("Z", "+00:00")),
+    }
+
+
+def bench(fn, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for m in corpus:
+            fn(m)
+        best = min(best, time.perf_counter() - t0)
+    return len(corpus) / best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", help="file with one raw frame per line")
+    ap.add_argument("--capture", help="capture file written by coinbase_ws --capture")
+    ap.add_argument("--n", type=int, default=200_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--save", help="write the synthetic corpus here")
+    args = ap.parse_args()
+
+    if args.capture:
+        from src.ingestion.capture import read_capture
+        corpus = [frame.decode("utf-8") for _, frame in read_capture(args.capture)]
+    elif args.corpus:
+        with open(args.corpus) as f:
+            corpus = [line.rstrip("\n") for line in f if line.strip()]
+    else:
+        corpus = synthetic_corpus(args.n)
+        if args.save:
+            with open(args.save, "w") as f:
+                f.write("\n".join(corpus) + "\n")
+
+    # both paths must agree before we time them
+    for m in corpus[:2000]:
+        assert legacy_decode(m) == ticker_decode.decode_ticker(m), m
+
+    tickers = sum(1 for m in corpus if ticker_decode.decode_ticker(m) is not None)
+    print(f"corpus: {len(corpus)} frames ({tickers} ticker), json backend: {ticker_decode.JSON_BACKEND}")
+
+    before = bench(legacy_decode, corpus, args.repeat)
+    after = bench(ticker_decode.decode_ticker, corpus, args.repeat)
+    corpus_b = [m.encode() for m in corpus]
+    after_b = bench(ticker_decode.decode_ticker, corpus_b, args.repeat)
+
+    print(f"legacy   : {before:12,.0f} msgs/s")
+    print(f"fast str : {after:12,.0f} msgs/s  ({after / before:.2f}x)")
+    print(f"fast bytes: {after_b:11,.0f} msgs/s  ({after_b / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
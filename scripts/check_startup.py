@@ -0,0 +1,104 @@
+# check_startup.py
+"""
+Import-time budget for the API: in a fresh interpreter, time `import main`
+plus the first market-data request (no warm-up, so the request pays for
+everything it needs), and check that importing the app neither loads
+the heavy libraries nor initializes any lazy component
+(src.observability.readiness).
+
+Exits 1 when over budget or when a check fails, so it can run in CI.
+
+Run:
+python scripts/check_startup.py
+python scripts/check_startup.py --budget 1.0 --path /api/market/api/market/ETH-USD --top 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# must not be imported by `import main` (loaded lazily, on first use / by the warm-up)
+HEAVY = ["torch", "sentence_transformers", "transformers", "pandas", "faiss"]
+
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from src.observability import readiness
+at_import = {n: c["state"] for n, c in readiness.status()["components"].items()}
+heavy = [m for m in HEAVY if m in sys.modules]
+from fastapi.testclient import TestClient
+client = TestClient(main.app)  # not entered as a context manager: no lifespan, no warm-up
+t2 = time.perf_counter()
+r = client.get(PATH)
+t3 = time.perf_counter()
+after = {n: c["state"] for n, c in readiness.status()["components"].items()}
+print(json.dumps({"import": t1 - t0, "first_request": t3 - t2, "status": r.status_code,
+                  "heavy": heavy, "at_import": at_import, "after_request": after}))
+"""
+
+
+def run_child(code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    flags = ["-X", "importtime"] if importtime else []
+    proc = subprocess.run([sys.executable, *flags, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                          env={**os.environ, "STARTUP_WARMUP": "0"})
+    if proc.returncode != 0:
+        print(proc.stderr[-4000:])
+        sys.exit(f"[startup] child failed with exit code {proc.returncode}")
+    return proc
+
+
+def top_imports(stderr: str, n: int):
+    """Slowest imports made directly by `main` (cumulative us, -X importtime)."""
+    rows, in_main = [], False
+    for line in reversed(stderr.splitlines()):  # importtime prints children before their parent
+        parts = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        depth = (len(parts[2]) - len(parts[2].lstrip()) - 1) // 2
+        if depth == 0:
+            in_main = parts[2].strip() == "main"
+        elif depth == 1 and in_main:
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget", type=float, default=1.0, help="seconds for import + first market request")
+    ap.add_argument("--path", default="/api/market/api/market/BTC-USD")
+    ap.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    args = ap.parse_args()
+
+    code = f"HEAVY = {HEAVY!r}\nPATH = {args.path!r}\n" + CHILD
+    result = json.loads(run_child(code).stdout.strip().splitlines()[-1])
+
+    total = result["import"] + result["first_request"]
+    print(f"[startup] import main       {result['import'] * 1000:7.0f} ms")
+    print(f"[startup] first {args.path}  {result['first_request'] * 1000:7.0f} ms  (HTTP {result['status']})")
+    print(f"[startup] total             {total * 1000:7.0f} ms  (budget {args.budget * 1000:.0f} ms)")
+    print(f"[startup] components at import {result['at_import']}")
+    print(f"[startup] after the request    {result['after_request']}")
+    if args.top:
+        print("\nslowest imports made by main (cumulative; -X importtime inflates them):")
+        for us, name in top_imports(run_child("import main", importtime=True).stderr, args.top):
+            print(f"  {us / 1000:7.0f} ms  {name}")
+
+    failures = []
+    if total > args.budget:
+        failures.append(f"cold start {total:.2f} s over the {args.budget:.2f} s budget")
+    if result["heavy"]:
+        failures.append(f"`import main` loaded {', '.join(result['heavy'])}")
+    eager = [n for n, state in result["at_import"].items() if state != "cold"]
+    if eager:
+        failures.append(f"initialized at import: {', '.join(eager)}")
+    if result["status"] >= 500:
+        failures.append(f"market request failed with HTTP {result['status']}")
+    for f in failures:
+        print(f"[startup] FAIL {f}")
+    sys.exit(1 if failures else 0)
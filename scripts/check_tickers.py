@@ -1,6 +1,7 @@
 # check_tickers.py
 from src.storage import db as dbmod
 from sqlalchemy import select
+dbmod.ensure_schema()
 with dbmod.engine.connect() as c:
     rows = c.execute(select(dbmod.tickers).order_by(dbmod.tickers.c.ts.desc()).limit(5)).all()
     for r in rows:
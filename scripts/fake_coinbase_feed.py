@@ -0,0 +1,185 @@
+# fake_coinbase_feed.py
+"""
+Local stand-in for the Coinbase websocket feed (stdlib only).
+
+Accepts websocket connections, answers `subscribe` messages with a
+`subscriptions` frame and then streams `ticker` frames for every
+subscribed product at --rate messages/sec per connection.
+
+Run:
+python scripts/fake_coinbase_feed.py --port 8765 --rate 2000
+python -m src.ingestion.coinbase_ws --mode mux --shards 2 --url ws://127.0.0.1:8765 \
+    --symbols "$(python scripts/fake_coinbase_feed.py --list 250)"
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import struct
+import time
+from datetime import datetime, timezone
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def synthetic_products(n):
+    return [f"SYN{i:04d}-USD" for i in range(n)]
+
+
+# ---------------------------------------------------
+# Minimal RFC 6455 framing
+# ---------------------------------------------------
+def encode_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    n = len(payload)
+    head = bytes([0x80 | opcode])
+    if n < 126:
+        head += bytes([n])
+    elif n < 65536:
+        head += bytes([126]) + struct.pack("!H", n)
+    else:
+        head += bytes([127]) + struct.pack("!Q", n)
+    return head + payload
+
+
+async def read_frame(reader):
+    b1, b2 = await reader.readexactly(2)
+    opcode = b1 & 0x0F
+    n = b2 & 0x7F
+    if n == 126:
+        (n,) = struct.unpack("!H", await reader.readexactly(2))
+    elif n == 127:
+        (n,) = struct.unpack("!Q", await reader.readexactly(8))
+    mask = await reader.readexactly(4) if b2 & 0x80 else None
+    data = await reader.readexactly(n)
+    if mask:
+        data = bytes(c ^ mask[i % 4] for i, c in enumerate(data))
+    return opcode, data
+
+
+async def handshake(reader, writer):
+    request = await reader.readuntil(b"\r\n\r\n")
+    key = None
+    for line in request.decode("latin-1").split("\r\n"):
+        if line.lower().startswith("sec-websocket-key:"):
+            key = line.split(":", 1)[1].strip()
+    if key is None:
+        writer.close()
+        return False
+    accept = base64.b64encode(hashlib.sha1((key + GUID).encode()).digest()).decode()
+    writer.write(
+        b"HTTP/1.1 101 Switching Protocols\r\n"
+        b"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+        + f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+    )
+    await writer.drain()
+    return True
+
+
+# ---------------------------------------------------
+# Feed
+# ---------------------------------------------------
+def ticker_frame(product, price, seq):
+    return json.dumps({
+        "type": "ticker",
+        "sequence": seq,
+        "product_id": product,
+        "price": f"{price:.2f}",
+        "last_size": f"{random.random():.8f}",
+        "side": random.choice(["buy", "sell"]),
+        "time": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+    }).encode()
+
+
+async def stream(writer, products, rate, stats):
+    prices = {p: random.uniform(1, 50000) for p in products}
+    seq = 0
+    interval = 0.01
+    per_tick = max(1, int(rate * interval))
+    while True:
+        t0 = time.monotonic()
+        for _ in range(per_tick):
+            p = random.choice(products)
+            prices[p] *= 1 + random.gauss(0, 0.0005)
+            seq += 1
+            writer.write(encode_frame(ticker_frame(p, prices[p], seq)))
+        stats["sent"] += per_tick
+        await writer.drain()
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - t0)))
+
+
+async def serve_client(reader, writer, rate, stats):
+    if not await handshake(reader, writer):
+        return
+    stats["connections"] += 1
+    feeder = None
+    try:
+        while True:
+            opcode, data = await read_frame(reader)
+            if opcode == 0x8:  # close
+                writer.write(encode_frame(data[:2], opcode=0x8))
+                break
+            if opcode == 0x9:  # ping -> pong
+                writer.write(encode_frame(data, opcode=0xA))
+                continue
+            if opcode != 0x1:
+                continue
+            msg = json.loads(data)
+            if msg.get("type") != "subscribe":
+                continue
+            products = []
+            for ch in msg.get("channels", []):
+                products.extend(ch.get("product_ids", []))
+            writer.write(encode_frame(json.dumps({
+                "type": "subscriptions",
+                "channels": [{"name": "ticker", "product_ids": products}],
+            }).encode()))
+            if feeder is None and products:
+                feeder = asyncio.create_task(stream(writer, products, rate, stats))
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        if feeder:
+            feeder.cancel()
+        stats["connections"] -= 1
+        writer.close()
+
+
+async def report(stats):
+    last = 0
+    while True:
+        await asyncio.sleep(5)
+        sent = stats["sent"]
+        print(f"[fake_feed] {stats['connections']} conns, {(sent - last) / 5:.0f} msgs/s, total {sent}")
+        last = sent
+
+
+async def main(host, port, rate):
+    stats = {"sent": 0, "connections": 0}
+    server = await asyncio.start_server(
+        lambda r, w: serve_client(r, w, rate, stats), host, port
+    )
+    print(f"[fake_feed] listening on ws://{host}:{port} ({rate} msgs/s per connection)")
+    asyncio.create_task(report(stats))
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--rate", type=int, default=1000, help="ticker messages/sec per connection")
+    ap.add_argument("--list", type=int, metavar="N",
+                    help="print N synthetic product ids (comma-separated) and exit")
+    args = ap.parse_args()
+
+    if args.list:
+        print(",".join(synthetic_products(args.list)))
+    else:
+        try:
+            asyncio.run(main(args.host, args.port, args.rate))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,148 @@
+# load_chat.py
+"""
+Concurrent chat load test for the retriever's query embedding service
+(src.rag.embedding).
+
+In-process (default): N client threads call retrieve_context, the chat
+handler's retrieval step, with a mix of repeated and unique questions. The
+same loaded model is run under three configurations:
+  per-request   each request encodes its own query (no batching, no cache)
+  batched       micro-batching, no cache
+  batched+cache micro-batching and the query LRU
+and throughput, latency percentiles, mean batch size and cache hit rate
+are reported for each.
+
+Against a running API (--url): N threads POST /api/chat and report the
+same numbers for whatever RAG_EMBED_* config the server was started with.
+Answer generation calls Ollama; with Ollama stopped the endpoint returns
+an error answer immediately, so the test measures retrieval.
+
+Run:
+python scripts/load_chat.py --clients 16 --requests 400
+python scripts/load_chat.py --clients 16 --requests 400 --repeat 0.0
+ADMIN_TOKEN=... python scripts/load_chat.py --url http://127.0.0.1:8000 --clients 16 --requests 400
+(the token is only needed for the embedding stats from /admin/embedding)
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SYMBOLS = ["BTC-USD", "ETH-USD", "SOL-USD"]
+POPULAR = [
+    "What is the sentiment on {sym} today?",
+    "Why is {sym} moving?",
+    "Is {sym} bullish or bearish right now?",
+    "What are people saying about {sym}?",
+]
+TOPICS = ["ETF flows", "whale wallets", "the halving", "exchange outflows", "funding rates",
+          "miners selling", "a short squeeze", "regulation news", "the latest upgrade", "stablecoin supply"]
+
+
+def make_questions(n: int, repeat: float, rnd: random.Random):
+    """(symbol, question) pairs; a `repeat` share comes from a few popular questions."""
+    out = []
+    for j in range(n):
+        sym = rnd.choice(SYMBOLS)
+        base = sym.split("-")[0]
+        if rnd.random() < repeat:
+            q = rnd.choice(POPULAR).format(sym=base)
+        else:
+            q = f"How does {rnd.choice(TOPICS)} affect {base}? (#{j})"
+        out.append((sym, q))
+    return out
+
+
+def run_clients(call, questions, clients: int):
+    """Run `call(symbol, question)` over the questions from `clients` threads."""
+    latencies = []
+    lock = threading.Lock()
+    it = iter(questions)
+
+    def client():
+        while True:
+            with lock:
+                item = next(it, None)
+            if item is None:
+                return
+            t0 = time.perf_counter()
+            call(*item)
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(latencies) / (time.perf_counter() - t0), np.array(latencies) * 1000
+
+
+def report(name, rps, lat_ms, extra=""):
+    p50, p95, p99 = np.percentile(lat_ms, [50, 95, 99])
+    print(f"{name:<14} {rps:8.1f} req/s   p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  p99 {p99:7.1f} ms  {extra}")
+
+
+def in_process(args, questions):
+    from src.rag import embedding, retriever
+
+    model = retriever.embedder.model
+    configs = [
+        ("per-request", dict(window_ms=0, max_batch=1, cache_size=0)),
+        ("batched", dict(window_ms=args.window_ms, max_batch=args.max_batch, cache_size=0)),
+        ("batched+cache", dict(window_ms=args.window_ms, max_batch=args.max_batch,
+                               cache_size=embedding.CACHE_SIZE or 4096)),
+    ]
+    retriever.retrieve_context("warm up", symbol="BTC")
+    for name, cfg in configs:
+        retriever.embedder = embedding.EmbeddingService(model=model, **cfg)
+        rps, lat = run_clients(lambda sym, q: retriever.retrieve_context(q, symbol=sym),
+                               questions, args.clients)
+        s = retriever.embedder.stats()
+        report(name, rps, lat, f"mean batch {s['mean_batch']:5.1f}  cache hit rate {s['hit_rate']:.0%}")
+
+
+def over_http(args, questions):
+    import requests
+
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.clients))
+
+    def call(sym, q):
+        session.post(f"{args.url}/api/chat", json={"symbol": sym, "question": q}, timeout=300)
+
+    rps, lat = run_clients(call, questions, args.clients)
+    report("api/chat", rps, lat)
+    try:
+        headers = {"X-Admin-Token": os.environ["ADMIN_TOKEN"]} if os.getenv("ADMIN_TOKEN") else None
+        print(session.get(f"{args.url}/admin/embedding", headers=headers, timeout=10).json())
+    except Exception as e:
+        print(f"[load] no embedding stats: {e}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=16)
+    ap.add_argument("--requests", type=int, default=400)
+    ap.add_argument("--repeat", type=float, default=0.3, help="share of popular (repeated) questions")
+    ap.add_argument("--window-ms", type=float, default=2.0)
+    ap.add_argument("--max-batch", type=int, default=32)
+    ap.add_argument("--url", default="", help="load a running API instead of the in-process retriever")
+    args = ap.parse_args()
+
+    questions = make_questions(args.requests, args.repeat, random.Random(0))
+    print(f"[load] {args.requests} requests from {args.clients} clients, "
+          f"{args.repeat:.0%} popular questions\n")
+    if args.url:
+        over_http(args, questions)
+    else:
+        in_process(args, questions)
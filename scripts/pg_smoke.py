@@ -0,0 +1,120 @@
+# pg_smoke.py
+"""
+End-to-end check of the Postgres backend against a local server:
+schema + indexes, COPY vs executemany tick ingestion, bulk post upserts,
+the incremental aggregator and, with --timescale, the hypertable and the
+continuous-aggregate sync (its OHLCV is compared with the Python bars).
+
+Uses its own tables in a throwaway schema, so it is safe to point at a
+development database.
+
+Run (see src/storage/postgres.py for a docker one-liner):
+DATABASE_URL=postgresql+psycopg2://postgres:pg@localhost:5432/postgres python scripts/pg_smoke.py
+DATABASE_URL=... python scripts/pg_smoke.py --timescale --ticks 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMA = f"fingpt_smoke_{uuid.uuid4().hex[:8]}"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ticks", type=int, default=100_000)
+    ap.add_argument("--symbols", type=int, default=20)
+    ap.add_argument("--timescale", action="store_true")
+    ap.add_argument("--keep", action="store_true", help="do not drop the smoke schema")
+    args = ap.parse_args()
+
+    url = os.getenv("DATABASE_URL", "")
+    if not url.startswith("postgresql"):
+        sys.exit("set DATABASE_URL to a postgresql:// URL")
+
+    # every connection works in the smoke schema
+    from sqlalchemy import create_engine, text
+    with create_engine(url).begin() as conn:
+        conn.execute(text(f'CREATE SCHEMA "{SCHEMA}"'))
+        if args.timescale:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS timescaledb"))
+    os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA},public"
+
+    from sqlalchemy import func, select
+    from src.storage import db as dbmod
+    from src.storage import migrations, postgres
+    from src.processing import aggregator as agg
+    from src.processing.incremental import IncrementalAggregator
+
+    try:
+        print(f"[pg_smoke] schema {SCHEMA}, pool size {dbmod.engine.pool.size()}")
+        agg.ensure_schema()
+        print("[pg_smoke] indexes:", migrations.ensure_indexes())
+        if args.timescale:
+            postgres.enable_timescale()
+            postgres.create_continuous_aggregate(policy=False)
+
+        symbols = [f"S{i:02d}-USD" for i in range(args.symbols)]
+        start = datetime.now(timezone.utc).replace(second=0, microsecond=0) - timedelta(minutes=30)
+        step = timedelta(minutes=25) / args.ticks
+
+        def ticks(n, offset):
+            return [dict(symbol=symbols[i % len(symbols)], price=random.uniform(1, 100),
+                         volume=random.random(), ts=start + (offset + i) * step) for i in range(n)]
+
+        half = args.ticks // 2
+        for label, copy, rows in (("executemany", False, ticks(half, 0)),
+                                  ("COPY", True, ticks(args.ticks - half, half))):
+            postgres.COPY_ENABLED = copy
+            t0 = time.perf_counter()
+            res = dbmod.insert_tickers_bulk(rows, chunk_size=10_000)
+            secs = time.perf_counter() - t0
+            print(f"[pg_smoke] {label:<12} {res['inserted']:>8} ticks {len(rows) / secs:>10,.0f} rows/s")
+        postgres.COPY_ENABLED = True
+
+        posts = [dict(id=f"t3_{i}", subreddit="CryptoCurrency", text=f"{random.choice(symbols)} post",
+                      sentiment=random.uniform(-1, 1), created_utc=start + timedelta(seconds=i))
+                 for i in range(1500)]
+        print("[pg_smoke] posts:", dbmod.upsert_reddit_posts_bulk(posts),
+              "re-run:", dbmod.upsert_reddit_posts_bulk(posts))
+
+        with dbmod.engine.begin() as conn:
+            conn.execute(text("DELETE FROM aggregator_state"))
+        ia = IncrementalAggregator()
+        ia.tick_hwm, ia.post_hwm, ia._loaded = 0, start - timedelta(minutes=10), True
+        t0 = time.perf_counter()
+        print(f"[pg_smoke] incremental step: {ia.step()} bars in {time.perf_counter() - t0:.2f}s")
+
+        if args.timescale:
+            with dbmod.read_engine.connect() as conn:
+                python_bars = {(r.ts, r.symbol): r for r in conn.execute(select(agg.aggregates)).all()}
+                conn.execute(text("DELETE FROM aggregates"))
+                conn.commit()
+            postgres.refresh_continuous_aggregate(start - timedelta(hours=1), datetime.now(timezone.utc))
+            t0 = time.perf_counter()
+            n = postgres.sync_aggregates(start - timedelta(minutes=1))
+            print(f"[pg_smoke] continuous aggregate sync: {n} bars in {time.perf_counter() - t0:.2f}s")
+            with dbmod.read_engine.connect() as conn:
+                bad = 0
+                for r in conn.execute(select(agg.aggregates)).all():
+                    p = python_bars.get((r.ts, r.symbol))
+                    if p is None or any(abs(getattr(r, c) - getattr(p, c)) > 1e-9 for c in (
+                            "open_price", "close_price", "high_price", "low_price", "volume")):
+                        bad += 1
+                total = conn.execute(select(func.count()).select_from(agg.aggregates)).scalar()
+            print(f"[pg_smoke] cagg vs python bars: {total} bars, {bad} mismatches")
+    finally:
+        dbmod.engine.dispose()
+        if not args.keep:
+            with create_engine(url).begin() as conn:
+                conn.execute(text(f'DROP SCHEMA "{SCHEMA}" CASCADE'))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# reddit_stub.py
+"""
+Local stand-in for Reddit's /r/<sub>/new.json, for exercising the poller
+without the network.
+
+The stub generates posts per subreddit at different rates (one busy, the
+rest quiet), serves them newest first with Reddit's `limit` / `before`
+semantics (an unknown `before` anchor returns an empty listing, as for a
+deleted post), answers If-None-Match with 304, and enforces a request
+budget per window with x-ratelimit-used/-remaining/-reset headers and
+429 + Retry-After once it is spent.
+
+`smoke` runs src.ingestion.reddit_poller against it on a throwaway
+SQLite file, deletes a cursor post halfway through, and checks that every
+served post ends up stored exactly once.
+
+Run:
+python scripts/reddit_stub.py serve --port 8765
+REDDIT_BASE_URL=http://127.0.0.1:8765 python -m src.ingestion.reddit_poller --subreddits busy,quiet1,quiet2
+python scripts/reddit_stub.py smoke --seconds 20
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = "bitcoin eth moon dump hodl bullish bearish whales buy sell dip rally fud".split()
+
+
+class StubReddit:
+    def __init__(self, rates, budget=600, window=600.0, seed=0):
+        self.rates = rates                      # posts/sec per subreddit
+        self.posts = {s: [] for s in rates}     # newest first
+        self.deleted = set()
+        self.budget = budget
+        self.window = window
+        self.window_start = time.monotonic()
+        self.used = 0
+        self.stats = {"requests": 0, "not_modified": 0, "rate_limited": 0}
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.next_id = 0
+        for s in rates:
+            for _ in range(30):
+                self.add_post(s)
+
+    def add_post(self, sub):
+        with self.lock:
+            self.next_id += 1
+            pid = f"{self.next_id:x}"
+            self.posts[sub].insert(0, {
+                "id": pid, "name": f"t3_{pid}", "subreddit": sub,
+                "title": " ".join(self.rnd.choice(WORDS) for _ in range(6)),
+                "selftext": "", "created_utc": time.time(),
+            })
+
+    def delete_newest(self, sub):
+        with self.lock:
+            d = self.posts[sub].pop(0)
+            self.deleted.add(d["id"])
+            return d["name"]
+
+    def generate(self, stop: threading.Event, tick=0.1):
+        while not stop.is_set():
+            for sub, rate in self.rates.items():
+                if self.rnd.random() < rate * tick:
+                    self.add_post(sub)
+            stop.wait(tick)
+
+    def listing(self, sub, limit, before):
+        with self.lock:
+            posts = self.posts.get(sub, [])
+            if before:
+                idx = next((i for i, d in enumerate(posts) if d["name"] == before), None)
+                # the `limit` posts immediately newer than the anchor
+                return [] if idx is None else posts[max(0, idx - limit):idx]
+            return posts[:limit]
+
+    def take_budget(self):
+        """(allowed, headers)"""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.window:
+                self.window_start, self.used = now, 0
+            reset = self.window - (now - self.window_start)
+            allowed = self.used < self.budget
+            if allowed:
+                self.used += 1
+            headers = {
+                "x-ratelimit-used": str(self.used),
+                "x-ratelimit-remaining": f"{self.budget - self.used:.1f}",
+                "x-ratelimit-reset": str(int(reset) + 1),
+            }
+            return allowed, headers
+
+
+def make_handler(stub: StubReddit):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, code, headers, body=b""):
+            self.send_response(code)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.strip("/").split("/")
+            stub.stats["requests"] += 1
+            allowed, headers = stub.take_budget()
+            if not allowed:
+                stub.stats["rate_limited"] += 1
+                headers["Retry-After"] = headers["x-ratelimit-reset"]
+                return self._send(429, headers)
+            if len(parts) != 3 or parts[0] != "r" or parts[2] != "new.json":
+                return self._send(404, headers)
+            q = parse_qs(url.query)
+            limit = min(100, int(q.get("limit", ["25"])[0]))
+            posts = stub.listing(parts[1], limit, q.get("before", [None])[0])
+            etag = '"%s"' % hashlib.sha1(",".join(d["id"] for d in posts).encode()).hexdigest()[:16]
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                stub.stats["not_modified"] += 1
+                return self._send(304, headers)
+            body = json.dumps({"kind": "Listing", "data": {
+                "children": [{"kind": "t3", "data": d} for d in posts],
+                "before": posts[0]["name"] if posts else None,
+            }}).encode()
+            headers["Content-Type"] = "application/json"
+            self._send(200, headers, body)
+
+    return Handler
+
+
+def serve(stub, port):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(stub))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def smoke(args):
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'poller.db')}")
+    from sqlalchemy import select
+    from src.ingestion import reddit_poller as rp
+    from src.storage import db as dbmod
+
+    rp.MIN_INTERVAL, rp.START_INTERVAL, rp.MAX_INTERVAL, rp.RESYNC_EVERY = 0.5, 1.0, 4.0, 5
+
+    stub = StubReddit({"busy": 20.0, "quiet1": 0.2, "quiet2": 0.05}, budget=args.budget, window=10.0)
+    server = serve(stub, 0)
+    stop = threading.Event()
+    gen = threading.Thread(target=stub.generate, args=(stop,), daemon=True)
+    gen.start()
+
+    poller = rp.RedditPoller(list(stub.rates), base_url=f"http://127.0.0.1:{server.server_port}")
+    runner = threading.Thread(target=poller.run, args=(stop,), daemon=True)
+    runner.start()
+    time.sleep(args.seconds / 2)
+    deleted = stub.delete_newest("quiet1")
+    stub.add_post("quiet1")
+    print(f"[stub] deleted {deleted} (possibly the quiet1 cursor)")
+    time.sleep(args.seconds / 2)
+    stop.set()
+    runner.join()
+
+    # drain: enough rounds for every subreddit to resync once
+    for _ in range(rp.RESYNC_EVERY + 1):
+        poller.poll_once()
+    poller.close()
+    server.shutdown()
+
+    with dbmod.read_engine.connect() as conn:
+        stored = {r.id for r in conn.execute(select(dbmod.reddit_posts.c.id))}
+    served = {f"t3_{d['id']}" for posts in stub.posts.values() for d in posts}
+    missing = served - stored
+    print("[stub] server:", stub.stats)
+    print("[stub] poller:", json.dumps(poller.snapshot(), default=str))
+    print(f"[stub] served {len(served)} posts, stored {len(stored)}, missing {len(missing)}")
+    if missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("serve")
+    s.add_argument("--port", type=int, default=8765)
+    s.add_argument("--budget", type=int, default=600, help="requests per 600 s window")
+    m = sub.add_parser("smoke")
+    m.add_argument("--seconds", type=float, default=20)
+    m.add_argument("--budget", type=int, default=40, help="requests per 10 s window")
+    args = ap.parse_args()
+
+    if args.cmd == "serve":
+        stub = StubReddit({"busy": 2.0, "quiet1": 0.05, "quiet2": 0.01}, budget=args.budget)
+        stop = threading.Event()
+        threading.Thread(target=stub.generate, args=(stop,), daemon=True).start()
+        server = serve(stub, args.port)
+        print(f"[stub] serving http://127.0.0.1:{args.port}/r/<sub>/new.json")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        smoke(args)
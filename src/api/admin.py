@@ -0,0 +1,93 @@
+"""
+Admin endpoints (mounted at /admin).
+
+Tracing control:
+GET    /admin/tracing                      status
+POST   /admin/tracing?enabled=true&sample_rate=0.2
+GET    /admin/tracing/traces?limit=20      recent span trees (text; format=json for JSON)
+GET    /admin/tracing/collapsed            collapsed stacks for flamegraph.pl / speedscope
+DELETE /admin/tracing                      drop kept traces
+
+Query embedding service (src.rag.embedding):
+GET    /admin/embedding                    cache hit rate, batch sizes
+DELETE /admin/embedding                    clear the query cache
+
+Env:
+ADMIN_TOKEN=...          every call needs it in the X-Admin-Token header;
+                         unset, the endpoints are disabled (403)
+ADMIN_ALLOW_LOCAL=1      without a token, allow loopback clients instead.
+                         Only for a dev box: behind a reverse proxy on the
+                         same host every request arrives from 127.0.0.1.
+"""
+
+import os
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+
+from src.observability import tracing
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+ALLOW_LOCAL = os.getenv("ADMIN_ALLOW_LOCAL", "0") == "1"
+LOCAL_CLIENTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def require_admin(request: Request, x_admin_token: Optional[str] = Header(default=None)):
+    if ADMIN_TOKEN:
+        if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="bad admin token")
+    elif not ALLOW_LOCAL:
+        raise HTTPException(status_code=403, detail="admin endpoints are disabled; set ADMIN_TOKEN")
+    elif request.client is None or request.client.host not in LOCAL_CLIENTS:
+        raise HTTPException(status_code=403, detail="set ADMIN_TOKEN for remote admin access")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/tracing")
+def tracing_status():
+    return tracing.status()
+
+
+@router.post("/tracing")
+def tracing_control(enabled: bool = True, sample_rate: Optional[float] = None):
+    if enabled:
+        tracing.enable(sample_rate)
+    else:
+        tracing.disable()
+    return tracing.status()
+
+
+@router.delete("/tracing")
+def tracing_reset():
+    tracing.reset()
+    return tracing.status()
+
+
+@router.get("/tracing/traces")
+def tracing_traces(limit: int = 20, format: str = "text"):
+    spans = tracing.recent(max(1, min(limit, tracing.KEEP)))
+    if format == "json":
+        return [s.to_dict() for s in spans]
+    return PlainTextResponse("\n\n".join(tracing.format_tree(s) for s in spans) + "\n")
+
+
+@router.get("/tracing/collapsed")
+def tracing_collapsed():
+    return PlainTextResponse(tracing.collapsed())
+
+
+@router.get("/embedding")
+def embedding_stats():
+    from src.rag import retriever  # imported by the warm-up, not at app import
+    return retriever.embedder.stats()
+
+
+@router.delete("/embedding")
+def embedding_clear():
+    from src.rag import retriever
+    retriever.embedder.clear()
+    return retriever.embedder.stats()
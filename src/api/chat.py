@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from src.rag.retriever import retrieve_context
 from src.rag.generator import generate_answer
+from src.observability import tracing
 
 router = APIRouter()
 
@@ -10,7 +10,12 @@ class ChatRequest(BaseModel):
     question: str
 
 @router.post("/chat")
+@tracing.traced("chat")
 def chat(req: ChatRequest):
+    # faiss / the embedding model are slow to import and load: the app's
+    # warm-up imports the retriever in the background, not `import main`
+    from src.rag.retriever import retrieve_context
+
     context = retrieve_context(req.question, symbol=req.symbol)
     answer = generate_answer(context, req.question)
 
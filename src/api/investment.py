@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 from src.storage import db as dbmod
+from src.observability import tracing
 
 router = APIRouter()
 
@@ -9,6 +10,7 @@ class InvestmentRequest(BaseModel):
     usd: float
 
 @router.post("/calculate")
+@tracing.traced("calculate_units")
 def calculate_units(req: InvestmentRequest):
     rows = dbmod.get_recent_aggregates(req.symbol, limit=1)
     last = rows[-1]
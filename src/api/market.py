@@ -1,27 +1,62 @@
+from typing import Optional
+
+from datetime import datetime
+
 from fastapi import APIRouter, HTTPException
 from src.storage import db as dbmod
+from src.processing.resolutions import RESOLUTION_MINUTES, pick_resolution
+from src.observability import readiness, tracing
 from sqlalchemy import select
-import pandas as pd
 
 router = APIRouter()
 
-# Make sure metadata is aware of all tables
-dbmod.metadata.reflect(bind=dbmod.engine)
+
+def _reflect():
+    # Make sure metadata is aware of all tables (aggregates, rollups, ...)
+    dbmod.ensure_schema()
+    dbmod.metadata.reflect(bind=dbmod.engine)
+
+
+tables = readiness.component("db.reflect", _reflect)
+
+
+def _ts(v):
+    return datetime.fromisoformat(v) if isinstance(v, str) else v
 
 @router.get("/api/market/{symbol}")
-def get_market_data(symbol: str):
+@tracing.traced("get_market_data")
+def get_market_data(
+    symbol: str,
+    resolution: str = "1m",
+    limit: int = 120,
+    minutes: Optional[int] = None,
+):
+    """
+    `resolution` is one of 1m/5m/15m/1h/1d, or "auto" together with
+    `minutes` (history span) to get at most `limit` bars covering it.
+    """
+    if resolution == "auto":
+        resolution = pick_resolution(minutes or limit, max_points=limit)
+        if minutes:
+            limit = -(-minutes // RESOLUTION_MINUTES[resolution])
+    if resolution not in RESOLUTION_MINUTES:
+        raise HTTPException(status_code=400, detail=f"Unknown resolution {resolution}")
+    limit = max(1, min(limit, 5000))
+
     try:
+        tables.get()
         # Prefer aggregates if available
-        agg = dbmod.metadata.tables.get("aggregates")
-        ticker = dbmod.metadata.tables.get("tickers")
+        table_name = "aggregates" if resolution == "1m" else f"aggregates_{resolution}"
+        agg = dbmod.metadata.tables.get(table_name)
+        ticker = dbmod.metadata.tables.get("tickers") if resolution == "1m" else None
 
-        with dbmod.engine.connect() as conn:
+        with tracing.span("sql", table=table_name), dbmod.read_engine.connect() as conn:
             if agg is not None:
                 rows = conn.execute(
                     select(agg)
                     .where(agg.c.symbol == symbol)
                     .order_by(agg.c.ts.desc())
-                    .limit(120)
+                    .limit(limit)
                 ).mappings().all()
             else:
                 rows = []
@@ -32,38 +67,34 @@ def get_market_data(symbol: str):
                     select(ticker)
                     .where(ticker.c.symbol == symbol)
                     .order_by(ticker.c.ts.desc())
-                    .limit(120)
+                    .limit(limit)
                 ).mappings().all()
 
         if not rows:
             raise HTTPException(status_code=404, detail="No market data found")
 
-        df = pd.DataFrame(rows)
-
-        # Normalize timestamp
-        df["ts"] = pd.to_datetime(df["ts"])
-
         # --- PRICE COLUMN RESOLUTION (THE FIX) ---
-        if "close_price" in df.columns:
+        columns = rows[0].keys()
+        if "close_price" in columns:
             price_col = "close_price"
-        elif "price" in df.columns:
+        elif "price" in columns:
             price_col = "price"
         else:
-            raise RuntimeError(f"No price column found. Columns={list(df.columns)}")
-
-        latest = df.iloc[0]
-
-        return {
-            "symbol": symbol,
-            "latest": {
-                "price": float(latest[price_col]),
-                "volume": float(latest.get("volume", 0)),
-                "ts": str(latest["ts"])
-            },
-            "series": df[["ts", price_col]].rename(
-                columns={price_col: "price"}
-            ).to_dict(orient="records")
-        }
+            raise RuntimeError(f"No price column found. Columns={list(columns)}")
+
+        latest = rows[0]
+
+        with tracing.span("serialize", rows=len(rows)):
+            return {
+                "symbol": symbol,
+                "resolution": resolution,
+                "latest": {
+                    "price": float(latest[price_col]),
+                    "volume": float(latest.get("volume", 0)),
+                    "ts": str(_ts(latest["ts"]))
+                },
+                "series": [{"ts": _ts(r["ts"]), "price": r[price_col]} for r in rows]
+            }
 
     except HTTPException:
         raise
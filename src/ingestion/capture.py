@@ -0,0 +1,196 @@
+"""
+Record-and-replay capture files for the exchange feed.
+
+File format: a sequence of gzip members, each holding a run of records
+
+    <f8 receive time (unix seconds)> <u4 payload length> <payload bytes>
+
+(little-endian). Writers only ever append a complete gzip member per
+flush, so a file can be re-opened and extended, and a crash loses at most
+the last unflushed chunk. Standard gzip readers see one continuous stream.
+
+Record:
+python -m src.ingestion.coinbase_ws --mode mux --capture feed.cap
+
+Replay:
+python -m src.ingestion.capture replay feed.cap --speed 10
+python -m src.ingestion.capture replay feed.cap --speed 0 --target decode
+python -m src.ingestion.capture info feed.cap
+"""
+
+import argparse
+import gzip
+import io
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Callable, Iterator, Optional, Tuple, Union
+
+_HEADER = struct.Struct("<dI")
+
+FLUSH_RECORDS = 2000   # records per gzip member
+FLUSH_SECONDS = 1.0    # max age of buffered records
+COMPRESS_LEVEL = 6
+
+
+class CaptureWriter:
+    """Thread-safe appender; several websocket threads may share one."""
+
+    def __init__(
+        self,
+        path: str,
+        flush_records: int = FLUSH_RECORDS,
+        flush_seconds: float = FLUSH_SECONDS,
+        level: int = COMPRESS_LEVEL,
+    ):
+        self.path = path
+        self.flush_records = flush_records
+        self.flush_seconds = flush_seconds
+        self.level = level
+        self._f = open(path, "ab")
+        self._buf = io.BytesIO()
+        self._pending = 0
+        self._first_at = None
+        self._lock = threading.Lock()
+        self.records = 0
+        self.raw_bytes = 0
+
+    def write(self, frame: Union[str, bytes], recv_ts: Optional[float] = None):
+        payload = frame.encode("utf-8") if isinstance(frame, str) else frame
+        recv_ts = time.time() if recv_ts is None else recv_ts
+        with self._lock:
+            self._buf.write(_HEADER.pack(recv_ts, len(payload)))
+            self._buf.write(payload)
+            self._pending += 1
+            self.records += 1
+            self.raw_bytes += len(payload)
+            now = time.monotonic()
+            if self._first_at is None:
+                self._first_at = now
+            if (self._pending >= self.flush_records
+                    or now - self._first_at >= self.flush_seconds):
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        self._f.write(gzip.compress(self._buf.getvalue(), compresslevel=self.level))
+        self._f.flush()
+        self._buf = io.BytesIO()
+        self._pending = 0
+        self._first_at = None
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            self._f.close()
+
+
+def read_capture(path: str) -> Iterator[Tuple[float, bytes]]:
+    """Yield (receive time, raw frame) in file order. A torn tail is skipped."""
+    with gzip.open(path, "rb") as f:
+        while True:
+            try:
+                head = f.read(_HEADER.size)
+                if len(head) < _HEADER.size:
+                    return
+                recv_ts, n = _HEADER.unpack(head)
+                payload = f.read(n)
+            except (EOFError, zlib.error, gzip.BadGzipFile):
+                return
+            if len(payload) < n:
+                return
+            yield recv_ts, payload
+
+
+def replay(
+    path: str,
+    handler: Callable[[bytes], object],
+    speed: float = 1.0,
+    limit: Optional[int] = None,
+) -> dict:
+    """
+    Feed a capture through `handler`. speed=1 keeps the recorded pacing,
+    speed=N plays N times faster, speed=0 runs as fast as possible.
+    """
+    count = 0
+    first_recv = None
+    start = time.perf_counter()
+    for recv_ts, frame in read_capture(path):
+        if speed > 0:
+            if first_recv is None:
+                first_recv = recv_ts
+            ahead = (recv_ts - first_recv) / speed - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+        handler(frame)
+        count += 1
+        if limit is not None and count >= limit:
+            break
+    elapsed = time.perf_counter() - start
+    return {
+        "frames": count,
+        "elapsed_s": elapsed,
+        "frames_per_sec": count / elapsed if elapsed else 0.0,
+    }
+
+
+def _targets():
+    # imported lazily so `info` works without a configured database
+    from src.ingestion import coinbase_ws
+    from src.ingestion.ticker_decode import decode_ticker
+
+    return {
+        "handle": coinbase_ws.handle_message,  # decode + batched DB writer
+        "decode": decode_ticker,
+        "null": lambda frame: None,
+    }
+
+
+def _info(path):
+    n = 0
+    raw = 0
+    first = last = None
+    for recv_ts, frame in read_capture(path):
+        n += 1
+        raw += len(frame)
+        first = recv_ts if first is None else first
+        last = recv_ts
+    size = os.path.getsize(path)
+    span = (last - first) if n else 0.0
+    print(f"{path}: {n} frames over {span:.1f}s, "
+          f"{raw / 1e6:.1f} MB raw -> {size / 1e6:.1f} MB on disk "
+          f"({raw / size if size else 0:.1f}x)")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="capture file tools")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    rp = sub.add_parser("replay")
+    rp.add_argument("path")
+    rp.add_argument("--speed", type=float, default=1.0, help="1=real time, N=Nx, 0=max")
+    rp.add_argument("--target", choices=["handle", "decode", "null"], default="handle")
+    rp.add_argument("--limit", type=int, default=None)
+
+    ip = sub.add_parser("info")
+    ip.add_argument("path")
+
+    args = ap.parse_args()
+    if args.cmd == "info":
+        _info(args.path)
+    else:
+        handler = _targets()[args.target]
+        result = replay(args.path, handler, speed=args.speed, limit=args.limit)
+        if args.target == "handle":
+            from src.ingestion.tick_writer import get_writer
+            writer = get_writer()
+            writer.stop()
+            result["writer"] = writer.stats()
+        print(result)
@@ -1,73 +1,118 @@
+import argparse
 import json
+import os
+import random
 import time
 import threading
 import traceback
-from datetime import datetime
+from typing import Callable, Dict, List, Optional
 
 import websocket
-from sqlalchemy import insert
 
-from src.storage import db as dbmod
+from src.ingestion.capture import CaptureWriter
+from src.ingestion.tick_writer import get_writer
+from src.ingestion.ticker_decode import MESSAGES_DROPPED, MESSAGES_PARSED, MESSAGES_RECEIVED, decode_ticker
+from src.observability import metrics
 
 # --------------------------------------------------
-# CONFIG (UNCHANGED)
+# CONFIG
 # --------------------------------------------------
-WS_URL = "wss://ws-feed.exchange.coinbase.com"
+WS_URL = os.getenv("COINBASE_WS_URL", "wss://ws-feed.exchange.coinbase.com")
 SYMBOLS = ["BTC-USD", "ETH-USD", "USDT-USD"]
 CHANNEL = "ticker"
 
 RECONNECT_DELAY = 5  # seconds
+STATS_INTERVAL = 60  # seconds between writer stats lines
+
+# multiplexed mode
+SHARDS = int(os.getenv("COINBASE_WS_SHARDS", "1"))
+BACKOFF_BASE = 1.0   # seconds, first reconnect delay
+BACKOFF_MAX = 60.0   # seconds, cap for exponential backoff
+HEALTHY_SECONDS = 30.0  # a connection up this long resets the backoff
+
+_received = MESSAGES_RECEIVED.labels("coinbase_ws")
+_ignored = MESSAGES_DROPPED.labels("coinbase_ws", "non_ticker")
+_failed = MESSAGES_DROPPED.labels("coinbase_ws", "error")
 
 
 # --------------------------------------------------
-# Message handler (UNCHANGED LOGIC)
+# Per-symbol routing
 # --------------------------------------------------
-def handle_message(msg: str):
-    try:
-        data = json.loads(msg)
+def write_tick(tick: dict):
+    """Default per-symbol handler: hand the tick to the batched writer."""
+    get_writer().put(tick)
 
-        if data.get("type") != "ticker":
-            return
 
-        symbol = data["product_id"]
-        price = float(data["price"])
-        volume = float(data.get("last_size", 0.0))
+_handlers: Dict[str, Callable[[dict], None]] = {}
 
-        ts = datetime.fromisoformat(
-            data["time"].replace("Z", "+00:00")
-        )
 
-        stmt = insert(dbmod.tickers).values(
-            symbol=symbol,
-            price=price,
-            volume=volume,
-            ts=ts
-        )
+def register_handler(product_id: str, handler: Callable[[dict], None]):
+    """Route ticks for `product_id` to `handler` instead of `write_tick`."""
+    _handlers[product_id] = handler
+
 
-        with dbmod.engine.begin() as conn:
-            conn.execute(stmt)
+def route_tick(tick: dict):
+    _handlers.get(tick["symbol"], write_tick)(tick)
+
+
+# --------------------------------------------------
+# Message handler
+# Parsed ticks go to the shared batched writer instead
+# of one transaction per message.
+# --------------------------------------------------
+def handle_message(msg: str):
+    _received.inc()
+    try:
+        tick = decode_ticker(msg)
+        if tick is None:
+            _ignored.inc()
+            return
+
+        MESSAGES_PARSED.labels("coinbase_ws", tick["symbol"]).inc()
+        route_tick(tick)
 
     except Exception:
+        _failed.inc()
         print("[coinbase_ws] handle_message error")
         print(traceback.format_exc())
 
 
+_capture: Optional[CaptureWriter] = None
+
+
+def enable_capture(path: str) -> CaptureWriter:
+    """Append every raw frame (with receive time) to a capture file."""
+    global _capture
+    _capture = CaptureWriter(path)
+    return _capture
+
+
+def on_frame(msg: str):
+    if _capture is not None:
+        _capture.write(msg)
+    handle_message(msg)
+
+
+def subscribe_message(product_ids: List[str]) -> str:
+    return json.dumps({
+        "type": "subscribe",
+        "channels": [{
+            "name": CHANNEL,
+            "product_ids": list(product_ids)
+        }]
+    })
+
+
 # --------------------------------------------------
 # ONE SYMBOL = ONE CONNECTION (SAFE LOOP)
 # --------------------------------------------------
-def start_ws(symbol: str):
+def start_ws(symbol: str, url: str = WS_URL):
     def on_open(ws):
         print(f"[coinbase_ws] Connected → {symbol}")
-        ws.send(json.dumps({
-            "type": "subscribe",
-            "channels": [{
-                "name": CHANNEL,
-                "product_ids": [symbol]
-            }]
-        }))
+        ws.send(subscribe_message([symbol]))
 
     def on_message(ws, message):
-        handle_message(message)
+        on_frame(message)
 
     def on_error(ws, error):
         print(f"[coinbase_ws] {symbol} error:", error)
@@ -78,7 +123,7 @@ def start_ws(symbol: str):
     while True:
         try:
             ws = websocket.WebSocketApp(
-                WS_URL,
+                url,
                 on_open=on_open,
                 on_message=on_message,
                 on_error=on_error,
@@ -98,17 +143,151 @@ def start_ws(symbol: str):
 
 
 # --------------------------------------------------
-# ENTRY POINT (UNCHANGED BEHAVIOR)
+# MANY SYMBOLS = ONE CONNECTION PER SHARD
+# --------------------------------------------------
+def shard_symbols(symbols: List[str], shards: int) -> List[List[str]]:
+    """Split symbols round-robin into at most `shards` non-empty groups."""
+    shards = max(1, min(shards, len(symbols)))
+    groups = [[] for _ in range(shards)]
+    for i, sym in enumerate(symbols):
+        groups[i % shards].append(sym)
+    return groups
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    cap = min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def start_shard(
+    products: List[str],
+    url: str = WS_URL,
+    name: str = "shard-0",
+    stop_event: Optional[threading.Event] = None,
+):
+    """
+    Subscribe to all `products` over a single connection and route each
+    message by product_id. Every (re)connect resubscribes the full list.
+    """
+    stop_event = stop_event or threading.Event()
+    attempt = 0
+    opened_at = None
+
+    def on_open(ws):
+        # the backoff is reset only once the connection has proven healthy
+        # (see below): a server that accepts and drops at once keeps backing off
+        nonlocal opened_at
+        opened_at = time.monotonic()
+        print(f"[coinbase_ws] {name} connected → {len(products)} products")
+        ws.send(subscribe_message(products))
+
+    def on_message(ws, message):
+        on_frame(message)
+
+    def on_error(ws, error):
+        print(f"[coinbase_ws] {name} error:", error)
+
+    def on_close(ws, code, msg):
+        print(f"[coinbase_ws] {name} closed:", code, msg)
+
+    while not stop_event.is_set():
+        try:
+            ws = websocket.WebSocketApp(
+                url,
+                on_open=on_open,
+                on_message=on_message,
+                on_error=on_error,
+                on_close=on_close,
+            )
+            ws.run_forever(ping_interval=20, ping_timeout=10)
+        except Exception as e:
+            print(f"[coinbase_ws] {name} fatal error:", e)
+
+        if stop_event.is_set():
+            break
+        if opened_at is not None and time.monotonic() - opened_at >= HEALTHY_SECONDS:
+            attempt = 0
+        opened_at = None
+        delay = backoff_delay(attempt)
+        attempt += 1
+        print(f"[coinbase_ws] Reconnecting {name} in {delay:.1f}s")
+        stop_event.wait(delay)
+
+
+def start_multiplexed(
+    symbols: List[str],
+    shards: int = SHARDS,
+    url: str = WS_URL,
+    stop_event: Optional[threading.Event] = None,
+) -> List[threading.Thread]:
+    """Start one daemon thread per shard and return the threads."""
+    threads = []
+    for i, group in enumerate(shard_symbols(symbols, shards)):
+        t = threading.Thread(
+            target=start_shard,
+            args=(group, url, f"shard-{i}", stop_event),
+            name=f"coinbase-shard-{i}",
+            daemon=True,
+        )
+        t.start()
+        threads.append(t)
+    return threads
+
+
+# --------------------------------------------------
+# ENTRY POINT
 # --------------------------------------------------
+def _parse_args():
+    p = argparse.ArgumentParser(description="Coinbase ticker ingestion")
+    p.add_argument("--mode", choices=["per-symbol", "mux"], default="per-symbol",
+                   help="one connection per symbol, or multiplexed shards")
+    p.add_argument("--shards", type=int, default=SHARDS,
+                   help="number of connections in mux mode")
+    p.add_argument("--symbols", default=",".join(SYMBOLS),
+                   help="comma-separated product ids")
+    p.add_argument("--url", default=WS_URL)
+    p.add_argument("--capture", metavar="PATH",
+                   help="also append raw frames to a capture file")
+    return p.parse_args()
+
+
 if __name__ == "__main__":
-    print("Starting Coinbase ingestion (multi-connection mode)")
+    args = _parse_args()
+    metrics.serve_from_env()
+    symbols = [s.strip() for s in args.symbols.split(",") if s.strip()]
+    if args.capture:
+        enable_capture(args.capture)
+        print(f"[coinbase_ws] capturing raw frames → {args.capture}")
 
-    for sym in SYMBOLS:
-        threading.Thread(
-            target=start_ws,
-            args=(sym,),
-            daemon=True
-        ).start()
+    if args.mode == "mux":
+        print(f"Starting Coinbase ingestion (mux mode, {len(symbols)} products, "
+              f"{min(args.shards, len(symbols))} connections)")
+        start_multiplexed(symbols, shards=args.shards, url=args.url)
+    else:
+        print("Starting Coinbase ingestion (multi-connection mode)")
+        for sym in symbols:
+            threading.Thread(
+                target=start_ws,
+                args=(sym, args.url),
+                daemon=True
+            ).start()
 
-    while True:
-        time.sleep(60)
+    writer = get_writer()
+    try:
+        while True:
+            time.sleep(STATS_INTERVAL)
+            st = writer.stats()
+            print(
+                "[coinbase_ws] writer: "
+                f"{st['rows_per_sec']:.1f} rows/s, "
+                f"avg batch {st['avg_batch_size']:.1f}, "
+                f"avg flush {st['avg_flush_ms']:.1f} ms, "
+                f"queue {st['queue_depth']}, dropped {st['rows_dropped']}"
+            )
+    except KeyboardInterrupt:
+        print("[coinbase_ws] shutting down, flushing writer")
+    finally:
+        if _capture is not None:
+            _capture.close()
+        writer.stop()
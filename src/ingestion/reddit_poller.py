@@ -0,0 +1,400 @@
+"""
+Production Reddit /new poller.
+
+- One pooled `requests.Session` (keep-alive, urllib3 retries on 5xx)
+  shared by a thread pool that fetches the due subreddits concurrently.
+- A cursor per subreddit (`reddit_cursors`: fullname + created_utc of the
+  newest stored post). Requests pass `before=<fullname>` so Reddit only
+  returns newer posts, paging forward while pages come back full. Every
+  RESYNC_EVERY polls (and when there is no cursor yet) a subreddit is
+  fetched without `before` and filtered by the cursor time instead, in
+  case the cursor post was deleted (Reddit then returns nothing for it).
+- Conditional requests: an ETag from the previous identical request is
+  sent as If-None-Match; 304 counts as "no new posts".
+- Rate limits: `x-ratelimit-remaining` / `x-ratelimit-reset` drive a
+  shared pacer that spreads the remaining budget over the window (keeping
+  RATE_RESERVE in hand); 429 honours Retry-After.
+- Adaptive scheduling: a subreddit that had new posts is polled sooner
+  (interval halves, MIN_INTERVAL floor), a quiet one backs off (x1.5 up
+  to MAX_INTERVAL).
+- New posts from one round are scored with one score_texts call and
+  written with one bulk upsert; cursors advance in the same transaction.
+
+REDDIT_BASE_URL points it at another server, e.g. the local stub:
+python scripts/reddit_stub.py smoke
+
+Run:
+python -m src.ingestion.reddit_poller --subreddits CryptoCurrency,Bitcoin,ethereum
+python -m src.ingestion.reddit_poller --once
+"""
+
+import argparse
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import Column, DateTime, String, Table, select
+from urllib3.util.retry import Retry
+
+from src.ingestion import reddit_public_json_verbose as reddit
+from src.observability import metrics, readiness
+from src.storage import db as dbmod
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+BASE_URL = os.getenv("REDDIT_BASE_URL", "https://www.reddit.com").rstrip("/")
+PAGE_LIMIT = 100           # Reddit's maximum per listing request
+MAX_PAGES = 5              # pages followed per poll when a subreddit is busy
+MIN_INTERVAL = 15.0        # seconds
+MAX_INTERVAL = 300.0
+START_INTERVAL = 60.0
+RESYNC_EVERY = 20          # polls between cursor-less fetches
+RATE_RESERVE = 5           # requests left untouched in each rate-limit window
+REQUEST_TIMEOUT = 15
+POOL_SIZE = 8              # HTTP connections == fetch threads
+
+REQUESTS = metrics.counter("reddit_requests_total", "Listing requests by HTTP status", ["subreddit", "status"])
+REQUEST_SECONDS = metrics.histogram("reddit_request_seconds", "Listing request latency", ["subreddit"])
+POSTS_NEW = metrics.counter("reddit_posts_new_total", "New posts fetched", ["subreddit"])
+RATE_REMAINING = metrics.gauge("reddit_ratelimit_remaining", "x-ratelimit-remaining of the last response")
+
+reddit_cursors = Table(
+    "reddit_cursors", dbmod.metadata,
+    Column("subreddit", String, primary_key=True),
+    Column("last_id", String),
+    Column("last_created_utc", DateTime(timezone=True)),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+
+def _create_tables():
+    dbmod.ensure_schema()
+    dbmod.metadata.create_all(dbmod.engine, tables=[reddit_cursors])
+
+
+schema = readiness.component("db.reddit_cursors", _create_tables)
+
+
+def ensure_schema():
+    schema.get()
+
+
+class RateLimited(Exception):
+    pass
+
+
+# ---------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------
+class RateLimiter:
+    """
+    Paces requests from the x-ratelimit-* headers of the latest response:
+    the `remaining` budget (minus `reserve`) is spread evenly until the
+    window resets. Thread-safe; sleeping happens outside the lock.
+    """
+
+    def __init__(self, reserve: int = RATE_RESERVE):
+        self.reserve = reserve
+        self.remaining: Optional[float] = None
+        self.reset_at = 0.0
+        self.next_at = 0.0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self.next_at)
+            spacing = 0.0
+            if self.remaining is not None and self.reset_at > start:
+                usable = self.remaining - self.reserve
+                if usable < 1:
+                    start = self.reset_at     # budget spent: wait for the new window
+                else:
+                    spacing = (self.reset_at - start) / usable
+                    self.remaining -= 1
+            self.next_at = start + spacing
+            delay = start - now
+            self.waited += delay
+        if delay > 0:
+            time.sleep(delay)
+
+    def update(self, headers):
+        try:
+            remaining = float(headers["x-ratelimit-remaining"])
+            reset = float(headers["x-ratelimit-reset"])
+        except (KeyError, TypeError, ValueError):
+            return
+        with self._lock:
+            self.remaining = remaining
+            self.reset_at = time.monotonic() + reset
+        RATE_REMAINING.set(remaining)
+
+    def penalize(self, seconds: float):
+        with self._lock:
+            self.next_at = max(self.next_at, time.monotonic() + seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "remaining": self.remaining,
+            "reset_in": max(0.0, self.reset_at - time.monotonic()) if self.remaining is not None else None,
+            "waited_s": round(self.waited, 2),
+        }
+
+
+# ---------------------------------------------------
+# Per-subreddit state
+# ---------------------------------------------------
+class SubredditState:
+    def __init__(self, name: str, last_id: Optional[str] = None, last_created: Optional[float] = None):
+        self.name = name
+        self.last_id = last_id
+        self.last_created = last_created    # epoch seconds
+        self.etag: Optional[str] = None
+        self.interval = START_INTERVAL
+        self.next_due = 0.0
+        self.polls = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.new_posts = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    def reschedule(self, new: int, full_page: bool):
+        if full_page:
+            self.interval = MIN_INTERVAL
+        elif new:
+            self.interval = max(MIN_INTERVAL, self.interval / 2)
+        else:
+            self.interval = min(MAX_INTERVAL, self.interval * 1.5)
+        self.next_due = time.monotonic() + self.interval
+
+    def snapshot(self) -> dict:
+        return {
+            "cursor": self.last_id,
+            "interval_s": round(self.interval, 1),
+            "polls": self.polls,
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "new_posts": self.new_posts,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+def make_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    s = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                  allowed_methods=frozenset(["GET"]))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update(reddit.HEADERS)
+    return s
+
+
+def load_cursors(subreddits: List[str]) -> Dict[str, SubredditState]:
+    """Stored cursors; subreddits without one start from their newest stored post."""
+    ensure_schema()
+    states = {}
+    with dbmod.read_engine.connect() as conn:
+        rows = {r.subreddit: r for r in conn.execute(
+            select(reddit_cursors).where(reddit_cursors.c.subreddit.in_(subreddits))
+        )}
+    for sub in subreddits:
+        r = rows.get(sub)
+        if r is not None and r.last_created_utc is not None:
+            ts = r.last_created_utc
+            ts = ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+            states[sub] = SubredditState(sub, r.last_id, ts.timestamp())
+        else:
+            states[sub] = SubredditState(sub, None, reddit.get_latest_ts_from_db(sub))
+    return states
+
+
+# ---------------------------------------------------
+# Poller
+# ---------------------------------------------------
+class RedditPoller:
+    def __init__(self, subreddits: List[str], base_url: str = BASE_URL, pool_size: int = POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.session = make_session(pool_size)
+        self.limiter = RateLimiter()
+        self.pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="reddit")
+        self.states = load_cursors(subreddits)
+        self.rounds = 0
+        self.inserted = 0
+
+    def _get(self, st: SubredditState, params: dict, etag: Optional[str]):
+        self.limiter.acquire()
+        headers = {"If-None-Match": etag} if etag else None
+        with REQUEST_SECONDS.labels(st.name).time():
+            resp = self.session.get(f"{self.base_url}/r/{st.name}/new.json", params=params,
+                                    headers=headers, timeout=REQUEST_TIMEOUT)
+        st.requests += 1
+        REQUESTS.labels(st.name, resp.status_code).inc()
+        self.limiter.update(resp.headers)
+        if resp.status_code == 429:
+            wait = float(resp.headers.get("retry-after") or resp.headers.get("x-ratelimit-reset") or 60)
+            self.limiter.penalize(wait)
+            raise RateLimited(f"r/{st.name} HTTP 429, retry in {wait:.0f}s")
+        if resp.status_code == 304:
+            return resp, []
+        resp.raise_for_status()
+        children = resp.json().get("data", {}).get("children", [])
+        return resp, [ch.get("data", {}) for ch in children]
+
+    def fetch_new(self, st: SubredditState):
+        """(new posts, full_page, etag) since the subreddit's cursor. The
+        page-0 ETag is returned rather than stored: it may only be sent
+        again once these posts are written (see poll_once)."""
+        resync = st.last_id is None or st.polls % RESYNC_EVERY == 0
+        params = {"limit": PAGE_LIMIT, "raw_json": 1}
+        if not resync:
+            params["before"] = st.last_id
+
+        posts, full_page, etag = [], False, st.etag
+        for page in range(MAX_PAGES):
+            resp, batch = self._get(st, params, st.etag if page == 0 else None)
+            if resp.status_code == 304:
+                st.not_modified += 1
+                break
+            if page == 0:
+                etag = resp.headers.get("ETag")
+            posts.extend(batch)
+            full_page = len(batch) >= PAGE_LIMIT
+            if resync or not full_page:
+                break
+            # newest first: the next page is everything newer than batch[0]
+            params["before"] = batch[0].get("name") or f"t3_{batch[0].get('id')}"
+
+        if st.last_created is not None:
+            posts = [d for d in posts if (d.get("created_utc") or 0) >= st.last_created
+                     and d.get("name") != st.last_id]
+        seen, out = set(), []
+        for d in posts:
+            if d.get("id") not in seen:
+                seen.add(d.get("id"))
+                out.append(d)
+        return out, full_page, etag
+
+    @staticmethod
+    def _cursor(posts: List[dict]):
+        """(last_id, last_created) of the newest post, or None without posts."""
+        if not posts:
+            return None
+        newest = max(posts, key=lambda d: d.get("created_utc") or 0)
+        return newest.get("name") or f"t3_{newest.get('id')}", float(newest.get("created_utc") or 0)
+
+    def poll_once(self, states: Optional[List[SubredditState]] = None) -> int:
+        """Poll `states` (default: all) concurrently; returns posts inserted.
+        Cursors and ETags move only once the posts and cursor rows have
+        committed, so a failed write re-fetches the same posts next round
+        (instead of a 304 for the unchanged request)."""
+        states = list(self.states.values()) if states is None else states
+
+        def work(st):
+            try:
+                return st, self.fetch_new(st), None
+            except Exception as e:
+                return st, ([], False, None), e
+
+        results = list(self.pool.map(work, states))
+        all_posts, moved, etags = [], [], []
+        for st, (posts, full_page, etag), err in results:
+            st.polls += 1
+            if err is not None:
+                st.errors += 1
+                st.last_error = f"{type(err).__name__}: {err}"
+                print(f"[reddit_poller] r/{st.name} error: {st.last_error}")
+                st.reschedule(0, False)
+                continue
+            all_posts.extend(posts)
+            st.new_posts += len(posts)
+            POSTS_NEW.labels(st.name).inc(len(posts))
+            cursor = self._cursor(posts)
+            if cursor is not None:
+                moved.append((st, cursor))
+            else:
+                etags.append((st, etag))
+            st.reschedule(len(posts), full_page)
+
+        inserted = 0
+        if all_posts or moved:
+            rows = reddit.posts_to_rows(all_posts)
+            now = datetime.now(timezone.utc)
+            with dbmod.engine.begin() as conn:
+                inserted = dbmod.upsert_reddit_posts_bulk(rows, conn=conn)["inserted"]
+                dbmod.bulk_insert(
+                    reddit_cursors,
+                    [{"subreddit": st.name, "last_id": last_id,
+                      "last_created_utc": datetime.fromtimestamp(last_created, tz=timezone.utc),
+                      "updated_at": now} for st, (last_id, last_created) in moved],
+                    on_conflict="update", conflict_cols=["subreddit"],
+                    update_cols=["last_id", "last_created_utc", "updated_at"], conn=conn,
+                )
+            for st, (last_id, last_created) in moved:
+                st.last_id, st.last_created = last_id, last_created
+                st.etag = None  # the next request has different parameters
+        for st, etag in etags:
+            st.etag = etag
+        self.rounds += 1
+        self.inserted += inserted
+        return inserted
+
+    def run(self, stop: Optional[threading.Event] = None):
+        stop = stop or threading.Event()
+        print(f"[reddit_poller] polling {', '.join(self.states)} via {self.base_url}")
+        while not stop.is_set():
+            now = time.monotonic()
+            due = [st for st in self.states.values() if st.next_due <= now]
+            if due:
+                t0 = time.perf_counter()
+                try:
+                    n = self.poll_once(due)
+                    print(f"[reddit_poller] {len(due)} subreddits, {n} new posts in "
+                          f"{(time.perf_counter() - t0) * 1000:.0f} ms, rate={self.limiter.snapshot()}")
+                except Exception:
+                    traceback.print_exc()
+            wake = min(st.next_due for st in self.states.values())
+            stop.wait(max(0.5, wake - time.monotonic()))
+
+    def snapshot(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "inserted": self.inserted,
+            "rate_limit": self.limiter.snapshot(),
+            "subreddits": {n: st.snapshot() for n, st in self.states.items()},
+        }
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        self.session.close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="concurrent Reddit /new poller")
+    ap.add_argument("--subreddits", default=",".join(reddit.SUBREDDITS))
+    ap.add_argument("--base-url", default=BASE_URL)
+    ap.add_argument("--once", action="store_true", help="poll every subreddit once and exit")
+    args = ap.parse_args()
+
+    metrics.serve_from_env()
+    poller = RedditPoller([s for s in args.subreddits.split(",") if s], base_url=args.base_url)
+    try:
+        if args.once:
+            print(f"[reddit_poller] inserted {poller.poll_once()} posts")
+            print(poller.snapshot())
+        else:
+            poller.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        poller.close()
@@ -1,10 +1,10 @@
 import time, requests, sys
 from datetime import datetime, timezone
-from src.processing.sentiment import score_text
+from src.processing.sentiment import score_text, score_texts
 from src.storage import db as dbmod
 
 SUBREDDITS = ["CryptoCurrency", "Bitcoin", "ethereum"]
-HEADERS = {\"User-Agent\": \"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36\"}
+HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36"}
 LIMIT = 50
 
 def fetch_new(subreddit, after_utc=None):
@@ -30,47 +30,72 @@ def fetch_new(subreddit, after_utc=None):
         print("Fetch exception:", e)
         return []
 
-def get_latest_ts_from_db():
+def get_latest_ts_from_db(subreddit=None):
+    """Newest created_utc (epoch) stored for `subreddit` (None: any subreddit)."""
     try:
-        with dbmod.engine.connect() as conn:
-            row = conn.execute(dbmod.reddit_posts.select().order_by(dbmod.reddit_posts.c.created_utc.desc()).limit(1)).first()
+        q = dbmod.reddit_posts.select().order_by(dbmod.reddit_posts.c.created_utc.desc()).limit(1)
+        if subreddit:
+            q = q.where(dbmod.reddit_posts.c.subreddit == subreddit)
+        with dbmod.read_engine.connect() as conn:
+            row = conn.execute(q).first()
             if row:
                 ts = row._mapping['created_utc']
-                print("Latest reddit_posts.created_utc in DB:", ts)
+                if ts.tzinfo is None:
+                    ts = ts.replace(tzinfo=timezone.utc)  # SQLite returns naive UTC
+                print(f"Latest reddit_posts.created_utc in DB ({subreddit or 'all'}):", ts)
                 return int(ts.timestamp())
     except Exception as e:
         print("Could not read latest ts from DB:", e)
     return None
 
-def insert_post(d):
-    post_id = d.get("id")
-    subreddit = d.get("subreddit")
+def post_text(d):
     title = d.get("title","")[:200]
     selftext = d.get("selftext","")[:300]
-    text = (title + " " + selftext).strip()
-    created_dt = datetime.fromtimestamp(int(d.get("created_utc",0)), tz=timezone.utc)
-    sentiment = float(score_text(text))
-    dbid = f"t3_{post_id}"
+    return (title + " " + selftext).strip()
+
+def post_to_row(d, sentiment=None):
+    """Map a reddit listing child's data to a reddit_posts row."""
+    text = post_text(d)
+    return {
+        "id": f"t3_{d.get('id')}",
+        "subreddit": d.get("subreddit"),
+        "text": text,
+        "sentiment": float(score_text(text) if sentiment is None else sentiment),
+        "created_utc": datetime.fromtimestamp(int(d.get("created_utc",0)), tz=timezone.utc),
+    }
+
+def posts_to_rows(posts):
+    """post_to_row for a whole listing, scored in one batch."""
+    scores = score_texts(post_text(d) for d in posts)
+    return [post_to_row(d, s) for d, s in zip(posts, scores)]
+
+def insert_post(d):
+    row = post_to_row(d)
+    dbid = row["id"]
     try:
-        dbmod.insert_reddit_post(dbid, subreddit, text, sentiment, created_dt)
-        print("Inserted", dbid, "sentiment=", sentiment)
-        return True
+        res = dbmod.upsert_reddit_posts_bulk([row])
     except Exception as e:
         print("DB insert failed for", dbid, e)
         return False
+    if res["inserted"]:
+        print("Inserted", dbid, "sentiment=", row["sentiment"])
+    else:
+        print("Already stored", dbid)
+    return bool(res["inserted"])
 
 def run_once_verbose():
-    latest_ts = get_latest_ts_from_db()
-    print("Latest timestamp used for filtering (epoch) =", latest_ts)
     total = 0
     for sub in SUBREDDITS:
+        # per subreddit: a global max would skip posts of quieter subreddits
+        latest_ts = get_latest_ts_from_db(sub)
+        print(f"Latest timestamp used for filtering r/{sub} (epoch) =", latest_ts)
         posts = fetch_new(sub, after_utc=latest_ts)
         print(f"Fetched {len(posts)} posts from r/{sub}")
         for p in posts[:10]:
             print("Sample id:", p.get("id"), "title:", (p.get("title") or "")[:120])
-            ok = insert_post(p)
-            if ok:
-                total += 1
+        res = dbmod.upsert_reddit_posts_bulk(posts_to_rows(posts))
+        print(f"r/{sub}: inserted {res['inserted']}, already stored {res['skipped']}")
+        total += res["inserted"]
     print("Total inserted this run:", total)
     return total
 
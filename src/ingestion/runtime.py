@@ -0,0 +1,479 @@
+"""
+Single-process asyncio ingestion runtime.
+
+Runs the Coinbase websocket feed and the Reddit JSON poller as coroutines
+on one event loop. Both sources push rows into shared async DB sinks that
+batch them and run the blocking SQLAlchemy writes in a worker thread.
+
+Run:
+python -m src.ingestion.runtime --symbols BTC-USD,ETH-USD --subreddits Bitcoin,ethereum
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import signal
+import statistics
+import time
+import traceback
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from src.ingestion import coinbase_ws
+from src.ingestion import reddit_public_json_verbose as reddit
+from src.ingestion.ticker_decode import MESSAGES_DROPPED, MESSAGES_PARSED, MESSAGES_RECEIVED, decode_ticker
+from src.ingestion.reddit_poller import POSTS_NEW
+from src.storage import db as dbmod
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+SINK_BATCH = 500
+SINK_LATENCY = 0.25        # seconds
+SINK_QUEUE = 50_000
+REDDIT_INTERVAL = 60       # seconds between polling rounds
+REDDIT_SEEN = 5_000        # post ids remembered across rounds (oldest dropped first)
+HEALTH_INTERVAL = 60       # seconds between health lines
+LAG_PROBE_INTERVAL = 0.05  # seconds between event-loop lag probes
+WS_CLOSE_GRACE = 2.0       # seconds allowed for the close handshake on shutdown
+
+
+# ---------------------------------------------------
+# Health
+# ---------------------------------------------------
+class SourceHealth:
+    """Mutable health record for one source; only touched from the loop."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.status = "starting"
+        self.events = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.last_event_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def event(self, n: int = 1):
+        self.status = "up"
+        self.events += n
+        self.last_event_at = time.time()
+
+    def error(self, exc: BaseException):
+        self.errors += 1
+        self.last_error = f"{type(exc).__name__}: {exc}"
+
+    def snapshot(self) -> dict:
+        age = time.time() - self.last_event_at if self.last_event_at else None
+        return {
+            "status": self.status,
+            "events": self.events,
+            "errors": self.errors,
+            "reconnects": self.reconnects,
+            "seconds_since_event": age,
+            "last_error": self.last_error,
+        }
+
+
+class LoopLagMonitor:
+    """Measures how late the loop wakes up a sleeping coroutine."""
+
+    def __init__(self, interval: float = LAG_PROBE_INTERVAL, keep: int = 2000):
+        self.interval = interval
+        self.samples = deque(maxlen=keep)
+
+    async def run(self, stop: asyncio.Event):
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append((loop.time() - t0 - self.interval) * 1000.0)
+
+    def snapshot(self) -> dict:
+        if not self.samples:
+            return {"samples": 0}
+        s = sorted(self.samples)
+        return {
+            "samples": len(s),
+            "p50_ms": statistics.median(s),
+            "p99_ms": s[min(len(s) - 1, int(len(s) * 0.99))],
+            "max_ms": s[-1],
+        }
+
+
+# ---------------------------------------------------
+# Shared async DB sink
+# ---------------------------------------------------
+def _insert_ticks(rows):
+    dbmod.insert_tickers_bulk(rows, chunk_size=len(rows))
+
+
+def _insert_posts(rows):
+    # Posts can be re-fetched; duplicates are skipped by ON CONFLICT
+    dbmod.upsert_reddit_posts_bulk(rows, chunk_size=len(rows))
+
+
+class AsyncDBSink:
+    """
+    Bounded asyncio queue drained by one task. Batches are flushed by size or
+    age and written with `write_fn` in a worker thread so the loop never
+    blocks on the database. `put` awaits while the queue is full.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        write_fn: Callable[[List[dict]], None],
+        max_batch: int = SINK_BATCH,
+        max_latency: float = SINK_LATENCY,
+        max_queue: int = SINK_QUEUE,
+    ):
+        self.name = name
+        self.write_fn = write_fn
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.rows_written = 0
+        self.batches = 0
+        self.failed = 0
+        self.flush_ms = deque(maxlen=500)
+
+    async def put(self, row: dict):
+        await self.queue.put(row)
+
+    async def run(self, stop: asyncio.Event):
+        while not (stop.is_set() and self.queue.empty()):
+            try:
+                first = await asyncio.wait_for(self.queue.get(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._flush(batch)
+
+        # cooperative shutdown: write anything still queued
+        rest = []
+        while not self.queue.empty():
+            rest.append(self.queue.get_nowait())
+        for i in range(0, len(rest), self.max_batch):
+            await self._flush(rest[i:i + self.max_batch])
+
+    async def _flush(self, batch):
+        t0 = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.write_fn, batch)
+        except Exception:
+            self.failed += len(batch)
+            print(f"[runtime] sink {self.name} flush failed")
+            print(traceback.format_exc())
+            return
+        self.flush_ms.append((time.perf_counter() - t0) * 1000.0)
+        self.rows_written += len(batch)
+        self.batches += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "rows_written": self.rows_written,
+            "batches": self.batches,
+            "failed": self.failed,
+            "avg_flush_ms": statistics.fmean(self.flush_ms) if self.flush_ms else 0.0,
+        }
+
+
+# ---------------------------------------------------
+# Sources
+# ---------------------------------------------------
+async def _sleep_or_stop(stop: asyncio.Event, seconds: float):
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _read_ticks(ws, sink: "AsyncDBSink", health: "SourceHealth"):
+    received = MESSAGES_RECEIVED.labels("runtime")
+    ignored = MESSAGES_DROPPED.labels("runtime", "non_ticker")
+    async for msg in ws:
+        if msg.type != aiohttp.WSMsgType.TEXT:
+            if msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                break
+            continue
+        received.inc()
+        tick = decode_ticker(msg.data)
+        if tick is None:
+            ignored.inc()
+            continue
+        MESSAGES_PARSED.labels("runtime", tick["symbol"]).inc()
+        await sink.put(tick)
+        health.event()
+
+
+async def coinbase_source(
+    products: List[str],
+    sink: AsyncDBSink,
+    health: SourceHealth,
+    stop: asyncio.Event,
+    session: aiohttp.ClientSession,
+    url: str = coinbase_ws.WS_URL,
+):
+    attempt = 0
+    while not stop.is_set():
+        try:
+            async with session.ws_connect(url, heartbeat=20) as ws:
+                await ws.send_str(coinbase_ws.subscribe_message(products))
+                attempt = 0
+                health.status = "up"
+                print(f"[runtime] coinbase connected → {len(products)} products")
+                # race the reader against `stop`, so a quiet or half-open
+                # socket does not hold up shutdown until the next frame
+                reader = asyncio.create_task(_read_ticks(ws, sink, health))
+                stopper = asyncio.create_task(stop.wait())
+                try:
+                    await asyncio.wait({reader, stopper}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    stopper.cancel()
+                    if not reader.done():
+                        reader.cancel()
+                        with contextlib.suppress(asyncio.TimeoutError):
+                            await asyncio.wait_for(ws.close(), WS_CLOSE_GRACE)
+                if reader.done() and not reader.cancelled():
+                    reader.result()  # re-raise a reader error
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            health.error(e)
+            print(f"[runtime] coinbase error: {e}")
+
+        if stop.is_set():
+            break
+        health.status = "reconnecting"
+        health.reconnects += 1
+        delay = coinbase_ws.backoff_delay(attempt)
+        attempt += 1
+        await _sleep_or_stop(stop, delay)
+    health.status = "stopped"
+
+
+async def _fetch_subreddit(session: aiohttp.ClientSession, subreddit: str):
+    url = f"https://www.reddit.com/r/{subreddit}/new.json"
+    async with session.get(
+        url,
+        params={"limit": reddit.LIMIT},
+        headers=reddit.HEADERS,
+        timeout=aiohttp.ClientTimeout(total=15),
+    ) as resp:
+        if resp.status != 200:
+            raise RuntimeError(f"r/{subreddit} HTTP {resp.status}")
+        body = await resp.json(content_type=None)
+    return [ch.get("data", {}) for ch in body.get("data", {}).get("children", [])]
+
+
+async def reddit_source(
+    subreddits: List[str],
+    sink: AsyncDBSink,
+    health: SourceHealth,
+    stop: asyncio.Event,
+    session: aiohttp.ClientSession,
+    interval: float = REDDIT_INTERVAL,
+):
+    """
+    Lightweight /new poller for the single-loop runtime: one aiohttp GET per
+    subreddit per round, rows handed to the shared posts sink.
+
+    It deliberately does not wrap RedditPoller: that poller is blocking
+    (requests + thread pool) and writes posts and its reddit_cursors rows
+    in its own transaction, so it would bypass the sink and need a thread of
+    its own. Use `python -m src.ingestion.reddit_poller` when you need
+    its `before` cursors and rate-limit pacing; this source filters by the
+    newest stored created_utc and a bounded set of recently seen ids.
+    """
+    seen: "OrderedDict[str, None]" = OrderedDict()
+    while not stop.is_set():
+        latest = await asyncio.gather(
+            *(asyncio.to_thread(reddit.get_latest_ts_from_db, s) for s in subreddits)
+        )
+        results = await asyncio.gather(
+            *(_fetch_subreddit(session, s) for s in subreddits),
+            return_exceptions=True,
+        )
+        new_posts = []
+        for sub, latest_ts, posts in zip(subreddits, latest, results):
+            if isinstance(posts, BaseException):
+                health.error(posts)
+                print(f"[runtime] reddit r/{sub} error: {posts}")
+                continue
+            new = 0
+            for d in posts:
+                if latest_ts and (d.get("created_utc") or 0) <= latest_ts:
+                    continue
+                if d.get("id") in seen:
+                    continue
+                seen[d.get("id")] = None
+                new_posts.append(d)
+                new += 1
+            health.event(new)
+            POSTS_NEW.labels(sub).inc(new)
+        while len(seen) > REDDIT_SEEN:
+            seen.popitem(last=False)
+        if new_posts:
+            # sentiment scoring (VADER or a transformer) is CPU-bound: keep it off the loop
+            for row in await asyncio.to_thread(reddit.posts_to_rows, new_posts):
+                await sink.put(row)
+        await _sleep_or_stop(stop, interval)
+    health.status = "stopped"
+
+
+async def replay_source(
+    frames: Iterable[str],
+    sink: AsyncDBSink,
+    health: SourceHealth,
+    stop: asyncio.Event,
+    rate: Optional[float] = None,
+):
+    """
+    Feed recorded/synthetic raw frames through the same decode path as the
+    websocket source. `rate` is frames/sec; None replays as fast as possible
+    (still yielding to the loop between chunks).
+    """
+    health.status = "up"
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for i, frame in enumerate(frames):
+        if stop.is_set():
+            break
+        tick = decode_ticker(frame)
+        if tick is not None:
+            await sink.put(tick)
+            health.event()
+        if rate:
+            ahead = start + (i + 1) / rate - loop.time()
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+        elif i % 256 == 0:
+            await asyncio.sleep(0)
+    health.status = "done"
+
+
+# ---------------------------------------------------
+# Runtime
+# ---------------------------------------------------
+class IngestionRuntime:
+    def __init__(self):
+        self.stop_event: Optional[asyncio.Event] = None
+        self.health: Dict[str, SourceHealth] = {}
+        self.lag = LoopLagMonitor()
+        self.tick_sink: Optional[AsyncDBSink] = None
+        self.post_sink: Optional[AsyncDBSink] = None
+        self._sources = []
+
+    def add_source(self, name: str, factory):
+        """`factory(sink_map, health, stop, session)` -> coroutine."""
+        self.health[name] = SourceHealth(name)
+        self._sources.append((name, factory))
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    def snapshot(self) -> dict:
+        return {
+            "sources": {n: h.snapshot() for n, h in self.health.items()},
+            "sinks": {
+                s.name: s.snapshot() for s in (self.tick_sink, self.post_sink) if s
+            },
+            "loop_lag": self.lag.snapshot(),
+        }
+
+    async def _report(self, interval: float):
+        while not self.stop_event.is_set():
+            await _sleep_or_stop(self.stop_event, interval)
+            print("[runtime] health:", json.dumps(self.snapshot(), default=str))
+
+    async def run(self, health_interval: float = HEALTH_INTERVAL):
+        self.stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass  # e.g. Windows or non-main thread
+
+        self.tick_sink = AsyncDBSink("tickers", _insert_ticks)
+        self.post_sink = AsyncDBSink("reddit_posts", _insert_posts, max_batch=100)
+        sinks = {"tickers": self.tick_sink, "reddit_posts": self.post_sink}
+
+        async with aiohttp.ClientSession() as session:
+            sink_tasks = [
+                asyncio.create_task(s.run(self.stop_event)) for s in sinks.values()
+            ]
+            aux = [
+                asyncio.create_task(self.lag.run(self.stop_event)),
+                asyncio.create_task(self._report(health_interval)),
+            ]
+            sources = [
+                asyncio.create_task(
+                    factory(sinks, self.health[name], self.stop_event, session),
+                    name=name,
+                )
+                for name, factory in self._sources
+            ]
+
+            # sources run until stop is requested (or they finish, e.g. replay)
+            await asyncio.gather(*sources, return_exceptions=True)
+            self.stop_event.set()
+            await asyncio.gather(*sink_tasks, *aux, return_exceptions=True)
+
+        print("[runtime] stopped:", json.dumps(self.snapshot(), default=str))
+
+
+def build_runtime(
+    symbols: List[str],
+    subreddits: List[str],
+    url: str = coinbase_ws.WS_URL,
+    reddit_interval: float = REDDIT_INTERVAL,
+) -> IngestionRuntime:
+    rt = IngestionRuntime()
+    if symbols:
+        rt.add_source(
+            "coinbase",
+            lambda sinks, h, stop, session: coinbase_source(
+                symbols, sinks["tickers"], h, stop, session, url=url
+            ),
+        )
+    if subreddits:
+        rt.add_source(
+            "reddit",
+            lambda sinks, h, stop, session: reddit_source(
+                subreddits, sinks["reddit_posts"], h, stop, session,
+                interval=reddit_interval,
+            ),
+        )
+    return rt
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="asyncio ingestion runtime")
+    ap.add_argument("--symbols", default=",".join(coinbase_ws.SYMBOLS))
+    ap.add_argument("--subreddits", default=",".join(reddit.SUBREDDITS))
+    ap.add_argument("--url", default=coinbase_ws.WS_URL)
+    ap.add_argument("--reddit-interval", type=float, default=REDDIT_INTERVAL)
+    args = ap.parse_args()
+
+    rt = build_runtime(
+        [s for s in args.symbols.split(",") if s],
+        [s for s in args.subreddits.split(",") if s],
+        url=args.url,
+        reddit_interval=args.reddit_interval,
+    )
+    asyncio.run(rt.run())
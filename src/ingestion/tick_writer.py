@@ -0,0 +1,267 @@
+"""
+Shared, batched writer for ticker rows.
+
+Producers (the websocket handlers) call `put(row)`; a single background
+thread drains the queue and writes each batch with one executemany
+inside one transaction. A batch is flushed when it reaches `max_batch`
+rows or when its oldest row is `max_latency` seconds old. A batch whose
+write fails is retried up to `max_retries` times with a growing backoff
+before its rows are counted as failed; the writer takes no new rows while
+it retries, so producers see backpressure instead of losing data.
+"""
+
+import atexit
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from src.ingestion.ticker_decode import MESSAGES_DROPPED
+from src.observability import metrics
+from src.storage import db as dbmod
+
+# ---------------------------------------------------
+# Defaults
+# ---------------------------------------------------
+MAX_BATCH = 500          # rows per executemany
+MAX_LATENCY = 0.25       # seconds a row may wait before a flush
+MAX_QUEUE = 50_000       # bounded queue -> producers block when full
+PUT_TIMEOUT = 5.0        # seconds a producer blocks before dropping a row
+RATE_WINDOW = 10.0       # seconds used for the rows/sec gauge
+MAX_RETRIES = 3          # extra attempts for a batch whose write failed
+RETRY_BACKOFF = 0.5      # seconds before the first retry, doubled per attempt
+
+_STOP = object()
+
+_queue_full = MESSAGES_DROPPED.labels("tick_writer", "queue_full")
+_write_failed = MESSAGES_DROPPED.labels("tick_writer", "write_failed")
+FLUSH_RETRIES = metrics.counter("tick_writer_flush_retries_total", "Tick batch writes retried after a failure")
+FLUSH_SECONDS = metrics.histogram("tick_writer_flush_seconds", "Tick batch write incl. commit")
+QUEUE_DEPTH = metrics.gauge("tick_writer_queue_depth", "Rows waiting in the shared tick writer")
+
+
+class TickWriter:
+    def __init__(
+        self,
+        engine=None,
+        table=None,
+        max_batch: int = MAX_BATCH,
+        max_latency: float = MAX_LATENCY,
+        max_queue: int = MAX_QUEUE,
+        put_timeout: Optional[float] = PUT_TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        retry_backoff: float = RETRY_BACKOFF,
+    ):
+        self.engine = engine if engine is not None else dbmod.engine
+        self.table = table if table is not None else dbmod.tickers
+        if table is None:
+            dbmod.ensure_schema()  # before the flush thread holds the writer connection
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._started_at = None
+
+        # counters (written by producers and the writer thread: under _lock)
+        self.rows_enqueued = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.rows_failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.max_batch_seen = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self._recent = deque()  # (monotonic time, rows) per flush
+
+    # ---------------------------------------------------
+    # Lifecycle
+    # ---------------------------------------------------
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._started_at = time.monotonic()
+            self._thread = threading.Thread(
+                target=self._run, name="tick-writer", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10.0):
+        """Flush everything still queued, then stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._thread = None
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ---------------------------------------------------
+    # Producer side
+    # ---------------------------------------------------
+    def put(self, row: dict) -> bool:
+        """
+        Enqueue one row. Blocks (backpressure) while the queue is full, and
+        drops the row after `put_timeout` seconds. Returns False if dropped.
+        """
+        try:
+            self._queue.put(row, block=True, timeout=self.put_timeout)
+        except queue.Full:
+            with self._lock:
+                self.rows_dropped += 1
+            _queue_full.inc()
+            return False
+        with self._lock:
+            self.rows_enqueued += 1
+        return True
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    # ---------------------------------------------------
+    # Consumer side
+    # ---------------------------------------------------
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_latency
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = (
+                        self._queue.get(timeout=remaining)
+                        if remaining > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+
+        # drain whatever producers managed to enqueue before the stop marker
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        for i in range(0, len(leftover), self.max_batch):
+            self._flush(leftover[i:i + self.max_batch])
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        for attempt in range(self.max_retries + 1):
+            t0 = time.perf_counter()
+            try:
+                with self.engine.begin() as conn:
+                    dbmod.bulk_insert(self.table, batch, on_conflict="nothing",
+                                      chunk_size=len(batch), conn=conn)
+                break
+            except Exception:
+                print(f"[tick_writer] flush of {len(batch)} rows failed "
+                      f"(attempt {attempt + 1}/{self.max_retries + 1})")
+                print(traceback.format_exc())
+            if attempt == self.max_retries:
+                with self._lock:
+                    self.rows_failed += len(batch)
+                _write_failed.inc(len(batch))
+                return
+            # inserts skip existing rows, so a retry after an unclear commit is safe
+            with self._lock:
+                self.retries += 1
+            FLUSH_RETRIES.inc()
+            time.sleep(self.retry_backoff * 2 ** attempt)
+        elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        FLUSH_SECONDS.observe(elapsed_ms / 1000.0)
+
+        n = len(batch)
+        now = time.monotonic()
+        with self._lock:
+            self.rows_written += n
+            self.batches += 1
+            self.last_batch_size = n
+            self.max_batch_seen = max(self.max_batch_seen, n)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+            self._recent.append((now, n))
+            while self._recent and now - self._recent[0][0] > RATE_WINDOW:
+                self._recent.popleft()
+
+    # ---------------------------------------------------
+    # Stats
+    # ---------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> dict:
+        now = time.monotonic()
+        recent = [n for t, n in self._recent if now - t <= RATE_WINDOW]
+        uptime = now - self._started_at if self._started_at else 0.0
+        window = min(RATE_WINDOW, uptime) or 1.0
+        return {
+            "rows_enqueued": self.rows_enqueued,
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "rows_failed": self.rows_failed,
+            "retries": self.retries,
+            "queue_depth": self.qsize(),
+            "batches": self.batches,
+            "rows_per_sec": sum(recent) / window,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": self.rows_written / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": self.total_flush_ms / self.batches if self.batches else 0.0,
+            "max_flush_ms": self.max_flush_ms,
+        }
+
+
+# ---------------------------------------------------
+# Process-wide shared writer
+# ---------------------------------------------------
+_shared: Optional[TickWriter] = None
+_shared_lock = threading.Lock()
+
+
+def get_writer() -> TickWriter:
+    """Return the process-wide writer, starting it on first use."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                _shared = TickWriter().start()
+                QUEUE_DEPTH.set_function(_shared.qsize)
+                atexit.register(_shared.stop)
+    return _shared
@@ -0,0 +1,314 @@
+"""
+In-process metrics: counters, gauges and histograms, rendered in the
+Prometheus text exposition format (0.0.4).
+
+    from src.observability import metrics
+
+    FRAMES = metrics.counter("ingest_messages_received_total", "Raw frames received", ["source"])
+    FRAMES.labels("coinbase_ws").inc()
+
+    DB_WRITE = metrics.histogram("db_write_seconds", "bulk_insert duration", ["table"])
+    with DB_WRITE.labels("tickers").time():
+        ...
+
+Metric constructors are get-or-create on the name, so modules can declare
+the metrics they touch at import time. Updates take one short lock per
+metric child; there is no background thread.
+
+The API serves the registry at GET /metrics (main.py). Processes without
+an HTTP server (websocket ingestion, aggregator, Reddit poller) can expose
+their own with METRICS_PORT=<port> via `serve_from_env()`.
+"""
+
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+# seconds; covers sub-ms DB writes up to multi-second LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _fmt(v: float) -> str:
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    if v != v:
+        return "NaN"
+    return str(int(v)) if float(v).is_integer() and abs(v) < 1e15 else repr(float(v))
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+# ---------------------------------------------------
+# Metric children (one per label-value tuple)
+# ---------------------------------------------------
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        if amount < 0:
+            raise ValueError("counters only go up")
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_lock", "_fn")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+        self._fn: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        self.value = float(value)
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, fn: Callable[[], float]):
+        """Read the value from `fn` at scrape time (e.g. a queue depth)."""
+        self._fn = fn
+
+    def get(self) -> float:
+        if self._fn is not None:
+            try:
+                return float(self._fn())
+            except Exception:
+                return math.nan
+        return self.value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+
+# ---------------------------------------------------
+# Metrics
+# ---------------------------------------------------
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kw):
+        if kw:
+            values = tuple(kw[n] for n in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        out.extend(self._render_samples())
+        return out
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _render_samples(self):
+        return [f"{self.name}{_label_str(self.labelnames, k)} {_fmt(c.value)}" for k, c in self._items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set_function(self, fn: Callable[[], float]):
+        self.labels().set_function(fn)
+
+    def _render_samples(self):
+        return [f"{self.name}{_label_str(self.labelnames, k)} {_fmt(c.get())}" for k, c in self._items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.bounds = tuple(sorted(float(b) for b in buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def _render_samples(self):
+        out = []
+        for k, h in self._items():
+            with h._lock:
+                counts, total, n = list(h.counts), h.sum, h.count
+            cum = 0
+            for bound, c in zip(self.bounds + (math.inf,), counts):
+                cum += c
+                le = 'le="%s"' % _fmt(bound)
+                out.append(f"{self.name}_bucket{_label_str(self.labelnames, k, le)} {cum}")
+            out.append(f"{self.name}_sum{_label_str(self.labelnames, k)} {_fmt(total)}")
+            out.append(f"{self.name}_count{_label_str(self.labelnames, k)} {n}")
+        return out
+
+
+# ---------------------------------------------------
+# Registry
+# ---------------------------------------------------
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, cls, name, doc, labelnames=(), **kw) -> _Metric:
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, doc, labelnames, **kw)
+            elif not isinstance(m, cls) or m.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} already registered as {m.kind} {m.labelnames}")
+            return m
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, doc: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.get_or_create(Counter, name, doc, labelnames)
+
+
+def gauge(name: str, doc: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.get_or_create(Gauge, name, doc, labelnames)
+
+
+def histogram(name: str, doc: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.get_or_create(Histogram, name, doc, labelnames, buckets=buckets)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ---------------------------------------------------
+# Standalone exporter for non-API processes
+# ---------------------------------------------------
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"[metrics] serving http://{host}:{server.server_port}/metrics")
+    return server
+
+
+def serve_from_env() -> Optional[ThreadingHTTPServer]:
+    port = os.getenv("METRICS_PORT")
+    return serve(int(port)) if port else None
@@ -0,0 +1,153 @@
+"""
+Lazily initialized subsystems and their readiness.
+
+Heavy components (database schema, reflected tables, the embedding model,
+the RAG index) register an init function here instead of running it at
+import, so importing the API or the dashboard stays cheap and a request
+only pays for what it touches:
+
+    from src.observability import readiness
+
+    schema = readiness.component("db.schema", lambda: metadata.create_all(engine))
+    schema.get()     # runs the init once; concurrent callers wait for it
+
+A failed init is recorded and re-raised; the next get() retries it.
+`warm_up()` initializes every component registered with warm=True on a
+background thread (registration order), so they are ready before the
+first request that needs them. Modules that are themselves slow to import
+(faiss, torch) can be imported by that thread first with
+warm_up(modules=[...]); their components register as they import, and
+until then status() lists the module as pending. main.py starts the
+warm-up with the app and GET /ready reports the per-component state.
+With STARTUP_WARMUP=0 a component only shows up once first used.
+
+Env:
+STARTUP_WARMUP=1   main.py / the dashboard start warm_up() (0 = fully lazy)
+
+Run (import-time budget):
+python scripts/check_startup.py
+"""
+
+import importlib
+import os
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Iterable, Optional
+
+from src.observability import metrics
+
+WARMUP = os.getenv("STARTUP_WARMUP", "1") == "1"
+
+COLD, LOADING, READY, FAILED = "cold", "loading", "ready", "failed"
+
+INIT_SECONDS = metrics.histogram("component_init_seconds", "Lazy component initialization time",
+                                 ["component"], buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+READY_GAUGE = metrics.gauge("component_ready", "1 once a lazy component is initialized", ["component"])
+
+
+class Component:
+    def __init__(self, name: str, init: Callable[[], object], warm: bool = True):
+        self.name = name
+        self.warm = warm
+        self._init = init
+        self._lock = threading.Lock()
+        self._value = None
+        self.state = COLD
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        READY_GAUGE.labels(name).set_function(lambda: 1.0 if self.state == READY else 0.0)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def get(self):
+        if self.state == READY:
+            return self._value
+        with self._lock:
+            if self.state != READY:
+                self.state = LOADING
+                t0 = time.perf_counter()
+                try:
+                    value = self._init()
+                except BaseException as e:
+                    self.state, self.error = FAILED, f"{type(e).__name__}: {e}"
+                    raise
+                self.seconds = time.perf_counter() - t0
+                self._value, self.error = value, None
+                self.state = READY  # last: the unlocked fast path reads state first
+                INIT_SECONDS.labels(self.name).observe(self.seconds)
+                print(f"[startup] {self.name} ready in {self.seconds * 1000:.0f} ms")
+        return self._value
+
+    def status(self) -> dict:
+        return {"state": self.state,
+                "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+                "error": self.error}
+
+
+_components: Dict[str, Component] = {}
+_registry_lock = threading.Lock()
+_warm_thread: Optional[threading.Thread] = None
+_modules: Dict[str, str] = {}  # warm-up module -> loading / ready / error text
+
+
+def component(name: str, init: Callable[[], object], warm: bool = True) -> Component:
+    """Register (or return the already registered) component `name`."""
+    with _registry_lock:
+        c = _components.get(name)
+        if c is None:
+            c = _components[name] = Component(name, init, warm)
+        return c
+
+
+def _warm(names, modules):
+    for m in modules:
+        try:
+            importlib.import_module(m)
+            _modules[m] = READY
+        except Exception as e:
+            _modules[m] = f"{type(e).__name__}: {e}"
+            print(f"[startup] import of {m} failed")
+            traceback.print_exc()
+    for c in list(_components.values()):
+        if ((c.name in names) if names else c.warm):
+            try:
+                c.get()
+            except Exception:
+                print(f"[startup] warm-up of {c.name} failed")
+                traceback.print_exc()
+
+
+def warm_up(names: Optional[Iterable[str]] = None, modules: Iterable[str] = ()) -> threading.Thread:
+    """Import `modules`, then initialize the warm components (or just
+    `names`) on a daemon thread. Repeated calls while a warm-up runs return
+    the running thread."""
+    global _warm_thread
+    with _registry_lock:
+        if _warm_thread is None or not _warm_thread.is_alive():
+            modules = list(modules)
+            for m in modules:
+                _modules.setdefault(m, LOADING)
+            _warm_thread = threading.Thread(target=_warm, args=(set(names or ()), modules),
+                                            name="warm-up", daemon=True)
+            _warm_thread.start()
+        return _warm_thread
+
+
+def status(names: Optional[Iterable[str]] = None) -> dict:
+    """{"ready": bool, "components": {name: {state, seconds, error}}, "modules": {...}}.
+    Without `names`, ready means every warm-up module is imported and every
+    warm component initialized. Names not registered (yet) count as not ready."""
+    names = set(names or ())
+    unknown = names - set(_components)
+    picked = [c for c in list(_components.values()) if ((c.name in names) if names else c.warm)]
+    modules = dict(_modules)
+    return {
+        "ready": (not unknown and all(c.ready for c in picked)
+                  and (bool(names) or all(s == READY for s in modules.values()))),
+        "components": {c.name: c.status() for c in picked},
+        "modules": modules,
+        **({"unknown": sorted(unknown)} if unknown else {}),
+    }
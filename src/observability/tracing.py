@@ -0,0 +1,266 @@
+"""
+Hot-path tracing: nested timing spans, sampled per request / cycle.
+
+    from src.observability import tracing
+
+    with tracing.span("aggregate_minute", minute=str(start)):
+        with tracing.span("sql.ticks"):
+            ...
+
+    @tracing.traced("retrieve_context")
+    def retrieve_context(...): ...
+
+The outermost span opened in a context (an API request, one aggregator
+cycle) is the root. When tracing is enabled a root is kept with
+probability `sample_rate` (or always with force=True, e.g. the API's
+X-Trace: 1 header); spans nested under a dropped root cost the same as
+disabled ones. Disabled, `span()` is one global check returning a shared
+no-op context manager.
+
+Finished traces are kept in memory (last KEEP) and, with TRACE_DIR set,
+appended to TRACE_DIR/spans-<pid>.txt (indented trees) and
+TRACE_DIR/stacks-<pid>.collapsed (flamegraph.pl / speedscope "collapsed"
+format, self time in microseconds).
+
+Env:
+TRACE=1            enable at startup
+TRACE_SAMPLE=0.1   fraction of roots kept
+TRACE_KEEP=200     traces kept in memory
+TRACE_DIR          also write finished traces to files here
+
+Runtime control: enable()/disable(), or the API's /admin/tracing endpoints.
+
+Run (overhead check):
+python scripts/bench_tracing.py
+"""
+
+import contextvars
+import functools
+import inspect
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+ENABLED = os.getenv("TRACE", "0") == "1"
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE", "0.1"))
+KEEP = int(os.getenv("TRACE_KEEP", "200"))
+TRACE_DIR = os.getenv("TRACE_DIR", "")
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+_DROPPED = object()  # marks a context whose root was not sampled
+
+_recent: deque = deque(maxlen=KEEP)
+_stacks: Counter = Counter()
+_lock = threading.Lock()
+_stats = {"roots": 0, "sampled": 0}
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start_ns", "end_ns", "children", "_token", "_root")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.children: List["Span"] = []
+        self.start_ns = self.end_ns = 0
+        self._token = None
+        self._root = False
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    @property
+    def self_ms(self) -> float:
+        return self.duration_ms - sum(c.duration_ms for c in self.children)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        parent = _current.get()
+        if isinstance(parent, Span):
+            parent.children.append(self)
+        else:
+            self._root = True
+        self._token = _current.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _current.reset(self._token)
+        if self._root:
+            _finish(self)
+        return False
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "ms": round(self.duration_ms, 3), "attrs": self.attrs,
+                "children": [c.to_dict() for c in self.children]}
+
+
+class _NoopSpan:
+    """Returned when nothing is recorded; also accepts set()."""
+
+    __slots__ = ("_token",)
+
+    def __init__(self):
+        self._token = None
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _DroppedRoot(_NoopSpan):
+    """A root that was not sampled: keeps nested spans from starting traces."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        self._token = _current.set(_DROPPED)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, force: bool = False, **attrs):
+    """Context manager timing `name` (a no-op unless tracing this context)."""
+    if not ENABLED:
+        return _NOOP
+    parent = _current.get()
+    if parent is None:
+        _stats["roots"] += 1
+        if not force and random.random() >= SAMPLE_RATE:
+            return _DroppedRoot()
+        _stats["sampled"] += 1
+    elif parent is _DROPPED:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator form of span(); works on sync and async functions."""
+
+    def deco(fn):
+        label = name or fn.__qualname__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def awrapper(*args, **kwargs):
+                with span(label):
+                    return await fn(*args, **kwargs)
+            return awrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return deco
+
+
+def current() -> Optional[Span]:
+    s = _current.get()
+    return s if isinstance(s, Span) else None
+
+
+# ---------------------------------------------------
+# Output
+# ---------------------------------------------------
+def format_tree(root: Span) -> str:
+    lines = []
+
+    def walk(s: Span, depth: int):
+        attrs = " ".join(f"{k}={v}" for k, v in s.attrs.items())
+        lines.append(f"{'  ' * depth}{s.name:<{max(1, 40 - 2 * depth)}} {s.duration_ms:>10.3f} ms "
+                     f"(self {s.self_ms:.3f}){'  ' + attrs if attrs else ''}")
+        for c in s.children:
+            walk(c, depth + 1)
+
+    walk(root, 0)
+    return "\n".join(lines)
+
+
+def collapsed_stacks(root: Span) -> Dict[str, int]:
+    """{"root;child;grandchild": self microseconds} for one trace."""
+    out: Counter = Counter()
+
+    def walk(s: Span, prefix: str):
+        path = f"{prefix};{s.name}" if prefix else s.name
+        out[path.replace(" ", "_")] += max(0, int(s.self_ms * 1000))
+        for c in s.children:
+            walk(c, path)
+
+    walk(root, "")
+    return out
+
+
+def _finish(root: Span):
+    stacks = collapsed_stacks(root)
+    with _lock:
+        _recent.append(root)
+        _stacks.update(stacks)
+        if TRACE_DIR:
+            os.makedirs(TRACE_DIR, exist_ok=True)
+            pid = os.getpid()
+            with open(os.path.join(TRACE_DIR, f"spans-{pid}.txt"), "a") as f:
+                f.write(format_tree(root) + "\n\n")
+            with open(os.path.join(TRACE_DIR, f"stacks-{pid}.collapsed"), "a") as f:
+                f.writelines(f"{k} {v}\n" for k, v in stacks.items())
+
+
+def recent(limit: int = 20) -> List[Span]:
+    with _lock:
+        return list(_recent)[-limit:]
+
+
+def collapsed() -> str:
+    """Collapsed stacks summed over every trace finished since the last reset()."""
+    with _lock:
+        return "".join(f"{k} {v}\n" for k, v in sorted(_stacks.items()))
+
+
+# ---------------------------------------------------
+# Control
+# ---------------------------------------------------
+def enable(sample_rate: Optional[float] = None):
+    global ENABLED, SAMPLE_RATE
+    if sample_rate is not None:
+        SAMPLE_RATE = max(0.0, min(1.0, sample_rate))
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    with _lock:
+        _recent.clear()
+        _stacks.clear()
+        _stats.update(roots=0, sampled=0)
+
+
+def status() -> dict:
+    return {"enabled": ENABLED, "sample_rate": SAMPLE_RATE, "kept": len(_recent),
+            "trace_dir": TRACE_DIR or None, **_stats}
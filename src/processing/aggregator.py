@@ -2,25 +2,30 @@
 1-minute aggregator with sentiment strength (ABS sentiment).
 
 Run:
-python -m src.processing.aggregator
+python -m src.processing.aggregator                 # incremental (default)
+AGGREGATOR_MODE=window python -m src.processing.aggregator   # legacy 6-minute re-scan
+AGGREGATOR_MODE=timescale python -m src.processing.aggregator  # Postgres continuous aggregate
 """
 
 from datetime import datetime, timedelta, timezone
 import time
 import os
+import re
 import traceback
-from typing import Optional
+from typing import Dict, List, Optional, Set
 
 import pandas as pd
 from sqlalchemy import (
     Table, Column, Float, Integer, String, DateTime,
-    MetaData, select, insert
+    MetaData, Index, select, insert, delete, tuple_, inspect, text
 )
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
 
+from src.observability import metrics, readiness, tracing
 from src.storage import db as dbmod
 
 engine = dbmod.engine
+read_engine = dbmod.read_engine
 metadata = MetaData()
 
 # ---------------------------------------------------
@@ -28,6 +33,10 @@ metadata = MetaData()
 # ---------------------------------------------------
 FALLBACK_MINUTES = 5
 
+# shared by every aggregator mode (window / incremental / timescale)
+CYCLE_SECONDS = metrics.histogram("aggregator_cycle_seconds", "One aggregator cycle", ["mode"])
+BARS_WRITTEN = metrics.counter("aggregator_bars_written_total", "1-minute bars upserted", ["mode"])
+
 SYMBOL_KEYWORDS = {
     "BTC-USD": ["btc", "bitcoin", "sats", "btcusd"],
     "ETH-USD": ["eth", "ethereum", "ether", "ethusd"],
@@ -52,8 +61,93 @@ aggregates = Table(
     Column("volume", Float),
     Column("price_change_pct", Float),
 )
+# the (ts, symbol) primary key serves time-range scans; this one serves
+# per-symbol "latest N bars" reads
+Index("ix_aggregates_symbol_ts", aggregates.c.symbol, aggregates.c.ts)
+
+# ---------------------------------------------------
+# Persisted high-water marks for the incremental aggregator
+# ---------------------------------------------------
+aggregator_state = Table(
+    "aggregator_state", metadata,
+    Column("key", String, primary_key=True),
+    Column("value", String),
+)
+
+def ensure_aggregates_columns(eng=None) -> List[str]:
+    """
+    Add columns this module defines but an older `aggregates` table lacks
+    (e.g. sentiment_strength on tables made by create_aggregates.py).
+    Returns the names of the columns added.
+    """
+    eng = eng if eng is not None else engine
+    existing = {c["name"] for c in inspect(eng).get_columns("aggregates")}
+    missing = [c for c in aggregates.columns if c.name not in existing]
+    if missing:
+        with eng.begin() as conn:
+            for c in missing:
+                conn.execute(text(
+                    f"ALTER TABLE aggregates ADD COLUMN {c.name} {c.type.compile(eng.dialect)}"
+                ))
+    return [c.name for c in missing]
+
+
+def _create_tables():
+    dbmod.ensure_schema()  # tickers / reddit_posts, read by every mode
+    metadata.create_all(engine, tables=[aggregates, aggregator_state])
+    ensure_aggregates_columns()
+
+
+# created (and older tables given the new columns) by the writers at
+# startup, not at import
+schema = readiness.component("db.aggregates", _create_tables)
+
+
+def ensure_schema():
+    schema.get()
+
+BAR_VALUE_COLUMNS = [
+    c.name for c in aggregates.columns if c.name not in ("ts", "symbol")
+]
+
+
+def upsert_bars(conn, rows, table=None):
+    """Insert-or-replace bar rows keyed on (ts, symbol); `aggregates` by default."""
+    if not rows:
+        return
+    table = table if table is not None else aggregates
+    if conn.engine.dialect.name in ("sqlite", "postgresql"):
+        dbmod.bulk_insert(
+            table, rows, on_conflict="update", conflict_cols=["ts", "symbol"],
+            update_cols=BAR_VALUE_COLUMNS, chunk_size=len(rows), conn=conn,
+        )
+    else:
+        keys = [(r["ts"], r["symbol"]) for r in rows]
+        conn.execute(
+            delete(table).where(tuple_(table.c.ts, table.c.symbol).in_(keys))
+        )
+        conn.execute(insert(table), rows)
+
 
-metadata.create_all(engine, tables=[aggregates])
+def get_state(conn, key: str) -> Optional[str]:
+    r = conn.execute(
+        select(aggregator_state.c.value).where(aggregator_state.c.key == key)
+    ).first()
+    return r[0] if r else None
+
+
+def set_state(conn, values: dict):
+    dialect = conn.engine.dialect.name
+    rows = [{"key": k, "value": str(v)} for k, v in values.items()]
+    if dialect in ("sqlite", "postgresql"):
+        ins = (sqlite if dialect == "sqlite" else postgresql).insert(aggregator_state)
+        conn.execute(
+            ins.on_conflict_do_update(index_elements=["key"], set_={"value": ins.excluded.value}),
+            rows,
+        )
+    else:
+        conn.execute(delete(aggregator_state).where(aggregator_state.c.key.in_(list(values))))
+        conn.execute(insert(aggregator_state), rows)
 
 
 def floor_to_minute(dt: datetime) -> Optional[datetime]:
@@ -61,7 +155,7 @@ def floor_to_minute(dt: datetime) -> Optional[datetime]:
 
 
 def get_latest_ticker_time() -> Optional[datetime]:
-    with engine.connect() as conn:
+    with read_engine.connect() as conn:
         r = conn.execute(
             select(dbmod.tickers.c.ts)
             .order_by(dbmod.tickers.c.ts.desc())
@@ -90,99 +184,235 @@ def _fetch_posts_window(conn, start, end):
     return df
 
 
+class KeywordMatcher:
+    """
+    Precompiled multi-keyword matcher. A single trie-shaped lookahead regex
+    reports, at every position where some keyword starts, the longest one;
+    any shorter keyword matching there is a prefix of it, so its symbols
+    are precomputed. Same substring semantics as
+    `any(k in text for k in kws)`, for all symbols in one pass per text.
+    """
+
+    def __init__(self, symbol_keywords: Dict[str, List[str]]):
+        kw_symbols: Dict[str, Set[str]] = {}
+        for sym, kws in symbol_keywords.items():
+            for k in kws:
+                if k:
+                    kw_symbols.setdefault(k.lower(), set()).add(sym)
+        self.symbols_for: Dict[str, frozenset] = {
+            k: frozenset().union(*(v for p, v in kw_symbols.items() if k.startswith(p)))
+            for k in kw_symbols
+        }
+        self._re = re.compile(f"(?=({self._trie_pattern(kw_symbols)}))") if kw_symbols else None
+
+    @staticmethod
+    def _trie_pattern(words) -> str:
+        """
+        Regex for `words` shaped as a trie, so the engine walks one branch per
+        character instead of trying every alternative. Greedy optional tails
+        make it prefer the longest word at a position.
+        """
+        trie: dict = {}
+        for w in words:
+            node = trie
+            for ch in w:
+                node = node.setdefault(ch, {})
+            node[""] = True
+
+        def build(node) -> str:
+            terminal = "" in node
+            alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+            if not alts:
+                return ""
+            body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+            if terminal:
+                return f"(?:{body})?"
+            return body
+
+        return build(trie)
+
+    def match(self, text) -> Set[str]:
+        if self._re is None or not text:
+            return set()
+        found: Set[str] = set()
+        symbols_for = self.symbols_for
+        for k in self._re.findall(str(text).lower()):
+            found |= symbols_for[k]
+        return found
+
+    def post_symbols(self, texts) -> List[Set[str]]:
+        """post -> matched symbols, one entry per text."""
+        return [self.match(t) for t in texts]
+
+
+_matcher = KeywordMatcher(SYMBOL_KEYWORDS)
+
+
 def _filter_posts_for_symbol(df: pd.DataFrame, sym: str) -> pd.DataFrame:
     if df.empty:
         return df
-    kws = SYMBOL_KEYWORDS.get(sym, [])
-    if not kws:
+    if sym not in SYMBOL_KEYWORDS:
         return pd.DataFrame()
 
-    text = df["text"].astype(str).str.lower()
-    mask = text.apply(lambda t: any(k in t for k in kws))
+    mask = [sym in syms for syms in _matcher.post_symbols(df["text"])]
     return df[mask]
 
 
+def _sentiment_stats(s: pd.Series):
+    s = s.astype(float)
+    return float(s.mean()), float(s.abs().mean()), int(len(s))
+
+
+def posts_sentiment(df_posts: pd.DataFrame, matcher: Optional[KeywordMatcher] = None):
+    """
+    (per_symbol, fallback) for one window of posts: per_symbol maps each
+    matched symbol to (avg, strength, count); fallback is the same over all
+    posts, or (None, None, 0) when there are none.
+    """
+    matcher = matcher or _matcher
+    fallback = (None, None, 0)
+    per_symbol = {}
+    if not df_posts.empty:
+        fallback = _sentiment_stats(df_posts["sentiment"])
+        pairs = [
+            (sym, i)
+            for i, syms in enumerate(matcher.post_symbols(df_posts["text"]))
+            for sym in syms
+        ]
+        if pairs:
+            sent = df_posts["sentiment"].astype(float).to_numpy()
+            dfp = pd.DataFrame(pairs, columns=["symbol", "i"])
+            dfp["s"] = sent[dfp["i"].to_numpy()]
+            dfp["abs"] = dfp["s"].abs()
+            g = dfp.groupby("symbol").agg(avg=("s", "mean"), strength=("abs", "mean"), n=("s", "size"))
+            per_symbol = {
+                sym: (float(r.avg), float(r.strength), int(r.n))
+                for sym, r in g.iterrows()
+            }
+    return per_symbol, fallback
+
+
+def compute_bars(
+    df_ticks: pd.DataFrame,
+    df_posts: pd.DataFrame,
+    start: datetime,
+    matcher: Optional[KeywordMatcher] = None,
+) -> List[dict]:
+    """
+    Build one aggregate row per symbol for the minute starting at `start`
+    with a single groupby pass over the ticks. Posts are keyword-matched
+    once each; a symbol with no matching posts gets the all-posts stats.
+    """
+    matcher = matcher or _matcher
+    ticks = df_ticks.sort_values(["symbol", "ts"], kind="stable")
+    ticks = ticks.assign(volume=pd.to_numeric(ticks["volume"], errors="coerce"))
+    bars = ticks.groupby("symbol", sort=False).agg(
+        open_price=("price", "first"),
+        close_price=("price", "last"),
+        high_price=("price", "max"),
+        low_price=("price", "min"),
+        volume=("volume", "sum"),
+    )
+
+    per_symbol, fallback = posts_sentiment(df_posts, matcher)
+
+    rows = []
+    for sym, b in zip(bars.index, bars.itertuples(index=False)):
+        open_p = float(b.open_price)
+        close_p = float(b.close_price)
+        avg_sent, sent_strength, post_count = per_symbol.get(sym, fallback)
+        rows.append({
+            "ts": start,
+            "symbol": sym,
+            "avg_sentiment": avg_sent,
+            "sentiment_strength": sent_strength,
+            "post_count": post_count,
+            "open_price": open_p,
+            "close_price": close_p,
+            "high_price": float(b.high_price),
+            "low_price": float(b.low_price),
+            "volume": float(b.volume),
+            "price_change_pct": ((close_p - open_p) / open_p) * 100 if open_p else 0,
+        })
+    return rows
+
+
 def aggregate_minute(window_min: datetime) -> int:
+    with tracing.span("aggregate_minute", minute=str(window_min)) as sp:
+        inserted = _aggregate_minute(window_min)
+        sp.set(bars=inserted)
+    return inserted
+
+
+def _aggregate_minute(window_min: datetime) -> int:
     start = window_min
     end = start + timedelta(minutes=1)
     inserted = 0
 
-    with engine.connect() as conn:
-        ticks = conn.execute(
-            select(dbmod.tickers).where(
-                dbmod.tickers.c.ts >= start,
-                dbmod.tickers.c.ts < end
-            )
-        ).all()
+    with read_engine.connect() as conn:
+        with tracing.span("sql.ticks"):
+            ticks = conn.execute(
+                select(dbmod.tickers).where(
+                    dbmod.tickers.c.ts >= start,
+                    dbmod.tickers.c.ts < end
+                )
+            ).all()
 
         if not ticks:
             return 0
 
-        df_ticks = pd.DataFrame([dict(r._mapping) for r in ticks])
-        df_posts = _fetch_posts_window(conn, start, end)
-
-        for sym in df_ticks["symbol"].unique():
-            d = df_ticks[df_ticks["symbol"] == sym].sort_values("ts")
-
-            open_p = float(d.iloc[0]["price"])
-            close_p = float(d.iloc[-1]["price"])
-            high_p = float(d["price"].max())
-            low_p = float(d["price"].min())
-            volume = float(d["volume"].fillna(0).sum())
-            pct = ((close_p - open_p) / open_p) * 100 if open_p else 0
-
-            df_sym = _filter_posts_for_symbol(df_posts, sym)
-
-            if not df_sym.empty:
-                s = df_sym["sentiment"].astype(float)
-            elif not df_posts.empty:
-                s = df_posts["sentiment"].astype(float)
-            else:
-                s = None
-
-            if s is not None:
-                avg_sent = float(s.mean())
-                sent_strength = float(s.abs().mean())
-                post_count = int(len(s))
-            else:
-                avg_sent = None
-                sent_strength = None
-                post_count = 0
-
-            row = {
-                "ts": start,
-                "symbol": sym,
-                "avg_sentiment": avg_sent,
-                "sentiment_strength": sent_strength,
-                "post_count": post_count,
-                "open_price": open_p,
-                "close_price": close_p,
-                "high_price": high_p,
-                "low_price": low_p,
-                "volume": volume,
-                "price_change_pct": pct,
-            }
+        with tracing.span("dataframe.ticks", rows=len(ticks)):
+            df_ticks = pd.DataFrame([dict(r._mapping) for r in ticks])
+        with tracing.span("sql.posts"):
+            df_posts = _fetch_posts_window(conn, start, end)
 
-            try:
-                with engine.begin() as c2:
-                    c2.execute(insert(aggregates).values(**row))
-                inserted += 1
-            except IntegrityError:
-                pass
-            except Exception:
-                traceback.print_exc()
+    try:
+        with tracing.span("compute_bars"):
+            bars = compute_bars(df_ticks, df_posts, start)
+        with tracing.span("upsert"):
+            # bars already written for this minute are kept, as before
+            inserted = dbmod.bulk_insert(aggregates, bars, on_conflict="nothing")["inserted"]
+    except Exception:
+        traceback.print_exc()
 
     return inserted
 
 
 def run_loop():
+    mode = os.getenv("AGGREGATOR_MODE", "incremental")
+    ensure_schema()
+    if mode == "timescale":
+        from src.storage.postgres import run_loop as run_timescale
+        return run_timescale()
+    if mode != "window":
+        from src.processing.incremental import run_loop as run_incremental
+        return run_incremental()
+
+    from src.processing import rollups  # imports this module
+
+    metrics.serve_from_env()
     print("Aggregator running...")
     while True:
-        latest = get_latest_ticker_time()
-        if latest:
-            base = floor_to_minute(latest)
-            for i in range(6):
-                aggregate_minute(base - timedelta(minutes=i))
+        t0 = time.perf_counter()
+        with tracing.span("aggregator.cycle"):
+            latest = get_latest_ticker_time()
+            written, earliest = 0, None
+            if latest:
+                base = floor_to_minute(latest)
+                for i in range(6):
+                    minute = base - timedelta(minutes=i)
+                    n = aggregate_minute(minute)
+                    BARS_WRITTEN.labels("window").inc(n)
+                    written += n
+                    if n:
+                        earliest = minute
+            if written:
+                try:
+                    with tracing.span("rollups"):
+                        rollups.update_rollups(since=earliest)
+                except Exception:
+                    traceback.print_exc()
+        CYCLE_SECONDS.labels("window").observe(time.perf_counter() - t0)
         time.sleep(30)
 
 
@@ -0,0 +1,229 @@
+"""
+Historical backfill / rebuild of 1-minute aggregates.
+
+Splits [--from, --to) into chunks. Worker processes each read a chunk's
+ticks (and the posts it needs) with one range scan and compute its bars
+with aggregator.compute_bars. The parent process is the only writer: it
+upserts each finished chunk and records it in `backfill_progress`, so
+re-running the same command skips completed chunks and re-running with
+--restart rebuilds them. Upserts make every run idempotent. Once every
+chunk is written, the 5m-1d rollups are re-rolled from --from.
+
+Run:
+python -m src.processing.backfill --from 2024-01-01T00:00 --to 2024-01-08T00:00
+python -m src.processing.backfill --from 2024-01-01 --to 2024-01-02 --symbols BTC-USD,ETH-USD --workers 4
+"""
+
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Table, Column, String, DateTime, Integer, select, insert, delete
+
+from src.observability import readiness
+from src.processing import aggregator as agg
+from src.processing import rollups
+from src.storage import db as dbmod
+from src.storage import tick_archive
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+CHUNK_MINUTES = 60
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+backfill_progress = Table(
+    "backfill_progress", agg.metadata,
+    Column("job", String, primary_key=True),
+    Column("chunk_start", DateTime(timezone=True), primary_key=True),
+    Column("bars", Integer),
+    Column("finished_at", DateTime(timezone=True)),
+)
+
+
+def _create_tables():
+    agg.ensure_schema()
+    agg.metadata.create_all(agg.engine, tables=[backfill_progress])
+
+
+schema = readiness.component("db.backfill", _create_tables)
+
+
+def ensure_schema():
+    schema.get()
+
+
+def _job_id(start, end, symbols, chunk_minutes) -> str:
+    key = f"{start.isoformat()}|{end.isoformat()}|{','.join(sorted(symbols or []))}|{chunk_minutes}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def _normalize(dt: datetime) -> datetime:
+    # SQLite stores naive UTC; keep comparisons naive there
+    if dt.tzinfo is not None and agg.engine.dialect.name == "sqlite":
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _utc_key(dt: datetime) -> datetime:
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def chunk_ranges(start: datetime, end: datetime, minutes: int) -> List[Tuple[datetime, datetime]]:
+    out = []
+    cur = agg.floor_to_minute(start)
+    step = timedelta(minutes=minutes)
+    while cur < end:
+        out.append((cur, min(cur + step, end)))
+        cur += step
+    return out
+
+
+# ---------------------------------------------------
+# Worker side
+# ---------------------------------------------------
+def _worker_init():
+    # never reuse pooled connections inherited from the parent across fork
+    dbmod.engine.dispose(close=False)
+    dbmod.read_engine.dispose(close=False)
+
+
+def compute_chunk(start: datetime, end: datetime, symbols: Optional[List[str]] = None) -> List[dict]:
+    """All bars for minutes in [start, end), from two bulk range scans."""
+    p = dbmod.reddit_posts
+    # ticks may already be compacted out of the DB into the Parquet archive
+    df_ticks = tick_archive.read_ticks(start, end, symbols, ["symbol", "price", "volume", "ts"])
+    if df_ticks.empty:
+        return []
+    with agg.read_engine.connect() as conn:
+        df_posts = pd.DataFrame(
+            conn.execute(
+                select(p.c.text, p.c.sentiment, p.c.created_utc).where(
+                    p.c.created_utc >= start - timedelta(minutes=agg.FALLBACK_MINUTES),
+                    p.c.created_utc < end,
+                )
+            ).all(),
+            columns=["text", "sentiment", "created_utc"],
+        )
+
+    # work in naive UTC; SQLite already returns naive UTC, Postgres returns aware
+    df_ticks["ts"] = pd.to_datetime(df_ticks["ts"], utc=True).dt.tz_convert(None)
+    df_ticks["minute"] = df_ticks["ts"].dt.floor("min")
+    if not df_posts.empty:
+        df_posts["created_utc"] = pd.to_datetime(df_posts["created_utc"], utc=True).dt.tz_convert(None)
+        df_posts = df_posts.sort_values("created_utc", kind="stable").reset_index(drop=True)
+        post_ts = df_posts["created_utc"].to_numpy()
+
+    one = np.timedelta64(1, "m")
+    fb = np.timedelta64(agg.FALLBACK_MINUTES, "m")
+    rows = []
+    for minute, d in df_ticks.groupby("minute", sort=True):
+        m = minute.to_datetime64()
+        window = df_posts
+        if not df_posts.empty:
+            lo, hi = np.searchsorted(post_ts, [m, m + one], side="left")
+            if lo == hi:  # same fallback as _fetch_posts_window
+                lo = np.searchsorted(post_ts, m - fb, side="left")
+            window = df_posts.iloc[lo:hi]
+        bar_ts = minute.to_pydatetime()
+        if agg.engine.dialect.name != "sqlite":
+            bar_ts = bar_ts.replace(tzinfo=timezone.utc)
+        rows.extend(agg.compute_bars(d, window, bar_ts))
+    return rows
+
+
+def _run_chunk(args):
+    start, end, symbols = args
+    t0 = time.perf_counter()
+    rows = compute_chunk(start, end, symbols)
+    return start, rows, time.perf_counter() - t0
+
+
+# ---------------------------------------------------
+# Driver
+# ---------------------------------------------------
+def backfill(
+    start: datetime,
+    end: datetime,
+    symbols: Optional[List[str]] = None,
+    chunk_minutes: int = CHUNK_MINUTES,
+    workers: int = WORKERS,
+    restart: bool = False,
+) -> dict:
+    start, end = _normalize(start), _normalize(end)
+    ensure_schema()
+    tick_archive.ensure_schema()  # before the workers fork
+    job = _job_id(start, end, symbols, chunk_minutes)
+    chunks = chunk_ranges(start, end, chunk_minutes)
+
+    with agg.engine.begin() as conn:
+        if restart:
+            conn.execute(delete(backfill_progress).where(backfill_progress.c.job == job))
+        done = {
+            _utc_key(r[0])
+            for r in conn.execute(
+                select(backfill_progress.c.chunk_start).where(backfill_progress.c.job == job)
+            ).all()
+        }
+    todo = [(s, e) for s, e in chunks if _utc_key(s) not in done]
+    print(f"[backfill] job {job}: {len(chunks)} chunks, {len(chunks) - len(todo)} already done, "
+          f"{len(todo)} to go, {workers} workers")
+
+    total_bars = 0
+    t0 = time.perf_counter()
+
+    def record(chunk_start, rows):
+        with agg.engine.begin() as conn:
+            for i in range(0, len(rows), 5000):
+                agg.upsert_bars(conn, rows[i:i + 5000])
+            conn.execute(insert(backfill_progress).values(
+                job=job, chunk_start=chunk_start, bars=len(rows),
+                finished_at=datetime.now(timezone.utc),
+            ))
+
+    work = [(s, e, symbols) for s, e in todo]
+    if workers <= 1:
+        results = (_run_chunk(w) for w in work)
+        for i, (chunk_start, rows, secs) in enumerate(results, 1):
+            record(chunk_start, rows)
+            total_bars += len(rows)
+            print(f"[backfill] {i}/{len(work)} {chunk_start} → {len(rows)} bars ({secs:.2f}s)")
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as ex:
+            futures = [ex.submit(_run_chunk, w) for w in work]
+            for i, fut in enumerate(as_completed(futures), 1):
+                chunk_start, rows, secs = fut.result()
+                record(chunk_start, rows)
+                total_bars += len(rows)
+                print(f"[backfill] {i}/{len(work)} {chunk_start} → {len(rows)} bars ({secs:.2f}s)")
+
+    # also when every chunk was already done: an earlier run may have
+    # stopped between its last chunk and this step. update_rollups works
+    # through the range a day per transaction.
+    rolled = rollups.update_rollups(since=start) if chunks else {}
+    elapsed = time.perf_counter() - t0
+    return {"job": job, "chunks": len(todo), "bars": total_bars, "rollups": rolled, "elapsed_s": elapsed}
+
+
+def _parse_dt(s: str) -> datetime:
+    return datetime.fromisoformat(s.replace("Z", "+00:00"))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="rebuild 1-minute aggregates over a time range")
+    ap.add_argument("--from", dest="start", required=True, type=_parse_dt)
+    ap.add_argument("--to", dest="end", required=True, type=_parse_dt)
+    ap.add_argument("--symbols", default=None, help="comma-separated, default all")
+    ap.add_argument("--chunk-minutes", type=int, default=CHUNK_MINUTES)
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--restart", action="store_true", help="ignore the checkpoint for this job")
+    args = ap.parse_args()
+
+    syms = [s for s in args.symbols.split(",") if s] if args.symbols else None
+    print(backfill(args.start, args.end, syms, args.chunk_minutes, args.workers, args.restart))
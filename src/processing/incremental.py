@@ -0,0 +1,397 @@
+"""
+Incremental 1-minute OHLCV + sentiment aggregator.
+
+Keeps running per-(minute, symbol) bar state and per-minute post
+sentiment sums in memory. Each cycle it reads only ticks with
+id > the persisted tick high-water mark and posts newer than the post
+high-water mark (minus a short lookback for late inserts), folds them
+into the state and upserts every bar they touched. Cost per cycle is
+O(new rows), not O(window).
+
+With several writers (Postgres) ids are handed out at insert but become
+visible at commit, so id N+1 can be read before N commits and a plain
+`id > max(id)` would skip N for good. The tick read therefore starts
+TICK_ID_SLACK ids below the high-water mark, and ids folded in recently
+are remembered so re-read ticks are not counted twice. SQLite serializes
+writers, so there ids commit in order and no slack is used.
+
+On (re)start the high-water marks come from aggregator_state and the
+last RETAIN_MINUTES of bars and posts are rebuilt from the rows below
+them, so a minute that was half aggregated before the restart is
+continued instead of being started over (and overwritten) by its next
+ticks.
+
+Sentiment follows aggregate_minute: posts in the bar's minute that
+mention the symbol, else all posts in that minute; if the minute has no
+posts at all, the same rule over the preceding FALLBACK_MINUTES.
+
+Run:
+python -m src.processing.incremental
+"""
+
+import time
+import traceback
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from src.processing import aggregator as agg
+from src.processing import rollups
+from src.observability import metrics, tracing
+from src.storage import db as dbmod
+from src.storage import tick_archive
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+CYCLE_SECONDS = 30
+TICK_CHUNK = 50_000        # ticks read per query
+RETAIN_MINUTES = 30        # minutes of bar/post state kept in memory
+POST_LOOKBACK_MINUTES = 10 # re-read window for posts inserted late
+COMPACT_EVERY_SECONDS = 3600  # move ticks past retention to the Parquet archive
+TICK_ID_SLACK = 10_000     # ids re-read below the high-water mark (out-of-order commits)
+
+STATE_TICK_ID = "incremental.tick_id"
+STATE_POST_TS = "incremental.post_created_utc"
+
+
+class _Bar:
+    __slots__ = ("open", "open_key", "close", "close_key", "high", "low", "volume")
+
+    def __init__(self, price, volume, key):
+        self.open = self.close = self.high = self.low = price
+        self.open_key = self.close_key = key
+        self.volume = volume
+
+    def add(self, price, volume, key):
+        if key < self.open_key:
+            self.open, self.open_key = price, key
+        if key >= self.close_key:
+            self.close, self.close_key = price, key
+        if price > self.high:
+            self.high = price
+        if price < self.low:
+            self.low = price
+        self.volume += volume
+
+
+class _PostSums:
+    """count / sum / sum(abs) of sentiment, overall and per matched symbol."""
+
+    __slots__ = ("all", "by_symbol")
+
+    def __init__(self):
+        self.all = [0, 0.0, 0.0]
+        self.by_symbol: Dict[str, list] = defaultdict(lambda: [0, 0.0, 0.0])
+
+    def add(self, sentiment: float, symbols):
+        for acc in [self.all] + [self.by_symbol[s] for s in symbols]:
+            acc[0] += 1
+            acc[1] += sentiment
+            acc[2] += abs(sentiment)
+
+
+class IncrementalAggregator:
+    def __init__(self, engine=None):
+        self.engine = engine if engine is not None else agg.engine
+        self.read_engine = engine if engine is not None else agg.read_engine
+        self.bars: Dict[datetime, Dict[str, _Bar]] = defaultdict(dict)
+        self.posts: Dict[datetime, _PostSums] = defaultdict(_PostSums)
+        self.seen_posts: Dict[str, datetime] = {}
+        self.tick_hwm: Optional[int] = None
+        self.post_hwm: Optional[datetime] = None
+        self.horizon: Optional[datetime] = None  # oldest minute held in memory
+        self.earliest_written: Optional[datetime] = None  # oldest bar minute of the last step
+        self.id_slack = 0 if self.engine.dialect.name == "sqlite" else TICK_ID_SLACK
+        self.recent_ticks: Set[int] = set()  # tick ids folded in, above tick_hwm - id_slack
+        self._loaded = False
+
+    # ---------------------------------------------------
+    # High-water marks
+    # ---------------------------------------------------
+    def _load_state(self, conn):
+        tick_id = agg.get_state(conn, STATE_TICK_ID)
+        post_ts = agg.get_state(conn, STATE_POST_TS)
+        latest = agg.get_latest_ticker_time()
+        # first run: start from the last few minutes, like the window loop
+        start = agg.floor_to_minute(latest) - timedelta(minutes=5) if latest else None
+
+        if tick_id is not None:
+            self.tick_hwm = int(tick_id)
+        elif start is None:
+            self.tick_hwm = 0
+        else:
+            r = conn.execute(
+                select(dbmod.tickers.c.id)
+                .where(dbmod.tickers.c.ts < start)
+                .order_by(dbmod.tickers.c.id.desc())
+                .limit(1)
+            ).first()
+            self.tick_hwm = r[0] if r else 0
+
+        if post_ts is not None:
+            self.post_hwm = datetime.fromisoformat(post_ts)
+        elif start is not None:
+            self.post_hwm = start - timedelta(minutes=agg.FALLBACK_MINUTES)
+        else:
+            r = conn.execute(
+                select(dbmod.reddit_posts.c.created_utc)
+                .order_by(dbmod.reddit_posts.c.created_utc.desc())
+                .limit(1)
+            ).first()
+            self.post_hwm = r[0] if r else None
+        if latest is not None:
+            self.horizon = agg.floor_to_minute(latest) - timedelta(minutes=RETAIN_MINUTES)
+            self._restore(conn)
+        self._loaded = True
+
+    def _restore(self, conn):
+        """Rebuild bar/post state from `horizon` on out of the rows already
+        folded in, minus what the next step re-reads anyway (ticks in the id
+        slack, posts in the lookback window). The stored bars match it, so
+        nothing is marked dirty."""
+        scratch: Set[Tuple[datetime, str]] = set()
+        if self.post_hwm is not None:
+            for r in conn.execute(
+                select(dbmod.reddit_posts).where(
+                    dbmod.reddit_posts.c.created_utc
+                    >= self.horizon - timedelta(minutes=agg.FALLBACK_MINUTES),
+                    dbmod.reddit_posts.c.created_utc
+                    < self.post_hwm - timedelta(minutes=POST_LOOKBACK_MINUTES),
+                )
+            ):
+                self._add_post(r, scratch)
+        ticks = 0
+        for r in conn.execute(
+            select(dbmod.tickers).where(
+                dbmod.tickers.c.ts >= self.horizon,
+                dbmod.tickers.c.id <= self.tick_hwm - self.id_slack,
+            )
+        ):
+            self._add_tick(r, scratch)
+            ticks += 1
+        print(f"[incremental] restored {ticks} ticks into {sum(map(len, self.bars.values()))} bars "
+              f"since {self.horizon:%Y-%m-%d %H:%M}")
+
+    # ---------------------------------------------------
+    # Folding new rows into state
+    # ---------------------------------------------------
+    def _add_tick(self, r, dirty: Set[Tuple[datetime, str]], dedupe: bool = True):
+        if dedupe and r.id in self.recent_ticks:
+            return
+        self.recent_ticks.add(r.id)
+        minute = agg.floor_to_minute(r.ts)
+        bars = self.bars[minute]
+        key = (r.ts, r.id)
+        price = float(r.price)
+        volume = float(r.volume or 0.0)
+        bar = bars.get(r.symbol)
+        if bar is None:
+            bars[r.symbol] = _Bar(price, volume, key)
+        else:
+            bar.add(price, volume, key)
+        dirty.add((minute, r.symbol))
+
+    def _add_post(self, r, dirty: Set[Tuple[datetime, str]]):
+        if r.id in self.seen_posts or r.created_utc is None:
+            return
+        self.seen_posts[r.id] = r.created_utc
+        minute = agg.floor_to_minute(r.created_utc)
+        self.posts[minute].add(float(r.sentiment or 0.0), agg._matcher.match(r.text))
+        # a post can feed bars up to FALLBACK_MINUTES later through the fallback window
+        for i in range(agg.FALLBACK_MINUTES + 1):
+            m = minute + timedelta(minutes=i)
+            for sym in self.bars.get(m, {}):
+                dirty.add((m, sym))
+
+    def _rehydrate(self, minute: datetime, conn, dirty: Set[Tuple[datetime, str]]):
+        """Rebuild state for a minute that fell out of memory (late data)."""
+        end = minute + timedelta(minutes=1)
+        if minute not in self.bars:
+            ticks = conn.execute(
+                select(dbmod.tickers).where(
+                    dbmod.tickers.c.ts >= minute,
+                    dbmod.tickers.c.ts < end,
+                    dbmod.tickers.c.id <= self.tick_hwm,
+                )
+            ).all()
+            for r in ticks:
+                # the minute is rebuilt from scratch: ids remembered from
+                # before it was evicted must not be skipped
+                self._add_tick(r, dirty, dedupe=False)
+        posts = conn.execute(
+            select(dbmod.reddit_posts).where(
+                dbmod.reddit_posts.c.created_utc >= minute - timedelta(minutes=agg.FALLBACK_MINUTES),
+                dbmod.reddit_posts.c.created_utc < end,
+            )
+        ).all()
+        for r in posts:
+            self._add_post(r, dirty)
+
+    # ---------------------------------------------------
+    # Bar materialisation
+    # ---------------------------------------------------
+    def _sentiment(self, minute: datetime, sym: str):
+        minutes = [minute]
+        if self.posts.get(minute) is None or self.posts[minute].all[0] == 0:
+            minutes = [minute - timedelta(minutes=i) for i in range(agg.FALLBACK_MINUTES + 1)]
+        n_sym = [0, 0.0, 0.0]
+        n_all = [0, 0.0, 0.0]
+        for m in minutes:
+            ps = self.posts.get(m)
+            if ps is None:
+                continue
+            for acc, src in ((n_all, ps.all), (n_sym, ps.by_symbol.get(sym))):
+                if src:
+                    acc[0] += src[0]
+                    acc[1] += src[1]
+                    acc[2] += src[2]
+        use = n_sym if n_sym[0] else n_all
+        if not use[0]:
+            return None, None, 0
+        return use[1] / use[0], use[2] / use[0], use[0]
+
+    def _bar_row(self, minute: datetime, sym: str) -> dict:
+        b = self.bars[minute][sym]
+        avg_sent, strength, count = self._sentiment(minute, sym)
+        return {
+            "ts": minute,
+            "symbol": sym,
+            "avg_sentiment": avg_sent,
+            "sentiment_strength": strength,
+            "post_count": count,
+            "open_price": b.open,
+            "close_price": b.close,
+            "high_price": b.high,
+            "low_price": b.low,
+            "volume": b.volume,
+            "price_change_pct": ((b.close - b.open) / b.open) * 100 if b.open else 0,
+        }
+
+    def _evict(self, newest: datetime):
+        horizon = newest - timedelta(minutes=RETAIN_MINUTES)
+        for m in [m for m in self.bars if m < horizon]:
+            del self.bars[m]
+        post_horizon = horizon - timedelta(minutes=agg.FALLBACK_MINUTES)
+        for m in [m for m in self.posts if m < post_horizon]:
+            del self.posts[m]
+        seen_horizon = min(
+            post_horizon,
+            (self.post_hwm or newest) - timedelta(minutes=POST_LOOKBACK_MINUTES),
+        )
+        for pid in [p for p, ts in self.seen_posts.items() if ts < seen_horizon]:
+            del self.seen_posts[pid]
+        self.horizon = horizon
+
+    # ---------------------------------------------------
+    # One cycle
+    # ---------------------------------------------------
+    def step(self) -> int:
+        """Consume new ticks/posts, upsert touched bars. Returns bars written."""
+        dirty: Set[Tuple[datetime, str]] = set()
+        if not self._loaded:
+            agg.ensure_schema()
+        with self.read_engine.connect() as conn:
+            if not self._loaded:
+                self._load_state(conn)
+
+            # posts first so bars built below see their sentiment
+            post_q = select(dbmod.reddit_posts)
+            if self.post_hwm is not None:
+                post_q = post_q.where(
+                    dbmod.reddit_posts.c.created_utc
+                    >= self.post_hwm - timedelta(minutes=POST_LOOKBACK_MINUTES)
+                )
+            new_post_hwm = self.post_hwm
+            for r in conn.execute(post_q).all():
+                if self.horizon is not None and r.created_utc is not None \
+                        and r.id not in self.seen_posts:
+                    # late post: bars it feeds may already be out of memory
+                    minute = agg.floor_to_minute(r.created_utc)
+                    for i in range(agg.FALLBACK_MINUTES + 1):
+                        m = minute + timedelta(minutes=i)
+                        if m < self.horizon:
+                            self._rehydrate(m, conn, dirty)
+                self._add_post(r, dirty)
+                if r.created_utc is not None and (new_post_hwm is None or r.created_utc > new_post_hwm):
+                    new_post_hwm = r.created_utc
+
+            new_tick_hwm = self.tick_hwm
+            after = max(self.tick_hwm - self.id_slack, 0)
+            while True:
+                ticks = conn.execute(
+                    select(dbmod.tickers)
+                    .where(dbmod.tickers.c.id > after)
+                    .order_by(dbmod.tickers.c.id)
+                    .limit(TICK_CHUNK)
+                ).all()
+                if not ticks:
+                    break
+                for r in ticks:
+                    if r.ts is None:
+                        continue
+                    minute = agg.floor_to_minute(r.ts)
+                    if self.horizon is not None and minute < self.horizon \
+                            and minute not in self.bars:
+                        self._rehydrate(minute, conn, dirty)
+                    self._add_tick(r, dirty)
+                after = ticks[-1].id
+                new_tick_hwm = max(new_tick_hwm, after)
+                if len(ticks) < TICK_CHUNK:
+                    break
+
+        keys = [(m, s) for m, s in sorted(dirty) if s in self.bars.get(m, {})]
+        rows = [self._bar_row(m, s) for m, s in keys]
+        with self.engine.begin() as conn:
+            agg.upsert_bars(conn, rows)
+            state = {STATE_TICK_ID: new_tick_hwm}
+            if new_post_hwm is not None:
+                state[STATE_POST_TS] = new_post_hwm.isoformat()
+            agg.set_state(conn, state)
+
+        self.tick_hwm = new_tick_hwm
+        self.post_hwm = new_post_hwm
+        # rehydrated late minutes can be far older than the rollups' own window
+        self.earliest_written = keys[0][0] if keys else None
+        floor = new_tick_hwm - self.id_slack
+        self.recent_ticks = {i for i in self.recent_ticks if i > floor}
+        if self.bars:
+            self._evict(max(self.bars))
+        return len(rows)
+
+
+def run_loop(cycle_seconds: float = CYCLE_SECONDS):
+    metrics.serve_from_env()
+    print("Incremental aggregator running...")
+    ia = IncrementalAggregator()
+    last_compact = 0.0
+    while True:
+        t0 = time.perf_counter()
+        try:
+            with tracing.span("incremental.cycle") as sp:
+                with tracing.span("incremental.step"):
+                    n = ia.step()
+                with tracing.span("rollups"):
+                    rolled = rollups.update_rollups(since=ia.earliest_written) if n else {}
+                sp.set(bars=n)
+            agg.BARS_WRITTEN.labels("incremental").inc(n)
+            agg.CYCLE_SECONDS.labels("incremental").observe(time.perf_counter() - t0)
+            print(f"[incremental] upserted {n} bars in {(time.perf_counter() - t0) * 1000:.0f} ms "
+                  f"(tick_id={ia.tick_hwm}) rollups={rolled}")
+        except Exception:
+            traceback.print_exc()
+        if time.monotonic() - last_compact >= COMPACT_EVERY_SECONDS:
+            last_compact = time.monotonic()
+            try:
+                res = tick_archive.compact()
+                if res["rows"]:
+                    print(f"[incremental] compacted {res}")
+            except Exception:
+                traceback.print_exc()
+        time.sleep(cycle_seconds)
+
+
+if __name__ == "__main__":
+    run_loop()
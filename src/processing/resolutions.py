@@ -0,0 +1,22 @@
+"""
+Bar resolutions served from the aggregates tables (1m) and the rollups
+(src.processing.rollups). Kept free of pandas / table definitions so the
+API can import it cheaply.
+"""
+
+# resolution name -> (minutes, child resolution)
+RESOLUTIONS = {
+    "5m": (5, "1m"),
+    "15m": (15, "5m"),
+    "1h": (60, "15m"),
+    "1d": (1440, "1h"),
+}
+RESOLUTION_MINUTES = {"1m": 1, **{k: v[0] for k, v in RESOLUTIONS.items()}}
+
+
+def pick_resolution(span_minutes: float, max_points: int = 720) -> str:
+    """Finest resolution that covers `span_minutes` in at most `max_points` bars."""
+    for res in ("1m", "5m", "15m", "1h", "1d"):
+        if span_minutes / RESOLUTION_MINUTES[res] <= max_points:
+            return res
+    return "1d"
@@ -0,0 +1,216 @@
+"""
+Multi-resolution rollups (5m, 15m, 1h, 1d) derived from 1-minute bars.
+
+Each level is built from the level below it (1m -> 5m -> 15m -> 1h -> 1d),
+so a cycle only reads the child rows of buckets that may have changed.
+Sentiment is combined as a post-count-weighted mean of the child bars,
+i.e. sum(avg * post_count) / sum(post_count), never a mean of means.
+
+Run:
+python -m src.processing.rollups                    # one incremental pass
+python -m src.processing.rollups --from 2024-01-01  # rebuild from a date
+"""
+
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import Table, Column, Float, Integer, String, DateTime, Index, select
+
+from src.observability import readiness
+from src.processing import aggregator as agg
+from src.processing.resolutions import RESOLUTIONS, RESOLUTION_MINUTES, pick_resolution
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+# Callers pass the earliest 1-minute bar they rewrote as `since`; each
+# pass also re-rolls from this far before the last processed bar, which
+# covers bars changed by a cycle whose rollup pass failed.
+LATE_MINUTES = 35
+# Long ranges (backfills, --from) are re-rolled this many days per
+# transaction, so only one chunk of child bars is in memory at a time.
+CHUNK_DAYS = 1
+
+STATE_KEY = "rollups.last_bar_ts"
+
+
+def _bar_table(name: str) -> Table:
+    table = Table(
+        name, agg.metadata,
+        Column("ts", DateTime(timezone=True), primary_key=True),
+        Column("symbol", String, primary_key=True),
+        Column("avg_sentiment", Float),
+        Column("sentiment_strength", Float),
+        Column("post_count", Integer),
+        Column("open_price", Float),
+        Column("close_price", Float),
+        Column("high_price", Float),
+        Column("low_price", Float),
+        Column("volume", Float),
+        Column("price_change_pct", Float),
+    )
+    Index(f"ix_{name}_symbol_ts", table.c.symbol, table.c.ts)
+    return table
+
+
+TABLES: Dict[str, Table] = {"1m": agg.aggregates}
+for _res in RESOLUTIONS:
+    TABLES[_res] = _bar_table(f"aggregates_{_res}")
+
+
+def _create_tables():
+    agg.ensure_schema()
+    agg.metadata.create_all(agg.engine, tables=[TABLES[r] for r in RESOLUTIONS])
+
+
+schema = readiness.component("db.rollups", _create_tables)
+
+
+def ensure_schema():
+    schema.get()
+
+
+def _to_db_ts(ts: pd.Timestamp) -> datetime:
+    dt = ts.to_pydatetime()
+    if agg.engine.dialect.name != "sqlite":
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def floor_to(dt: datetime, minutes: int) -> datetime:
+    return pd.Timestamp(dt).floor(f"{minutes}min").to_pydatetime()
+
+
+# ---------------------------------------------------
+# Combining bars
+# ---------------------------------------------------
+def roll_bars(df: pd.DataFrame, minutes: int) -> List[dict]:
+    """Combine child bars (any resolution) into `minutes`-wide buckets."""
+    if df.empty:
+        return []
+    df = df.copy()
+    df["ts"] = pd.to_datetime(df["ts"], utc=True).dt.tz_convert(None)
+    df = df.sort_values(["symbol", "ts"], kind="stable")
+    df["bucket"] = df["ts"].dt.floor(f"{minutes}min")
+    n = df["post_count"].fillna(0).astype(float)
+    has_sent = df["avg_sentiment"].notna() & (n > 0)
+    df["_n"] = n.where(has_sent, 0.0)
+    df["_ws"] = (df["avg_sentiment"].fillna(0) * df["_n"])
+    df["_wa"] = (df["sentiment_strength"].fillna(0) * df["_n"])
+
+    g = df.groupby(["symbol", "bucket"], sort=False).agg(
+        open_price=("open_price", "first"),
+        close_price=("close_price", "last"),
+        high_price=("high_price", "max"),
+        low_price=("low_price", "min"),
+        volume=("volume", "sum"),
+        post_count=("post_count", "sum"),
+        n=("_n", "sum"),
+        ws=("_ws", "sum"),
+        wa=("_wa", "sum"),
+    )
+
+    rows = []
+    for (sym, bucket), r in zip(g.index, g.itertuples(index=False)):
+        open_p = float(r.open_price)
+        close_p = float(r.close_price)
+        rows.append({
+            "ts": _to_db_ts(bucket),
+            "symbol": sym,
+            "avg_sentiment": float(r.ws / r.n) if r.n else None,
+            "sentiment_strength": float(r.wa / r.n) if r.n else None,
+            "post_count": int(r.post_count),
+            "open_price": open_p,
+            "close_price": close_p,
+            "high_price": float(r.high_price),
+            "low_price": float(r.low_price),
+            "volume": float(r.volume),
+            "price_change_pct": ((close_p - open_p) / open_p) * 100 if open_p else 0,
+        })
+    return rows
+
+
+def _read(conn, table: Table, since: datetime, until: datetime) -> pd.DataFrame:
+    cols = [table.c.ts, table.c.symbol] + [table.c[c] for c in agg.BAR_VALUE_COLUMNS]
+    res = conn.execute(select(*cols).where(table.c.ts >= since, table.c.ts < until)).all()
+    return pd.DataFrame(res, columns=["ts", "symbol"] + agg.BAR_VALUE_COLUMNS)
+
+
+def _db_dt(dt: datetime) -> datetime:
+    """`dt` as stored: naive UTC on SQLite, aware UTC elsewhere."""
+    if agg.engine.dialect.name == "sqlite":
+        return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo is not None else dt
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def update_rollups(since: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Re-roll every level for buckets at or after the earlier of `since` (the
+    oldest 1-minute bar the caller rewrote) and the last processed bar minus
+    LATE_MINUTES, CHUNK_DAYS at a time, each chunk in its own transaction.
+    Returns rows written per level.
+    """
+    ensure_schema()
+    with agg.engine.connect() as conn:
+        last = agg.get_state(conn, STATE_KEY)
+        if last is None:
+            r = conn.execute(select(agg.aggregates.c.ts).order_by(agg.aggregates.c.ts).limit(1)).first()
+            first = r[0] if r is not None else None
+        else:
+            first = datetime.fromisoformat(last) - timedelta(minutes=LATE_MINUTES)
+        newest = conn.execute(
+            select(agg.aggregates.c.ts).order_by(agg.aggregates.c.ts.desc()).limit(1)
+        ).first()
+    if newest is None:
+        return {}
+    starts = [_db_dt(dt) for dt in (since, first) if dt is not None]
+    if not starts:
+        return {}
+    lo, end = min(starts), _db_dt(newest[0])
+
+    written = {res: 0 for res in RESOLUTIONS}
+    while lo <= end:
+        # chunks end on day boundaries, so no bucket of any level straddles two
+        hi = floor_to(lo, 1440) + timedelta(days=CHUNK_DAYS)
+        with agg.engine.begin() as conn:
+            for res, (minutes, child) in RESOLUTIONS.items():
+                rows = roll_bars(_read(conn, TABLES[child], floor_to(lo, minutes), hi), minutes)
+                for i in range(0, len(rows), 5000):
+                    agg.upsert_bars(conn, rows[i:i + 5000], table=TABLES[res])
+                written[res] += len(rows)
+        lo = hi
+
+    with agg.engine.begin() as conn:
+        agg.set_state(conn, {STATE_KEY: newest[0].isoformat()})
+    return written
+
+
+# ---------------------------------------------------
+# Reading
+# ---------------------------------------------------
+def get_bars(symbol: str, resolution: str = "1m", limit: int = 200) -> List[dict]:
+    """Most recent `limit` bars for `symbol` at `resolution`, oldest -> newest."""
+    if resolution not in TABLES:
+        raise ValueError(f"unknown resolution {resolution!r}; expected one of {list(TABLES)}")
+    ensure_schema()
+    table = TABLES[resolution]
+    stmt = (
+        select(table)
+        .where(table.c.symbol == symbol)
+        .order_by(table.c.ts.desc())
+        .limit(limit)
+    )
+    with agg.read_engine.connect() as conn:
+        res = conn.execute(stmt).all()
+    return [dict(r._mapping) for r in res][::-1]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="maintain 5m/15m/1h/1d rollups")
+    ap.add_argument("--from", dest="since", default=None,
+                    type=lambda s: datetime.fromisoformat(s.replace("Z", "+00:00")),
+                    help="rebuild buckets from this time (default: incremental)")
+    args = ap.parse_args()
+    print(update_rollups(args.since))
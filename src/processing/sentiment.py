@@ -1,7 +1,98 @@
+"""
+Sentiment scoring.
+
+- `score_text(text)`: score of one string in [-1.0, 1.0].
+- `score_texts(texts)`: the same for a batch. Repeated texts are scored
+  once; batches with at least PARALLEL_MIN distinct texts are split over
+  a process pool, each worker holding its own analyzer (VADER only; the
+  transformer backend batches in-process).
+- `get_backend()`: the scoring backend selected by SENTIMENT_BACKEND
+  (VADER by default, see sentiment_backends).
+- `get_analyzer()`: the one SentimentIntensityAnalyzer shared by the
+  process (building one loads the lexicon, so do not create more).
+- Both scorers go through the content-hash cache in sentiment_cache
+  (`get_cache().stats()` for hit/miss/eviction counts). Bump
+  CLEAN_VERSION whenever clean_text changes.
+
+Env:
+SENTIMENT_WORKERS        (default cpu_count - 1; 1 disables the pool)
+SENTIMENT_PARALLEL_MIN   (distinct texts before the pool is used, default 20000)
+SENTIMENT_CACHE_SIZE, SENTIMENT_CACHE_PATH   (see sentiment_cache)
+SENTIMENT_BACKEND, SENTIMENT_MODEL, ...      (see sentiment_backends)
+
+Run (benchmark):
+python scripts/bench_sentiment.py --posts 100000
+"""
+
+import os
 import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Optional
+
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
-_analyzer = SentimentIntensityAnalyzer()
+from src.observability import metrics, tracing
+from src.processing import sentiment_backends, sentiment_cache
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+WORKERS = int(os.getenv("SENTIMENT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+PARALLEL_MIN = int(os.getenv("SENTIMENT_PARALLEL_MIN", "20000"))
+CHUNK_SIZE = 2000  # texts per pool task
+CLEAN_VERSION = 2  # 2: fixed double-escaped patterns
+
+SCORE_SECONDS = metrics.histogram("sentiment_score_seconds", "Backend scoring time per call (cache misses)",
+                                  ["backend"])
+TEXTS_SCORED = metrics.counter("sentiment_texts_total", "Texts requested, by cache outcome", ["backend", "outcome"])
+
+# URLs, and anything that is not a word char, whitespace or basic punctuation
+_STRIP_RE = re.compile(r"http\S+|[^\w\s\-'\"]+")
+
+_analyzer: Optional[SentimentIntensityAnalyzer] = None
+_backend: Optional[sentiment_backends.SentimentBackend] = None
+_cache: Optional[sentiment_cache.SentimentCache] = None
+_init_lock = threading.RLock()  # get_cache -> get_backend -> get_analyzer nest
+
+
+def get_analyzer() -> SentimentIntensityAnalyzer:
+    global _analyzer
+    if _analyzer is None:
+        with _init_lock:
+            if _analyzer is None:
+                _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def get_backend() -> sentiment_backends.SentimentBackend:
+    global _backend
+    if _backend is None:
+        with _init_lock:
+            if _backend is None:
+                if sentiment_backends.BACKEND == "vader":
+                    _backend = sentiment_backends.VaderBackend(get_analyzer())
+                else:
+                    _backend = sentiment_backends.make_backend(sentiment_backends.BACKEND)
+    return _backend
+
+
+def scorer_version() -> str:
+    """Backend + cleaning rules; keys the score cache."""
+    return f"{get_backend().version}/clean-{CLEAN_VERSION}"
+
+
+def get_cache() -> Optional[sentiment_cache.SentimentCache]:
+    """The process-wide score cache, or None when SENTIMENT_CACHE_SIZE=0."""
+    global _cache
+    if _cache is None and sentiment_cache.CACHE_SIZE > 0:
+        with _init_lock:
+            if _cache is None:
+                _cache = sentiment_cache.SentimentCache(
+                    scorer_version(), sentiment_cache.CACHE_SIZE, sentiment_cache.CACHE_PATH or None)
+    return _cache
+
 
 def clean_text(text: str) -> str:
     """
@@ -9,18 +100,84 @@ def clean_text(text: str) -> str:
     """
     if not text:
         return ""
-    text = re.sub(r"http\S+", "", text)          # remove URLs
-    text = re.sub(r"[\r\n\t]+", " ", text)       # remove newlines/tabs
-    text = re.sub(r"[^\\w\\s\\-\\'\\\"]+", " ", text)  # keep words, whitespace, basic punctuation
-    text = re.sub(r"\\s+", " ", text).strip()
-    return text
+    # one regex pass for URLs + unwanted characters, then collapse whitespace
+    # (newlines/tabs included)
+    return " ".join(_STRIP_RE.sub(" ", text).split())
+
 
 def score_text(text: str) -> float:
     """
-    Return VADER compound score in [-1.0, 1.0].
+    Return the sentiment score in [-1.0, 1.0] (VADER compound by default).
     """
     if text is None:
         return 0.0
     cleaned = clean_text(text)
-    vs = _analyzer.polarity_scores(cleaned)
-    return float(vs.get("compound", 0.0))
+    cache = get_cache()
+    if cache is None:
+        return _score_cleaned(cleaned)
+    key = sentiment_cache.text_key(cache.version, cleaned)
+    score = cache.get(key)
+    if score is None:
+        score = _score_cleaned(cleaned)
+        cache.put(key, score)
+    else:
+        TEXTS_SCORED.labels(get_backend().name, "cached").inc()
+    return score
+
+
+def _score_cleaned(cleaned: str) -> float:
+    backend = get_backend()
+    t0 = time.perf_counter()
+    score = backend.score_batch([cleaned])[0]
+    SCORE_SECONDS.labels(backend.name).observe(time.perf_counter() - t0)
+    TEXTS_SCORED.labels(backend.name, "scored").inc()
+    return score
+
+
+# ---------------------------------------------------
+# Batch scoring
+# ---------------------------------------------------
+def _score_chunk(texts: List[str]) -> List[float]:
+    return get_backend().score_batch(texts)
+
+
+def _worker_init():
+    get_backend()
+
+
+@tracing.traced("score_texts")
+def score_texts(texts: Iterable[Optional[str]], workers: Optional[int] = None) -> List[float]:
+    """
+    Compound scores for `texts`, in input order (None scores 0.0).
+    """
+    texts = list(texts)
+    with tracing.span("sentiment.clean", texts=len(texts)):
+        cleaned = {t: clean_text(t) for t in texts if t is not None}
+        unique = list(dict.fromkeys(cleaned.values()))
+    workers = WORKERS if workers is None else workers
+
+    cache = get_cache()
+    with tracing.span("sentiment.cache_lookup"):
+        keys = {c: sentiment_cache.text_key(cache.version, c) for c in unique} if cache is not None else {}
+        hits = cache.get_many(keys.values()) if cache is not None else {}
+        todo = [c for c in unique if keys.get(c) not in hits]
+
+    backend = get_backend()
+    t0 = time.perf_counter()
+    with tracing.span(f"sentiment.{backend.name}", texts=len(todo)):
+        if workers <= 1 or len(todo) < PARALLEL_MIN or not backend.parallel:
+            scores = _score_chunk(todo)
+        else:
+            chunks = [todo[i:i + CHUNK_SIZE] for i in range(0, len(todo), CHUNK_SIZE)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as ex:
+                scores = [s for part in ex.map(_score_chunk, chunks) for s in part]
+    if todo:
+        SCORE_SECONDS.labels(backend.name).observe(time.perf_counter() - t0)
+    TEXTS_SCORED.labels(backend.name, "scored").inc(len(todo))
+    TEXTS_SCORED.labels(backend.name, "cached").inc(len(texts) - len(todo))
+
+    by_clean = dict(zip(todo, scores))
+    if cache is not None:
+        cache.put_many({keys[c]: s for c, s in by_clean.items()})
+        by_clean.update((c, hits[k]) for c, k in keys.items() if k in hits)
+    return [by_clean[cleaned[t]] if t is not None else 0.0 for t in texts]
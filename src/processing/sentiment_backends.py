@@ -0,0 +1,175 @@
+"""
+Sentiment backends for src.processing.sentiment.
+
+A backend scores a batch of cleaned texts to floats in [-1.0, 1.0]:
+
+- `vader` (default): VADER compound score. Cheap, lexicon based,
+  single-threaded; sentiment.score_texts fans large batches out over a
+  process pool for it.
+- `transformer`: a sequence-classification model from the Hugging Face
+  hub (default ProsusAI/finbert; ElKulako/cryptobert also works), run on
+  CPU. score = P(positive/bullish) - P(negative/bearish). Batches are
+  formed dynamically: texts are tokenized once, sorted by length
+  (length bucketing) and packed until `batch_size` texts or
+  `max_batch_tokens` padded tokens, so short posts are not padded to the
+  longest one. torch intra-op threads are capped and the Linear layers
+  can be int8 dynamically quantized.
+
+Env:
+SENTIMENT_BACKEND=vader|transformer
+SENTIMENT_MODEL             (transformer, default ProsusAI/finbert)
+SENTIMENT_BATCH             (texts per batch, default 32)
+SENTIMENT_BATCH_TOKENS      (padded tokens per batch, default 4096)
+SENTIMENT_MAX_LENGTH        (tokens per text, default 128)
+SENTIMENT_TORCH_THREADS     (default cpu_count)
+SENTIMENT_QUANTIZE=1        (int8 dynamic quantization of Linear layers)
+
+Run (benchmark):
+python scripts/bench_sentiment_backends.py --posts 2000
+"""
+
+import importlib.metadata
+import os
+from typing import Dict, List, Optional
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+BACKEND = os.getenv("SENTIMENT_BACKEND", "vader").lower()
+MODEL = os.getenv("SENTIMENT_MODEL", "ProsusAI/finbert")
+BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH", "32"))
+BATCH_TOKENS = int(os.getenv("SENTIMENT_BATCH_TOKENS", "4096"))
+MAX_LENGTH = int(os.getenv("SENTIMENT_MAX_LENGTH", "128"))
+TORCH_THREADS = int(os.getenv("SENTIMENT_TORCH_THREADS", str(os.cpu_count() or 1)))
+QUANTIZE = os.getenv("SENTIMENT_QUANTIZE", "0") == "1"
+
+POSITIVE_LABELS = {"positive", "pos", "bullish"}
+NEGATIVE_LABELS = {"negative", "neg", "bearish"}
+
+
+class SentimentBackend:
+    name = "base"
+    # whether sentiment.score_texts may split large batches over processes
+    # (each worker builds its own backend)
+    parallel = False
+
+    @property
+    def version(self) -> str:
+        """Identifies the scores this backend produces (part of the cache key)."""
+        raise NotImplementedError
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        raise NotImplementedError
+
+
+class VaderBackend(SentimentBackend):
+    name = "vader"
+    parallel = True
+
+    def __init__(self, analyzer=None):
+        if analyzer is None:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+            analyzer = SentimentIntensityAnalyzer()
+        self.analyzer = analyzer
+
+    @property
+    def version(self) -> str:
+        return f"vader-{importlib.metadata.version('vaderSentiment')}"
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        scores = self.analyzer.polarity_scores
+        return [float(scores(t).get("compound", 0.0)) for t in texts]
+
+
+class TransformerBackend(SentimentBackend):
+    name = "transformer"
+
+    def __init__(
+        self,
+        model: str = MODEL,
+        batch_size: int = BATCH_SIZE,
+        max_batch_tokens: int = BATCH_TOKENS,
+        max_length: int = MAX_LENGTH,
+        threads: Optional[int] = TORCH_THREADS,
+        quantize: bool = QUANTIZE,
+    ):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.torch = torch
+        self.model_name = model
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_length = max_length
+        self.quantize = quantize
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model)
+        net = AutoModelForSequenceClassification.from_pretrained(model).eval()
+        if quantize:
+            net = torch.quantization.quantize_dynamic(net, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = net
+        self.pos_idx, self.neg_idx = self._label_indices(net.config.id2label)
+        print(f"[sentiment] {model} on CPU, threads={torch.get_num_threads()}, "
+              f"{'int8' if quantize else 'fp32'}, labels={net.config.id2label}")
+
+    @staticmethod
+    def _label_indices(id2label: Dict[int, str]):
+        labels = {int(i): str(l).lower() for i, l in id2label.items()}
+        pos = [i for i, l in labels.items() if l in POSITIVE_LABELS]
+        neg = [i for i, l in labels.items() if l in NEGATIVE_LABELS]
+        if pos and neg:
+            return pos, neg
+        # unnamed LABEL_i heads: assume (negative, positive) or (negative, neutral, positive)
+        if len(labels) in (2, 3):
+            return [len(labels) - 1], [0]
+        raise ValueError(f"cannot tell positive/negative classes apart in {id2label}")
+
+    @property
+    def version(self) -> str:
+        return f"transformer-{self.model_name}-{'int8' if self.quantize else 'fp32'}-L{self.max_length}"
+
+    def _batches(self, lengths: List[int]) -> List[List[int]]:
+        """Indices grouped into length-sorted batches within the size/token budget."""
+        order = sorted(range(len(lengths)), key=lengths.__getitem__)
+        batches, cur, longest = [], [], 0
+        for i in order:
+            longest_if_added = max(longest, lengths[i])
+            if cur and (len(cur) >= self.batch_size
+                        or longest_if_added * (len(cur) + 1) > self.max_batch_tokens):
+                batches.append(cur)
+                cur, longest_if_added = [], lengths[i]
+            cur.append(i)
+            longest = longest_if_added
+        if cur:
+            batches.append(cur)
+        return batches
+
+    def score_batch(self, texts: List[str]) -> List[float]:
+        if not texts:
+            return []
+        torch = self.torch
+        enc = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        ids = enc["input_ids"]
+        scores = [0.0] * len(texts)
+        with torch.inference_mode():
+            for batch in self._batches([len(x) for x in ids]):
+                features = [{k: enc[k][i] for k in enc.keys()} for i in batch]
+                inputs = self.tokenizer.pad(features, return_tensors="pt")
+                probs = torch.softmax(self.model(**inputs).logits, dim=-1)
+                s = probs[:, self.pos_idx].sum(-1) - probs[:, self.neg_idx].sum(-1)
+                for i, v in zip(batch, s.tolist()):
+                    scores[i] = float(v)
+        return scores
+
+
+BACKENDS = {"vader": VaderBackend, "transformer": TransformerBackend}
+
+
+def make_backend(name: str = BACKEND, **kwargs) -> SentimentBackend:
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown sentiment backend {name!r}; expected one of {sorted(BACKENDS)}")
+    return cls(**kwargs)
@@ -0,0 +1,157 @@
+"""
+Content-hash cache for sentiment scores.
+
+Keys are sha1(version + cleaned text), so reposts / cross-posts / seeded
+sample posts are scored once. Two tiers:
+
+- memory: an LRU of `size` entries (OrderedDict);
+- disk (optional): a small SQLite file that survives restarts. Hits are
+  promoted into the LRU; new scores are written through.
+
+The version string (sentiment.SCORER_VERSION) names the scoring model and
+the cleaning rules. It is part of every key, and disk rows written under
+another version are deleted when the file is opened.
+
+Env:
+SENTIMENT_CACHE_SIZE   (LRU entries, default 100000; 0 disables the cache)
+SENTIMENT_CACHE_PATH   (SQLite file for the disk tier, e.g. ./data/sentiment_cache.db; unset = memory only)
+
+Run (stats for the disk tier):
+SENTIMENT_CACHE_PATH=./data/sentiment_cache.db python -m src.processing.sentiment_cache
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "100000"))
+CACHE_PATH = os.getenv("SENTIMENT_CACHE_PATH", "")
+
+
+def text_key(version: str, cleaned: str) -> str:
+    return hashlib.sha1(f"{version}\x00{cleaned}".encode("utf-8")).hexdigest()
+
+
+class SentimentCache:
+    def __init__(self, version: str, size: int = CACHE_SIZE, path: Optional[str] = None):
+        self.version = version
+        self.size = size
+        self.path = path
+        self._lru: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = 0
+        self._db = self._open_disk(path) if path else None
+
+    # ---------------------------------------------------
+    # disk tier
+    # ---------------------------------------------------
+    def _open_disk(self, path: str) -> sqlite3.Connection:
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS sentiment_cache "
+                   "(key TEXT PRIMARY KEY, version TEXT NOT NULL, score REAL NOT NULL)")
+        stale = db.execute("DELETE FROM sentiment_cache WHERE version <> ?", (self.version,)).rowcount
+        if stale:
+            print(f"[sentiment_cache] dropped {stale} entries from other scorer versions")
+        return db
+
+    def _disk_get(self, keys) -> Dict[str, float]:
+        out = {}
+        keys = list(keys)
+        for i in range(0, len(keys), 500):  # stay under SQLite's bound-parameter limit
+            part = keys[i:i + 500]
+            q = f"SELECT key, score FROM sentiment_cache WHERE key IN ({','.join('?' * len(part))})"
+            out.update(self._db.execute(q, part).fetchall())
+        return out
+
+    def _disk_put(self, items: Dict[str, float]):
+        self._db.execute("BEGIN")
+        self._db.executemany(
+            "INSERT OR REPLACE INTO sentiment_cache (key, version, score) VALUES (?, ?, ?)",
+            [(k, self.version, v) for k, v in items.items()],
+        )
+        self._db.execute("COMMIT")
+
+    # ---------------------------------------------------
+    # memory tier
+    # ---------------------------------------------------
+    def _remember(self, key: str, score: float):
+        self._lru[key] = score
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, float]:
+        """Cached scores for the keys present in either tier."""
+        found, missing = {}, []
+        with self._lock:
+            for k in keys:
+                v = self._lru.get(k)
+                if v is None:
+                    missing.append(k)
+                else:
+                    self._lru.move_to_end(k)
+                    found[k] = v
+            self.hits += len(found)
+            from_disk = self._disk_get(missing) if missing and self._db is not None else {}
+            for k, v in from_disk.items():
+                self._remember(k, v)
+            found.update(from_disk)
+            self.disk_hits += len(from_disk)
+            self.misses += len(missing) - len(from_disk)
+        return found
+
+    def put_many(self, items: Dict[str, float]):
+        if not items:
+            return
+        with self._lock:
+            for k, v in items.items():
+                self._remember(k, v)
+            if self._db is not None:
+                self._disk_put(items)
+
+    def get(self, key: str) -> Optional[float]:
+        return self.get_many([key]).get(key)
+
+    def put(self, key: str, score: float):
+        self.put_many({key: score})
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM sentiment_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            out = {
+                "version": self.version,
+                "entries": len(self._lru),
+                "size": self.size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+            if self._db is not None:
+                out["disk_entries"] = self._db.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0]
+            return out
+
+
+if __name__ == "__main__":
+    from src.processing import sentiment
+
+    cache = sentiment.get_cache()
+    print(cache.stats() if cache is not None else "[sentiment_cache] disabled (SENTIMENT_CACHE_SIZE=0)")
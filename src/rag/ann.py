@@ -0,0 +1,189 @@
+"""
+FAISS index configurations for the RAG index.
+
+kind       structure                                        search knob
+flat       IDMap2(IndexFlatL2)                              exact
+ivf_flat   IndexIVFFlat, hashtable direct map               nprobe
+ivf_pq     IndexIVFPQ, PQ_M x PQ_NBITS-bit codes            nprobe
+hnsw       IDMap2(IndexHNSWFlat(HNSW_M))                    efSearch
+
+All kinds take arbitrary 63-bit ids (snapshots.doc_id) through
+add_with_ids. IVF kinds remove ids in place and accept an ID selector at
+search time, so filtered (per-symbol) searches only scan the probed lists.
+HNSW cannot remove vectors: the indexer leaves them as tombstones (their
+documents are gone from the doc store, so readers skip them) and rebuilds
+once they pass a fraction of the index. IVF kinds need training data
+(about 39 points per list, and 39 * 2^PQ_NBITS for the PQ codebooks); the
+indexer stays on a flat index until the corpus is large enough.
+
+Rough guide for 384-d MiniLM vectors: flat up to ~100k documents;
+ivf_flat with nprobe 8-32 into the low millions; ivf_pq when the vectors
+no longer fit in RAM (PQ_M=48 codes are 48 bytes instead of 1536); hnsw
+for the lowest latency when memory is not the constraint.
+scripts/bench_ann.py reports recall@k, QPS and memory for each.
+
+Env:
+RAG_INDEX_TYPE=flat        flat | ivf_flat | ivf_pq | hnsw
+RAG_IVF_NLIST=0            inverted lists; 0 = 4*sqrt(n) when trained
+RAG_NPROBE=16              lists scanned per query
+RAG_PQ_M=48                PQ sub-quantizers (must divide the dimension)
+RAG_PQ_NBITS=8
+RAG_HNSW_M=32
+RAG_EF_CONSTRUCTION=80
+RAG_EF_SEARCH=64
+"""
+
+import math
+import os
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")
+NLIST = int(os.getenv("RAG_IVF_NLIST", "0"))
+NPROBE = int(os.getenv("RAG_NPROBE", "16"))
+PQ_M = int(os.getenv("RAG_PQ_M", "48"))
+PQ_NBITS = int(os.getenv("RAG_PQ_NBITS", "8"))
+HNSW_M = int(os.getenv("RAG_HNSW_M", "32"))
+EF_CONSTRUCTION = int(os.getenv("RAG_EF_CONSTRUCTION", "80"))
+EF_SEARCH = int(os.getenv("RAG_EF_SEARCH", "64"))
+TRAIN_PER_CENTROID = 39  # faiss k-means warns below this
+
+if INDEX_TYPE not in KINDS:
+    raise ValueError(f"RAG_INDEX_TYPE must be one of {KINDS}, got {INDEX_TYPE!r}")
+
+
+def kind_of(index) -> str:
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    if isinstance(inner, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(inner, faiss.IndexIVF):
+        return "ivf_flat"
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def nlist_for(n: int) -> int:
+    return NLIST or max(16, min(65536, int(4 * math.sqrt(max(n, 1)))))
+
+
+def min_train(kind: str, n: int) -> int:
+    """Vectors needed before `kind` can be trained on a corpus of n."""
+    if kind == "ivf_flat":
+        return TRAIN_PER_CENTROID * nlist_for(n)
+    if kind == "ivf_pq":
+        return TRAIN_PER_CENTROID * max(nlist_for(n), 2 ** PQ_NBITS)
+    return 0
+
+
+# ---------------------------------------------------
+# Build
+# ---------------------------------------------------
+def new_index(kind: str, d: int, train: Optional[np.ndarray] = None, **params):
+    """Empty index of `kind`; IVF kinds are trained on `train`.
+
+    params override the module config: nlist, pq_m, pq_nbits, hnsw_m,
+    ef_construction."""
+    if kind == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(d))
+    if kind == "hnsw":
+        inner = faiss.IndexHNSWFlat(d, params.get("hnsw_m", HNSW_M))
+        inner.hnsw.efConstruction = params.get("ef_construction", EF_CONSTRUCTION)
+        inner.hnsw.efSearch = EF_SEARCH
+        return faiss.IndexIDMap2(inner)
+    if kind not in ("ivf_flat", "ivf_pq"):
+        raise ValueError(f"unknown index kind {kind!r}")
+    n = 0 if train is None else len(train)
+    if n < min_train(kind, n):
+        raise ValueError(f"{kind} needs at least {min_train(kind, n)} training vectors, got {n}")
+    nlist = params.get("nlist") or nlist_for(n)
+    quantizer = faiss.IndexFlatL2(d)
+    if kind == "ivf_flat":
+        index = faiss.IndexIVFFlat(quantizer, d, nlist)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, d, nlist, params.get("pq_m", PQ_M),
+                                 params.get("pq_nbits", PQ_NBITS))
+    index.train(np.ascontiguousarray(train, dtype="float32"))
+    # id -> list lookups for remove_ids / reconstruct with arbitrary ids
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    index.nprobe = NPROBE
+    return index
+
+
+def build(kind: str, vectors: np.ndarray, ids: np.ndarray, **params):
+    """Index of `kind` holding vectors under ids (trained on the vectors)."""
+    index = new_index(kind, vectors.shape[1], vectors if kind.startswith("ivf") else None, **params)
+    if len(ids):
+        index.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), ids.astype("int64"))
+    return index
+
+
+def ids_of(index) -> np.ndarray:
+    """Every id stored in the index (positions for a bare flat index)."""
+    if hasattr(index, "id_map"):
+        return faiss.vector_to_array(index.id_map).astype("int64")
+    if isinstance(index, faiss.IndexIVF):
+        invlists = index.invlists
+        parts = [faiss.rev_swig_ptr(invlists.get_ids(l), invlists.list_size(l)).copy()
+                 for l in range(index.nlist) if invlists.list_size(l)]
+        return np.concatenate(parts).astype("int64") if parts else np.zeros(0, "int64")
+    return np.arange(index.ntotal, dtype="int64")
+
+
+def vectors_of(index) -> Tuple[np.ndarray, np.ndarray]:
+    """(ids, vectors). Exact for flat / hnsw / ivf_flat, PQ-decoded for ivf_pq."""
+    ids = ids_of(index)
+    if not len(ids):
+        return ids, np.zeros((0, index.d), "float32")
+    if hasattr(index, "id_map"):
+        inner = faiss.downcast_index(index.index)
+        return ids, inner.reconstruct_n(0, inner.ntotal)
+    if isinstance(index, faiss.IndexIVF):
+        return ids, np.vstack([index.reconstruct(int(i)) for i in ids])
+    return ids, index.reconstruct_n(0, index.ntotal)
+
+
+def flat_vectors(index) -> Tuple[np.ndarray, np.ndarray]:
+    """(ids, vectors) of a flat index without copying: the vectors are a
+    read-only view of the index's own storage, valid while the index is
+    alive. Other kinds fall back to vectors_of."""
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    if not isinstance(inner, faiss.IndexFlat) or not inner.ntotal:
+        return vectors_of(index)
+    view = faiss.rev_swig_ptr(inner.get_xb(), inner.ntotal * inner.d).reshape(inner.ntotal, inner.d)
+    view.flags.writeable = False
+    return ids_of(index), view
+
+
+# ---------------------------------------------------
+# Search
+# ---------------------------------------------------
+def set_search_params(index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    kind = kind_of(index)
+    if kind.startswith("ivf") and nprobe:
+        faiss.extract_index_ivf(index).nprobe = nprobe
+    elif kind == "hnsw" and ef_search:
+        faiss.downcast_index(index.index).hnsw.efSearch = ef_search
+
+
+def supports_selector(index) -> bool:
+    """faiss 1.7.4 takes SearchParameters on IVF, but not through IndexIDMap."""
+    return isinstance(index, faiss.IndexIVF)
+
+
+def search_subset(index, query_vec: np.ndarray, k: int, ids: np.ndarray, nprobe: Optional[int] = None):
+    """Top-k restricted to `ids` (IVF kinds only; see supports_selector)."""
+    sel = faiss.IDSelectorBatch(np.ascontiguousarray(ids, dtype="int64"))
+    params = faiss.SearchParametersIVF(sel=sel, nprobe=nprobe or index.nprobe)
+    return index.search(query_vec, k, params=params)
+
+
+def memory_bytes(index) -> int:
+    """Serialized size: what the index occupies once loaded."""
+    return int(faiss.serialize_index(index).nbytes)
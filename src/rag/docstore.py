@@ -0,0 +1,196 @@
+"""
+SQLite side store for RAG document text and metadata, keyed by FAISS id.
+
+Replaces the pickled meta.pkl: a snapshot's documents stay on disk and
+readers look up only the k rows a query returns. Read-only stores open
+the file with immutable=1 (snapshots never change once published) and
+SQLite's mmap, so lookups are served from the page cache with no per-
+process copy of the corpus. The retriever's partition build reads just
+(id, symbols, ts) through `scan()`.
+
+    store = DocStore(path)                     # read-only
+    store.get(faiss_id) -> {"id", "text", "metadata"} | None
+    store.get_many(ids) -> {faiss_id: doc}
+
+    work = DocStore(path, writable=True)       # the indexer's working copy
+    work.put_many({faiss_id: doc}); work.delete_many(ids)
+    work.backup_to(snapshot_path)
+
+Env:
+RAG_DOCSTORE_MMAP  bytes of the file SQLite may mmap (default 256 MiB)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+MMAP_BYTES = int(os.getenv("RAG_DOCSTORE_MMAP", str(256 * 1024 * 1024)))
+LOOKUP_CHUNK = 500  # ids per IN (...) query, under SQLite's variable limit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id       INTEGER PRIMARY KEY,   -- FAISS id
+    key      TEXT NOT NULL,         -- document id, e.g. post:t3_abc / agg:BTC-USD:<window>
+    text     TEXT NOT NULL,
+    source   TEXT,
+    symbols  TEXT,                  -- space-separated base symbols ("BTC ETH")
+    ts       REAL,                  -- epoch seconds, NULL for undated documents
+    metadata TEXT                   -- JSON
+);
+CREATE INDEX IF NOT EXISTS ix_docs_source_ts ON docs (source, ts);
+"""
+
+
+def _symbols(doc: dict) -> List[str]:
+    md = doc.get("metadata", {})
+    return md.get("symbols") or ([md["symbol"]] if md.get("symbol") else [])
+
+
+def _row(i: int, doc: dict) -> tuple:
+    md = doc.get("metadata", {})
+    return (int(i), str(doc.get("id", i)), doc["text"], md.get("source"),
+            " ".join(_symbols(doc)), md.get("ts"), json.dumps(md, default=str))
+
+
+def _doc(key: str, text: str, metadata: str) -> dict:
+    return {"id": key, "text": text, "metadata": json.loads(metadata) if metadata else {}}
+
+
+def _chunks(ids: List[int], size: int = LOOKUP_CHUNK):
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+class DocStore:
+    def __init__(self, path: str, writable: bool = False, uri: Optional[str] = None):
+        self.path = path
+        self.writable = writable
+        if uri is None:
+            uri = f"file:{path}" + ("" if writable else "?mode=ro&immutable=1")
+        self._uri = uri
+        self._local = threading.local()
+        self._keeper = None
+        if writable:
+            conn = self._conn()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @classmethod
+    def in_memory(cls, docs: Dict[int, dict]) -> "DocStore":
+        """A writable store in shared-cache memory (for the shipped pickle)."""
+        store = cls(":memory:", writable=True,
+                    uri=f"file:ragdocs-{uuid.uuid4().hex}?mode=memory&cache=shared")
+        store._keeper = store._conn()  # the memory db lives while one connection is open
+        store.put_many(docs)
+        return store
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={MMAP_BYTES}")
+            self._local.conn = conn
+        return conn
+
+    # -------------------- reads --------------------
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def __contains__(self, i) -> bool:
+        return self._conn().execute("SELECT 1 FROM docs WHERE id = ?", (int(i),)).fetchone() is not None
+
+    def get(self, i) -> Optional[dict]:
+        r = self._conn().execute("SELECT key, text, metadata FROM docs WHERE id = ?", (int(i),)).fetchone()
+        return _doc(*r) if r else None
+
+    def get_many(self, ids: Iterable[int]) -> Dict[int, dict]:
+        ids = [int(i) for i in ids]
+        out = {}
+        conn = self._conn()
+        for chunk in _chunks(ids):
+            q = f"SELECT id, key, text, metadata FROM docs WHERE id IN ({','.join('?' * len(chunk))})"
+            for i, key, text, md in conn.execute(q, chunk):
+                out[i] = _doc(key, text, md)
+        return out
+
+    def present(self, ids: Iterable[int]) -> Set[int]:
+        ids = [int(i) for i in ids]
+        out = set()
+        conn = self._conn()
+        for chunk in _chunks(ids):
+            q = f"SELECT id FROM docs WHERE id IN ({','.join('?' * len(chunk))})"
+            out.update(r[0] for r in conn.execute(q, chunk))
+        return out
+
+    def texts(self, ids: Iterable[int]) -> Dict[int, str]:
+        ids = [int(i) for i in ids]
+        out = {}
+        conn = self._conn()
+        for chunk in _chunks(ids):
+            q = f"SELECT id, text FROM docs WHERE id IN ({','.join('?' * len(chunk))})"
+            out.update(conn.execute(q, chunk))
+        return out
+
+    def scan(self) -> Iterator[Tuple[int, str, Optional[float]]]:
+        """(id, symbols, ts) of every document."""
+        return self._conn().execute("SELECT id, symbols, ts FROM docs")
+
+    def scan_text(self, batch: int = 1000) -> Iterator[List[Tuple[int, str]]]:
+        cur = self._conn().execute("SELECT id, text FROM docs ORDER BY id")
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                return
+            yield rows
+
+    def expired(self, cutoffs: Dict[str, float]) -> List[int]:
+        """Ids of documents of each source older than its cutoff (epoch s)."""
+        conn = self._conn()
+        out = []
+        for source, cutoff in cutoffs.items():
+            out += [r[0] for r in conn.execute(
+                "SELECT id FROM docs WHERE source = ? AND ts < ?", (source, cutoff))]
+        return out
+
+    # -------------------- writes --------------------
+    def put_many(self, docs: Dict[int, dict]):
+        with self._conn() as conn:
+            conn.executemany("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             [_row(i, d) for i, d in docs.items()])
+
+    def delete_many(self, ids: Iterable[int]) -> Counter:
+        """Deletes and returns the count removed per source."""
+        ids = [int(i) for i in ids]
+        removed = Counter()
+        with self._conn() as conn:
+            for chunk in _chunks(ids):
+                marks = ",".join("?" * len(chunk))
+                removed.update(dict(conn.execute(
+                    f"SELECT COALESCE(source, ''), COUNT(*) FROM docs WHERE id IN ({marks}) GROUP BY 1", chunk)))
+                conn.execute(f"DELETE FROM docs WHERE id IN ({marks})", chunk)
+        return removed
+
+    def backup_to(self, path: str):
+        """Consistent copy of the whole store (SQLite online backup)."""
+        dest = sqlite3.connect(path)
+        try:
+            self._conn().backup(dest)
+            dest.execute("PRAGMA journal_mode=DELETE")  # a self-contained file for read-only opens
+        finally:
+            dest.close()
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        if self._keeper is not None and self._keeper is not conn:
+            self._keeper.close()
+        self._keeper = None
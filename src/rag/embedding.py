@@ -0,0 +1,281 @@
+"""
+Query embedding service for the retriever.
+
+Every /api/chat request and dashboard question embeds one short query.
+Calling the model once per request wastes most of its cost on per-call
+overhead (tokenizer setup, a batch-of-one forward pass), and concurrent
+requests each start their own forward pass and fight over the same cores.
+EmbeddingService puts a cache and a micro-batcher in front of the model:
+
+- cache: an LRU (OrderedDict) of normalized query -> vector. Queries are
+  normalized by collapsing whitespace and, with QUERY_CASEFOLD, case
+  (the default all-MiniLM-L6-v2 is uncased, so this does not change the
+  vector). Repeated dashboard questions and retried chats skip the model.
+- micro-batching: cache misses go onto a queue. One worker thread takes
+  whatever is queued, waits up to WINDOW_MS for more (at most MAX_BATCH;
+  no wait when the previous batch was a single query too), encodes the
+  distinct texts in one model call and hands each caller its row. With
+  a single worker, the model's intra-op threads (THREADS) get the cores
+  to themselves instead of being oversubscribed by parallel calls.
+  WINDOW_MS=0 or MAX_BATCH=1 encodes in the caller's thread instead.
+
+`load_model()` is shared with the indexer, so documents and queries are
+embedded by the same backend:
+- torch: SentenceTransformer in fp32;
+- int8: the same model with its Linear layers int8 dynamically quantized
+  (torch.quantization.quantize_dynamic);
+- onnx: sentence-transformers' ONNX Runtime backend (needs
+  optimum[onnxruntime]). ONNX_FILE picks one of the exports in the model
+  repo, e.g. onnx/model_qint8_avx512_vnni.onnx for int8 weights.
+Switching the backend moves vectors slightly; rebuild the index after
+changing it (python -m src.rag.indexer --rebuild).
+
+Run (load test):
+python scripts/load_chat.py --clients 16 --requests 400
+
+Env:
+RAG_EMBED_BACKEND=torch     torch | int8 | onnx
+RAG_EMBED_ONNX_FILE         ONNX file inside the model repo (onnx backend)
+RAG_EMBED_THREADS           torch intra-op threads (default cpu_count)
+RAG_EMBED_WINDOW_MS=2       how long the batcher waits for more queries
+RAG_EMBED_MAX_BATCH=32      queries per model call
+RAG_QUERY_CACHE_SIZE=4096   cached query vectors (0 disables the cache)
+RAG_QUERY_CASEFOLD=1
+(+ RAG_EMBED_MODEL, see src.rag.snapshots)
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.observability import metrics
+from src.rag import snapshots
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+BACKENDS = ("torch", "int8", "onnx")
+BACKEND = os.getenv("RAG_EMBED_BACKEND", "torch").lower()
+ONNX_FILE = os.getenv("RAG_EMBED_ONNX_FILE", "")
+THREADS = int(os.getenv("RAG_EMBED_THREADS", str(os.cpu_count() or 1)))
+WINDOW_MS = float(os.getenv("RAG_EMBED_WINDOW_MS", "2"))
+MAX_BATCH = int(os.getenv("RAG_EMBED_MAX_BATCH", "32"))
+CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "4096"))
+QUERY_CASEFOLD = os.getenv("RAG_QUERY_CASEFOLD", "1") == "1"
+
+if BACKEND not in BACKENDS:
+    raise ValueError(f"RAG_EMBED_BACKEND must be one of {BACKENDS}, got {BACKEND!r}")
+
+CACHE_LOOKUPS = metrics.counter("rag_query_cache_total", "Query embedding cache lookups", ["outcome"])
+BATCH_SIZE = metrics.histogram("rag_embed_batch_size", "Distinct queries per embedding model call",
+                               buckets=metrics.SIZE_BUCKETS)
+QUEUE_SECONDS = metrics.histogram("rag_embed_queue_seconds", "Time a query waited for its batch to start")
+MODEL_SECONDS = metrics.histogram("rag_embed_model_seconds", "Embedding model call time")
+
+
+def normalize_query(text: str, casefold: bool = QUERY_CASEFOLD) -> str:
+    text = " ".join(text.split())
+    return text.casefold() if casefold else text
+
+
+def load_model(model: str = snapshots.EMBED_MODEL, backend: str = BACKEND,
+               threads: Optional[int] = THREADS, onnx_file: str = ONNX_FILE):
+    """A SentenceTransformer for `backend`, with torch intra-op threads capped."""
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(threads)
+        except ImportError:
+            pass
+    if backend == "onnx":
+        kwargs = {"file_name": onnx_file} if onnx_file else {}
+        net = SentenceTransformer(model, device="cpu", backend="onnx", model_kwargs=kwargs)
+    else:
+        net = SentenceTransformer(model, device="cpu")
+        if backend == "int8":
+            import torch
+            net = torch.quantization.quantize_dynamic(net, {torch.nn.Linear}, dtype=torch.qint8)
+    print(f"[embedding] {model} on CPU, backend={backend}{f' ({onnx_file})' if onnx_file else ''}, "
+          f"threads={threads or 'default'}")
+    return net
+
+
+class _Request:
+    __slots__ = ("key", "future", "queued")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.future: Future = Future()
+        self.queued = time.perf_counter()
+
+
+class EmbeddingService:
+    def __init__(self, model=None, window_ms: float = WINDOW_MS, max_batch: int = MAX_BATCH,
+                 cache_size: int = CACHE_SIZE, casefold: bool = QUERY_CASEFOLD):
+        self._model = model
+        self.window = max(window_ms, 0.0) / 1000
+        self.max_batch = max(max_batch, 1)
+        self.cache_size = cache_size
+        self.casefold = casefold
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._last_batch = 0
+        self.hits = self.misses = self.evictions = 0
+        self.batches = self.encoded = 0
+
+    @property
+    def batching(self) -> bool:
+        return self.window > 0 and self.max_batch > 1
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = load_model()
+        return self._model
+
+    def load(self) -> "EmbeddingService":
+        self.model
+        return self
+
+    # -------------------- cache --------------------
+    def _cached(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for k in keys:
+                v = self._lru.get(k)
+                if v is not None:
+                    self._lru.move_to_end(k)
+                    found[k] = v
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        CACHE_LOOKUPS.labels("hit").inc(len(found))
+        CACHE_LOOKUPS.labels("miss").inc(len(keys) - len(found))
+        return found
+
+    def _remember(self, vecs: Dict[str, np.ndarray]):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            for k, v in vecs.items():
+                self._lru[k] = v
+                self._lru.move_to_end(k)
+            while len(self._lru) > self.cache_size:
+                self._lru.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    # -------------------- model --------------------
+    def _encode_now(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        t0 = time.perf_counter()
+        vecs = np.asarray(self.model.encode(texts, batch_size=len(texts)), dtype="float32")
+        MODEL_SECONDS.observe(time.perf_counter() - t0)
+        BATCH_SIZE.observe(len(texts))
+        with self._lock:
+            self.batches += 1
+            self.encoded += len(texts)
+        out = {}
+        for t, v in zip(texts, vecs):
+            v.flags.writeable = False  # shared between callers and the cache
+            out[t] = v
+        return out
+
+    def _next_batch(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            # a lone query after a lone query: traffic is light, do not make it wait
+            if remaining <= 0 or (len(batch) == 1 and self._last_batch == 1):
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            self._last_batch = len(batch)
+            started = time.perf_counter()
+            for r in batch:
+                QUEUE_SECONDS.observe(started - r.queued)
+            try:
+                vecs = self._encode_now(list(dict.fromkeys(r.key for r in batch)))
+            except BaseException as e:
+                for r in batch:
+                    r.future.set_exception(e)
+                continue
+            self._remember(vecs)
+            for r in batch:
+                r.future.set_result(vecs[r.key])
+
+    def _submit(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if self._worker is None:
+            with self._load_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="rag-embed-batcher",
+                                                    daemon=True)
+                    self._worker.start()
+        pending = [_Request(k) for k in keys]
+        for r in pending:
+            self._queue.put(r)
+        return {r.key: r.future.result() for r in pending}
+
+    # -------------------- API --------------------
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), d) float32 query vectors."""
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        keys = [normalize_query(t, self.casefold) for t in texts]
+        found = self._cached(keys) if self.cache_size > 0 else {}
+        missing = [k for k in dict.fromkeys(keys) if k not in found]
+        if missing:
+            if self.batching:
+                found.update(self._submit(missing))
+            else:
+                vecs = self._encode_now(missing)
+                self._remember(vecs)
+                found.update(vecs)
+        return np.vstack([found[k] for k in keys])
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": BACKEND,
+                "threads": THREADS,
+                "window_ms": self.window * 1000,
+                "max_batch": self.max_batch,
+                "entries": len(self._lru),
+                "size": self.cache_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "batches": self.batches,
+                "encoded": self.encoded,
+                "mean_batch": self.encoded / self.batches if self.batches else 0.0,
+                "queued": self._queue.qsize(),
+            }
@@ -1,15 +1,21 @@
 import requests
 import json
+import time
+
+from src.observability import metrics, tracing
 
 OLLAMA_URL = "http://localhost:11434/api/chat"
 MODEL = "gemma2:9b"   # use exactly what `ollama list` shows
 
+GENERATE_SECONDS = metrics.histogram("rag_generate_seconds", "Ollama chat call time", ["outcome"])
+
 SYSTEM_PROMPT = (
     "You are a crypto market analyst. "
     "Answer strictly using the provided context. "
     "If the context is insufficient, say so clearly."
 )
 
+@tracing.traced("generate_answer")
 def generate_answer(context_docs, question):
     # Safety check
     if not context_docs:
@@ -30,15 +36,19 @@ def generate_answer(context_docs, question):
         "stream": False
     }
 
+    t0 = time.perf_counter()
     try:
-        response = requests.post(
-            OLLAMA_URL,
-            json=payload,
-            timeout=120   # IMPORTANT for Streamlit
-        )
+        with tracing.span("ollama.chat", model=MODEL):
+            response = requests.post(
+                OLLAMA_URL,
+                json=payload,
+                timeout=120   # IMPORTANT for Streamlit
+            )
         response.raise_for_status()
 
-        data = response.json()
+        with tracing.span("parse"):
+            data = response.json()
+        GENERATE_SECONDS.labels("ok").observe(time.perf_counter() - t0)
 
         # 👇 THIS IS THE KEY FIX
         if "message" in data and "content" in data["message"]:
@@ -48,4 +58,5 @@ def generate_answer(context_docs, question):
         return str(data)
 
     except requests.exceptions.RequestException as e:
+        GENERATE_SECONDS.labels("error").observe(time.perf_counter() - t0)
         return f"⚠️ Ollama request failed: {e}"
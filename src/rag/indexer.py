@@ -0,0 +1,401 @@
+"""
+Incremental RAG indexer: keeps the retriever's FAISS index in step with
+live `reddit_posts` and `aggregates`.
+
+Each cycle it
+  - embeds posts newer than the post high-water mark (minus a short
+    lookback for late inserts; ids already indexed are skipped),
+  - builds one market summary per symbol and SUMMARY_MINUTES window from
+    `aggregates`, re-embedding the newest (still filling) window each time,
+  - removes posts older than POST_TTL_HOURS and summaries older than
+    SUMMARY_TTL_HOURS,
+  - publishes a new snapshot (src.rag.snapshots) if anything changed.
+The retriever notices the new CURRENT and swaps it in without a restart.
+
+Vectors live in a FAISS index of kind RAG_INDEX_TYPE (src.rag.ann; L2
+like the shipped index.faiss), keyed by snapshots.doc_id("post:<id>") /
+doc_id("agg:<symbol>:<window>"), so adds and removals are by id. Text and
+metadata live in the SQLite doc store (src.rag.docstore). On the first
+run the shipped index.faiss / meta.pkl documents are carried over as
+never-expiring seed documents.
+
+Run:
+python -m src.rag.indexer            # loop
+python -m src.rag.indexer --once     # one cycle, prints embed / publish timings
+RAG_INDEX_TYPE=ivf_flat python -m src.rag.indexer --rebuild   # change index kind
+
+Env:
+RAG_INDEX_CYCLE_SECONDS=60
+RAG_EMBED_BATCH=64
+RAG_POST_TTL_HOURS=72
+RAG_SUMMARY_MINUTES=15
+RAG_SUMMARY_TTL_HOURS=168
+(+ RAG_INDEX_DIR / RAG_EMBED_MODEL, see src.rag.snapshots;
+ RAG_EMBED_BACKEND / RAG_EMBED_THREADS, see src.rag.embedding)
+"""
+
+import argparse
+import os
+import time
+import traceback
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from src.observability import metrics, tracing
+from src.processing import aggregator as agg
+from src.rag import ann, embedding, snapshots
+from src.rag.docstore import DocStore
+from src.storage import db as dbmod
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+CYCLE_SECONDS = float(os.getenv("RAG_INDEX_CYCLE_SECONDS", "60"))
+EMBED_BATCH = int(os.getenv("RAG_EMBED_BATCH", "64"))
+POST_TTL_HOURS = float(os.getenv("RAG_POST_TTL_HOURS", "72"))
+SUMMARY_MINUTES = int(os.getenv("RAG_SUMMARY_MINUTES", "15"))
+SUMMARY_TTL_HOURS = float(os.getenv("RAG_SUMMARY_TTL_HOURS", "168"))
+POST_LOOKBACK_MINUTES = 10  # re-read window for posts inserted late
+POST_MAX_CHARS = 1000       # the embedder truncates long inputs anyway
+TOMBSTONE_FRACTION = 0.2    # hnsw: rebuild once this share of vectors is deleted
+
+STATE_POST_TS = "post_created_utc"
+STATE_AGG_TS = "agg_window"
+
+DOCS = metrics.gauge("rag_index_docs", "Documents in the indexer's FAISS index")
+DOCS_ADDED = metrics.counter("rag_index_docs_added_total", "Documents embedded and added", ["source"])
+DOCS_REMOVED = metrics.counter("rag_index_docs_removed_total", "Documents expired or replaced", ["source"])
+EMBED_SECONDS = metrics.histogram("rag_index_embed_seconds", "Embedding time per indexer batch")
+PUBLISH_SECONDS = metrics.histogram("rag_index_publish_seconds", "Snapshot write + swap time")
+
+
+def _utc(dt: datetime) -> datetime:
+    """Naive timestamps from SQLite are UTC."""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def _param(conn, dt: datetime) -> datetime:
+    """SQLite stores naive UTC; compare with naive datetimes there."""
+    return dt.replace(tzinfo=None) if conn.engine.dialect.name == "sqlite" else dt
+
+
+def _window_start(ts: datetime) -> datetime:
+    return ts.replace(minute=ts.minute - ts.minute % SUMMARY_MINUTES, second=0, microsecond=0)
+
+
+def _base(product: str) -> str:
+    return product.split("-")[0]
+
+
+# ---------------------------------------------------
+# Documents
+# ---------------------------------------------------
+def post_doc(r) -> Optional[Tuple[int, dict]]:
+    text = (r["text"] or "").strip()
+    if not text:
+        return None
+    created = _utc(r["created_utc"])
+    syms = sorted(_base(s) for s in agg._matcher.match(text))
+    sentiment = r["sentiment"]
+    mood = f", sentiment {sentiment:+.2f}" if sentiment is not None else ""
+    return snapshots.doc_id(f"post:{r['id']}"), {
+        "id": r["id"],
+        "text": f"r/{r['subreddit']} post ({created:%Y-%m-%d %H:%M} UTC{mood}): {text[:POST_MAX_CHARS]}",
+        "metadata": {
+            "source": "reddit", "subreddit": r["subreddit"], "ts": created.timestamp(),
+            "symbol": syms[0] if len(syms) == 1 else None, "symbols": syms,
+            "sentiment": sentiment,
+        },
+    }
+
+
+def summary_doc(symbol: str, start: datetime, bars: List[dict]) -> Tuple[int, dict]:
+    bars = sorted(bars, key=lambda b: b["ts"])
+    start = _utc(start)
+    end = start + timedelta(minutes=SUMMARY_MINUTES)
+    opens = [b["open_price"] for b in bars if b["open_price"] is not None]
+    closes = [b["close_price"] for b in bars if b["close_price"] is not None]
+    highs = [b["high_price"] for b in bars if b["high_price"] is not None]
+    lows = [b["low_price"] for b in bars if b["low_price"] is not None]
+    volume = sum(b["volume"] or 0.0 for b in bars)
+    posts = sum(b["post_count"] or 0 for b in bars)
+
+    parts = [f"{symbol} market summary {start:%Y-%m-%d %H:%M}-{end:%H:%M} UTC:"]
+    if opens and closes:
+        change = (closes[-1] - opens[0]) / opens[0] * 100 if opens[0] else 0.0
+        parts.append(f"open {opens[0]:.2f}, close {closes[-1]:.2f} ({change:+.2f}%),"
+                     f" high {max(highs):.2f}, low {min(lows):.2f}, volume {volume:.4f}.")
+    if posts:
+        sentiment = sum((b["avg_sentiment"] or 0.0) * (b["post_count"] or 0) for b in bars) / posts
+        mood = "bullish" if sentiment > 0.05 else "bearish" if sentiment < -0.05 else "neutral"
+        parts.append(f"Reddit sentiment {mood} ({sentiment:+.2f} over {posts} posts).")
+    else:
+        parts.append("No Reddit posts in this window.")
+
+    key = f"agg:{symbol}:{start.isoformat()}"
+    return snapshots.doc_id(key), {
+        "id": key,
+        "text": " ".join(parts),
+        "metadata": {
+            "source": "market", "symbol": _base(symbol), "product": symbol,
+            "ts": start.timestamp(), "window_minutes": SUMMARY_MINUTES, "bars": len(bars),
+        },
+    }
+
+
+# ---------------------------------------------------
+# Indexer
+# ---------------------------------------------------
+class Indexer:
+    def __init__(self, embedder=None, index_dir: str = snapshots.INDEX_DIR, read_engine=None,
+                 kind: str = ann.INDEX_TYPE):
+        self._embedder = embedder
+        self.index_dir = index_dir
+        self.read_engine = read_engine or dbmod.read_engine
+        self.kind = kind
+        agg.ensure_schema()  # summaries read the 1-minute bars
+        snap = snapshots.load_current(index_dir, mmap=False)
+        if snap:
+            self.index, published, manifest = snap
+            self.store = self._reset_work_store(published)
+            self.state = manifest.get("state", {})
+            self.version = manifest["version"]
+            print(f"[indexer] resumed snapshot {self.version} ({len(self.store)} docs, "
+                  f"{ann.kind_of(self.index)})")
+        else:
+            self.store = self._reset_work_store()
+            self.index = self._seed()
+            self.state = {}
+            self.version = None
+            print(f"[indexer] seeded {len(self.store)} docs from the shipped index")
+        self._ensure_kind()
+        DOCS.set_function(lambda: self.index.ntotal)
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = embedding.load_model()
+        return self._embedder
+
+    def _reset_work_store(self, source: Optional[DocStore] = None) -> DocStore:
+        """The working store restarts from the published one so it matches the index."""
+        path = os.path.join(self.index_dir, "work", "docs.sqlite")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if source is not None:
+            source.backup_to(path)
+        return snapshots.work_store(self.index_dir)
+
+    def _seed(self):
+        static, rows = snapshots.load_static()
+        index = ann.new_index("flat", static.d)
+        if static.ntotal:
+            ids = np.array([snapshots.doc_id(f"seed:{d['id']}") for d in rows], dtype="int64")
+            index.add_with_ids(static.reconstruct_n(0, static.ntotal), ids)
+            self.store.put_many({
+                int(i): {**d, "metadata": {**d.get("metadata", {}), "source": "seed"}}
+                for i, d in zip(ids, rows)
+            })
+        return index
+
+    def _ensure_kind(self):
+        """Move a flat index to the configured kind once it can be trained."""
+        current = ann.kind_of(self.index)
+        if current == self.kind:
+            return
+        if current != "flat":
+            print(f"[indexer] index is {current}, RAG_INDEX_TYPE={self.kind}: "
+                  f"run `python -m src.rag.indexer --rebuild` to convert")
+            return
+        n = self.index.ntotal
+        if n < ann.min_train(self.kind, n):
+            return  # stay exact until there is enough training data
+        t0 = time.perf_counter()
+        ids, vecs = ann.vectors_of(self.index)
+        self.index = ann.build(self.kind, vecs, ids)
+        print(f"[indexer] converted {n} vectors flat -> {self.kind} "
+              f"in {time.perf_counter() - t0:.1f} s")
+
+    # -------------------- reads --------------------
+    def _new_posts(self, conn, now: datetime) -> Tuple[Dict[int, dict], Optional[datetime]]:
+        since = now - timedelta(hours=POST_TTL_HOURS)
+        hwm = self.state.get(STATE_POST_TS)
+        if hwm:
+            since = max(since, _utc(datetime.fromisoformat(hwm)) - timedelta(minutes=POST_LOOKBACK_MINUTES))
+        p = dbmod.reddit_posts.c
+        rows = conn.execute(
+            select(p.id, p.subreddit, p.text, p.sentiment, p.created_utc)
+            .where(p.created_utc >= _param(conn, since))
+            .order_by(p.created_utc)
+        ).mappings().all()
+        out, newest = {}, None
+        for r in rows:
+            newest = r["created_utc"]
+            doc = post_doc(r)
+            if doc:
+                out[doc[0]] = doc[1]
+        for i in self.store.present(out):
+            del out[i]
+        return out, _utc(newest) if newest else None
+
+    def _summaries(self, conn, now: datetime) -> Tuple[Dict[int, dict], Optional[datetime]]:
+        since = _window_start(now - timedelta(hours=SUMMARY_TTL_HOURS))
+        hwm = self.state.get(STATE_AGG_TS)
+        if hwm:
+            since = max(since, _utc(datetime.fromisoformat(hwm)))
+        a = agg.aggregates.c
+        rows = conn.execute(
+            select(a.ts, a.symbol, a.open_price, a.close_price, a.high_price, a.low_price,
+                   a.volume, a.avg_sentiment, a.post_count)
+            .where(a.ts >= _param(conn, since))
+        ).mappings().all()
+        windows = defaultdict(list)
+        for r in rows:
+            windows[(r["symbol"], _window_start(_utc(r["ts"])))].append(r)
+        out = {}
+        for (sym, start), bars in windows.items():
+            i, doc = summary_doc(sym, start, bars)
+            out[i] = doc
+        return out, max((s for _, s in windows), default=None)
+
+    # -------------------- writes --------------------
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        out = []
+        for i in range(0, len(texts), EMBED_BATCH):
+            t0 = time.perf_counter()
+            with tracing.span("embed.batch", n=len(texts[i:i + EMBED_BATCH])):
+                out.append(np.asarray(self.embedder.encode(texts[i:i + EMBED_BATCH]), dtype="float32"))
+            EMBED_SECONDS.observe(time.perf_counter() - t0)
+        return np.vstack(out)
+
+    def _remove(self, ids: List[int]):
+        if not ids:
+            return
+        if ann.kind_of(self.index) == "hnsw":
+            # HNSW cannot delete: the vector stays until the next compaction
+            self.state["tombstones"] = self.state.get("tombstones", 0) + len(ids)
+        else:
+            self.index.remove_ids(np.array(ids, dtype="int64"))
+        for source, n in self.store.delete_many(ids).items():
+            DOCS_REMOVED.labels(source).inc(n)
+
+    def _compact(self):
+        """Rebuild an HNSW index without its tombstoned vectors."""
+        ids, vecs = ann.vectors_of(self.index)
+        live = self.store.present(ids)
+        keep = np.fromiter((i in live for i in ids), dtype=bool, count=len(ids))
+        # a replaced document has its id twice; the newest vector is the last one added
+        _, last = np.unique(ids[::-1], return_index=True)
+        newest = np.zeros(len(ids), dtype=bool)
+        newest[len(ids) - 1 - last] = True
+        keep &= newest
+        self.index = ann.build("hnsw", vecs[keep], ids[keep])
+        print(f"[indexer] compacted hnsw: dropped {int((~keep).sum())} tombstones")
+        self.state["tombstones"] = 0
+
+    def _expired(self, now: datetime) -> List[int]:
+        now_s = now.timestamp()
+        return self.store.expired({"reddit": now_s - POST_TTL_HOURS * 3600,
+                                   "market": now_s - SUMMARY_TTL_HOURS * 3600})
+
+    def _publish(self, stats: dict):
+        t0 = time.perf_counter()
+        with tracing.span("publish", docs=self.index.ntotal):
+            self.version = snapshots.publish(self.index, self.store, self.state, self.index_dir)
+        publish_s = time.perf_counter() - t0
+        PUBLISH_SECONDS.observe(publish_s)
+        stats.update(version=self.version, publish_ms=round(publish_s * 1000, 1))
+
+    def step(self, now: Optional[datetime] = None) -> dict:
+        now = now or datetime.now(timezone.utc)
+        with self.read_engine.connect() as conn:
+            with tracing.span("posts"):
+                posts, post_hwm = self._new_posts(conn, now)
+            with tracing.span("summaries"):
+                summaries, agg_hwm = self._summaries(conn, now)
+
+        # summaries of windows already indexed are replaced (the newest one is still filling)
+        indexed = self.store.texts(summaries)
+        replaced = [i for i, t in indexed.items() if t != summaries[i]["text"]]
+        summaries = {i: d for i, d in summaries.items() if i not in indexed or i in replaced}
+        expired = [i for i in self._expired(now) if i not in summaries]
+        with tracing.span("remove", n=len(replaced) + len(expired)):
+            self._remove(replaced + expired)
+
+        new = {**posts, **summaries}
+        stats = {"added": len(new), "posts": len(posts), "summaries": len(summaries),
+                 "replaced": len(replaced), "expired": len(expired)}
+        if new:
+            t0 = time.perf_counter()
+            vecs = self._embed([d["text"] for d in new.values()])
+            embed_s = time.perf_counter() - t0
+            self.index.add_with_ids(vecs, np.fromiter(new.keys(), dtype="int64", count=len(new)))
+            self.store.put_many(new)
+            for d in new.values():
+                DOCS_ADDED.labels(d["metadata"]["source"]).inc()
+            stats.update(embed_s=round(embed_s, 3), docs_per_s=round(len(new) / embed_s, 1) if embed_s else None)
+            self._ensure_kind()
+        if self.state.get("tombstones", 0) > TOMBSTONE_FRACTION * max(self.index.ntotal, 1):
+            self._compact()
+
+        if post_hwm:
+            self.state[STATE_POST_TS] = post_hwm.isoformat()
+        if agg_hwm:
+            self.state[STATE_AGG_TS] = agg_hwm.isoformat()
+
+        if new or replaced or expired or self.version is None:
+            self._publish(stats)
+        stats.update(docs=len(self.store), vectors=self.index.ntotal, kind=ann.kind_of(self.index))
+        return stats
+
+    def rebuild(self) -> dict:
+        """Re-embed every stored document into a fresh index of the configured
+        kind (needed to change kind away from ivf_pq / hnsw, whose stored
+        vectors are lossy or cannot shrink)."""
+        t0 = time.perf_counter()
+        ids, vecs = [], []
+        for rows in self.store.scan_text(batch=EMBED_BATCH * 16):
+            ids += [i for i, _ in rows]
+            vecs.append(self._embed([t for _, t in rows]))
+        embed_s = time.perf_counter() - t0
+        ids = np.array(ids, dtype="int64")
+        vecs = np.vstack(vecs) if vecs else np.zeros((0, self.index.d), "float32")
+        kind = self.kind if len(ids) >= ann.min_train(self.kind, len(ids)) else "flat"
+        self.index = ann.build(kind, vecs, ids)
+        self.state["tombstones"] = 0
+        stats = {"rebuilt": len(ids), "kind": kind, "embed_s": round(embed_s, 3)}
+        self._publish(stats)
+        return stats
+
+
+def run_loop(cycle_seconds: float = CYCLE_SECONDS, once: bool = False, rebuild: bool = False):
+    metrics.serve_from_env()
+    print("RAG indexer running...")
+    ix = Indexer()
+    if rebuild:
+        print(f"[indexer] {ix.rebuild()}")
+    while True:
+        try:
+            with tracing.span("indexer.cycle") as sp:
+                stats = ix.step()
+                sp.set(**{k: v for k, v in stats.items() if k in ("added", "docs")})
+            print(f"[indexer] {stats}")
+        except Exception:
+            traceback.print_exc()
+        if once:
+            return
+        time.sleep(cycle_seconds)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--once", action="store_true")
+    ap.add_argument("--rebuild", action="store_true", help="re-embed everything into RAG_INDEX_TYPE first")
+    args = ap.parse_args()
+    run_loop(once=args.once, rebuild=args.rebuild)
@@ -1,45 +1,304 @@
 import os
+import threading
+import time
+import traceback
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
 import faiss
-import pickle
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from src.observability import metrics, readiness, tracing
+from src.rag import ann, embedding, snapshots
 
 # ---------------------------------------------------
-# Paths
+# Config
 # ---------------------------------------------------
-BASE_DIR = os.path.dirname(__file__)
-INDEX_PATH = os.path.join(BASE_DIR, "index.faiss")
-META_PATH = os.path.join(BASE_DIR, "meta.pkl")
+# how often the watcher checks INDEX_DIR/CURRENT for a newer snapshot
+RELOAD_SECONDS = float(os.getenv("RAG_RELOAD_SECONDS", "5"))
+# default recency window for retrieve_context (0 = off: plain nearest-neighbour
+# ranking unless the caller passes recency_hours); undated docs always qualify
+RECENCY_HOURS = float(os.getenv("RAG_RECENCY_HOURS", "0"))
+OVERFETCH = 4  # first over-fetch factor for filters no partition covers
+
+EMBED_SECONDS = metrics.histogram("rag_embed_seconds", "Query embedding time (cache, queue and model)")
+SEARCH_SECONDS = metrics.histogram("rag_search_seconds", "FAISS search time")
+RETRIEVE_SECONDS = metrics.histogram("rag_retrieve_seconds", "retrieve_context total time")
+RELOADS = metrics.counter("rag_index_reloads_total", "Index snapshots swapped in", ["outcome"])
+RETRIEVE_PATH = metrics.counter("rag_retrieve_path_total", "How retrieve_context filled k",
+                                ["path"])
+
+
+def normalize_symbol(symbol: Optional[str]) -> Optional[str]:
+    """"BTC-USD" / "btc" -> "BTC" (documents are tagged with the base asset)."""
+    return symbol.split("-")[0].upper() if symbol else None
+
+
+def _isin_sorted(values: np.ndarray, sorted_ids: np.ndarray) -> np.ndarray:
+    if not len(sorted_ids):
+        return np.zeros(len(values), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_ids, values), len(sorted_ids) - 1)
+    return sorted_ids[pos] == values
+
+
+class Partition:
+    """One symbol's documents ordered by timestamp (undated documents last),
+    so a recency window is a contiguous tail slice and a filtered search
+    only touches that symbol's documents in the window: an exact scan of
+    the slice on flat snapshots (rows gathered per query from the
+    snapshot's shared vector view; the partition keeps row numbers only),
+    an ID-selector search over the probed lists on IVF, and an over-fetch
+    keeping the slice's ids on HNSW."""
+
+    __slots__ = ("ids", "ts", "rows")
+
+    def __init__(self, ids: np.ndarray, ts: np.ndarray, rows: Optional[np.ndarray] = None):
+        order = np.argsort(ts, kind="stable")
+        self.ids = ids[order]
+        self.ts = ts[order]
+        self.rows = rows[order] if rows is not None else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, snap: "Snapshot", query_vec: np.ndarray, k: int,
+               since: Optional[float] = None) -> List[Tuple[float, int]]:
+        lo = int(np.searchsorted(self.ts, since, side="left")) if since is not None else 0
+        n = len(self.ids) - lo
+        if n <= 0 or k <= 0:
+            return []
+        window = self.ids[lo:]
+        if self.rows is not None:
+            D, I = faiss.knn(query_vec, snap.vectors[self.rows[lo:]], min(k, n))
+            return [(float(d), int(window[i])) for d, i in zip(D[0], I[0]) if i >= 0]
+        if ann.supports_selector(snap.index):
+            D, I = ann.search_subset(snap.index, query_vec, min(k, n), window)
+            return [(float(d), int(i)) for d, i in zip(D[0], I[0]) if i >= 0]
+        allowed = np.sort(window)
+        return snap.search(query_vec, min(k, n), keep=lambda labels: _isin_sorted(labels, allowed))
+
+
+class Snapshot:
+    """One immutable index + its doc store. Per-symbol partitions and the
+    (id, ts) columns used by filters are built once here, off the request
+    path; document text is read from the store only for the hits."""
+
+    __slots__ = ("index", "store", "version", "partitions", "vectors", "_ids", "_ts", "_general")
+
+    def __init__(self, index, store, version=None):
+        self.index = index
+        self.store = store
+        self.version = version
+        ann.set_search_params(index, nprobe=ann.NPROBE, ef_search=ann.EF_SEARCH)
+        self._build()
+
+    def _build(self):
+        rows = list(self.store.scan())
+        ids = np.fromiter((r[0] for r in rows), dtype="int64", count=len(rows))
+        ts = np.fromiter((np.inf if r[2] is None else r[2] for r in rows), dtype="float64", count=len(rows))
+        by_symbol = defaultdict(list)
+        general = []
+        for row, (i, symbols, _) in enumerate(rows):
+            syms = {normalize_symbol(x) for x in (symbols or "").split()}
+            for sym in syms:
+                by_symbol[sym].append(row)
+            if not syms:
+                general.append(i)
+
+        order = np.argsort(ids)
+        self._ids, self._ts = ids[order], ts[order]
+        self._general = np.sort(np.array(general, dtype="int64"))
+
+        self.vectors, rows = None, None
+        if ann.kind_of(self.index) == "flat":
+            # flat: exact scans over a view of the index's vectors (no copy,
+            # shared by every partition), addressed by row number
+            vec_ids, self.vectors = ann.flat_vectors(self.index)
+            if len(vec_ids):
+                vorder = np.argsort(vec_ids)
+                rows = vorder[np.minimum(np.searchsorted(vec_ids[vorder], ids), len(vec_ids) - 1)]
+                found = vec_ids[rows] == ids
+                if not found.all():
+                    # a document without a vector would be scored with another
+                    # document's row; leave it out of the partitions
+                    print(f"[RAG] {int((~found).sum())} documents have no vector in the index; "
+                          f"not searchable by symbol")
+                    by_symbol = {sym: [i for i in r if found[i]] for sym, r in by_symbol.items()}
+        self.partitions: Dict[str, Partition] = {
+            sym: Partition(ids[r], ts[r], rows[r] if rows is not None else None)
+            for sym, r in by_symbol.items() if r
+        }
+
+    def doc(self, i):
+        return self.store.get(i)
+
+    def docs(self, ids: List[int]) -> List[dict]:
+        found = self.store.get_many(ids)
+        return [found[i] for i in ids if i in found]
+
+    def ts_of(self, labels: np.ndarray) -> np.ndarray:
+        pos = np.minimum(np.searchsorted(self._ids, labels), max(len(self._ids) - 1, 0))
+        return self._ts[pos] if len(self._ids) else np.full(len(labels), np.inf)
+
+    def is_general(self, labels: np.ndarray) -> np.ndarray:
+        return _isin_sorted(labels, self._general)
+
+    def search(self, query_vec: np.ndarray, k: int,
+               keep: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+               exclude=frozenset()) -> List[Tuple[float, int]]:
+        """Top-k over the whole index, keeping labels for which `keep`
+        (vectorized over the label array) is true. Over-fetches OVERFETCH*k
+        and grows 4x until k pass or the index is exhausted. Vectors whose
+        document is gone (HNSW tombstones) are skipped."""
+        n = self.index.ntotal
+        fetch = min(n, k if keep is None and not exclude else k * OVERFETCH)
+        while fetch > 0:
+            D, I = self.index.search(query_vec, fetch)
+            labels = I[0]
+            mask = (labels >= 0) & _isin_sorted(labels, self._ids)
+            if keep is not None:
+                mask &= keep(labels)
+            hits, seen = [], set(exclude)
+            for d, i in zip(D[0][mask], labels[mask]):
+                if int(i) not in seen:
+                    seen.add(int(i))
+                    hits.append((float(d), int(i)))
+            if len(hits) >= k or fetch >= n:
+                return hits[:k]
+            fetch = min(n, fetch * 4)
+        return []
+
+
+def load_snapshot() -> Snapshot:
+    snap = snapshots.load_current()
+    if snap:
+        index, store, manifest = snap
+        return Snapshot(index, store, manifest["version"])
+    return Snapshot(*snapshots.load_static_store())
+
+
+def reload() -> bool:
+    """Swap in the current snapshot if it changed. Requests in flight keep
+    the Snapshot they started with; the swap is one reference assignment."""
+    global current
+    version = snapshots.current_version()
+    if version is None or version == snapshot().version:
+        return False
+    t0 = time.perf_counter()
+    try:
+        index, store, _ = snapshots.load(version)
+    except FileNotFoundError:
+        # pruned between reading CURRENT and loading it; the next check sees the newer one
+        RELOADS.labels("missing").inc()
+        return False
+    current = Snapshot(index, store, version)
+    RELOADS.labels("ok").inc()
+    print(f"[RAG] Swapped in snapshot {version} ({index.ntotal} documents, "
+          f"{(time.perf_counter() - t0) * 1000:.0f} ms)")
+    return True
+
+
+def _watch():
+    while True:
+        time.sleep(RELOAD_SECONDS)
+        try:
+            reload()
+        except Exception:
+            RELOADS.labels("error").inc()
+            traceback.print_exc()
+
 
 # ---------------------------------------------------
-# Load FAISS + metadata once (on import)
+# Embedder + newest snapshot, loaded once on first use (or by the startup
+# warm-up, see src.observability.readiness), not on import
 # ---------------------------------------------------
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-index = faiss.read_index(INDEX_PATH)
+embedder = embedding.EmbeddingService()
+current: Optional[Snapshot] = None
+
 
-with open(META_PATH, "rb") as f:
-    metadata = pickle.load(f)
+def _load_current() -> Snapshot:
+    global current
+    current = load_snapshot()
+    print(f"[RAG] Retriever loaded {current.index.ntotal} documents (snapshot {current.version or 'static'})")
+    if RELOAD_SECONDS > 0:
+        threading.Thread(target=_watch, name="rag-index-watch", daemon=True).start()
+    return current
 
-print(f"[RAG] Retriever loaded {len(metadata)} documents")
+
+EMBEDDER = readiness.component("rag.embedder", lambda: embedder.load())
+INDEX = readiness.component("rag.index", _load_current)
+
+
+def snapshot() -> Snapshot:
+    """The live snapshot (loaded on the first call)."""
+    INDEX.get()
+    return current
+
+
+metrics.gauge("rag_index_loaded_docs", "Documents in the retriever's live index").set_function(
+    lambda: current.index.ntotal if current is not None else 0)
 
 # ---------------------------------------------------
 # REQUIRED FUNCTION
 # ---------------------------------------------------
-def retrieve_context(query: str, symbol: str | None = None, k: int = 5):
+def search_snapshot(snap: Snapshot, query_vec: np.ndarray, k: int = 5, symbol: str | None = None,
+                    since: float | None = None) -> List[dict]:
     """
-    Retrieve relevant documents from FAISS.
-    Optionally filter by crypto symbol (BTC / ETH).
-    """
-    query_vec = embedder.encode([query]).astype("float32")
-    _, indices = index.search(query_vec, k)
+    Up to k documents nearest to query_vec, best first.
 
-    results = []
-    for idx in indices[0]:
-        doc = metadata[idx]
+    With a symbol: the symbol's documents from the recency window (`since`,
+    epoch seconds; undated documents always qualify), then its older
+    documents, then general documents tagged with no symbol, until k are
+    found. Other symbols' documents are never returned.
+    """
+    hits: List[Tuple[float, int]] = []
+    path = "global"
+    sym = normalize_symbol(symbol)
+    if sym:
+        part = snap.partitions.get(sym)
+        if part is not None:
+            path = "partition"
+            hits = part.search(snap, query_vec, k, since)
+            if len(hits) < k and since is not None:
+                seen = {i for _, i in hits}
+                older = part.search(snap, query_vec, k + len(hits))
+                hits += [h for h in older if h[1] not in seen][:k - len(hits)]
+        if len(hits) < k:
+            path += "+general"
+            hits += snap.search(query_vec, k - len(hits), keep=snap.is_general,
+                                exclude={i for _, i in hits})
+    elif since is not None:
+        path = "recent"
+        hits = snap.search(query_vec, k, keep=lambda labels: snap.ts_of(labels) >= since)
+        if len(hits) < k:
+            hits += snap.search(query_vec, k - len(hits), exclude={i for _, i in hits})
+    else:
+        hits = snap.search(query_vec, k)
+    RETRIEVE_PATH.labels(path).inc()
+    return snap.docs([i for _, i in hits])
 
-        if symbol and doc.get("metadata", {}).get("symbol") != symbol:
-            continue
 
-        results.append(doc["text"])
+@tracing.traced("retrieve_context")
+def retrieve_context(query: str, symbol: str | None = None, k: int = 5,
+                     recency_hours: float | None = None):
+    """
+    Retrieve relevant documents from FAISS.
+    Optionally restricted to a crypto symbol ("BTC", "ETH-USD", ...);
+    documents from the last `recency_hours` (default RECENCY_HOURS) rank
+    first. Returns up to k document texts.
+    """
+    snap = snapshot()
+    EMBEDDER.get()
+    hours = RECENCY_HOURS if recency_hours is None else recency_hours
+    since = time.time() - hours * 3600 if hours > 0 else None
+    t0 = time.perf_counter()
+    with tracing.span("embed"):
+        query_vec = embedder.encode([query])
+    t1 = time.perf_counter()
+    with tracing.span("faiss.search", k=k, symbol=symbol):
+        docs = search_snapshot(snap, query_vec, k, symbol, since)
+    EMBED_SECONDS.observe(t1 - t0)
+    SEARCH_SECONDS.observe(time.perf_counter() - t1)
 
-    return results
+    RETRIEVE_SECONDS.observe(time.perf_counter() - t0)
+    return [d["text"] for d in docs]
@@ -0,0 +1,167 @@
+"""
+On-disk RAG index snapshots shared by the indexer (writer) and the
+retriever (reader).
+
+Layout under INDEX_DIR:
+
+    snapshots/<version>/index.faiss   FAISS index (any src.rag.ann kind)
+    snapshots/<version>/docs.sqlite   document side store (src.rag.docstore)
+    snapshots/<version>/manifest.json version, kind, counts, indexer state
+    CURRENT                           name of the live snapshot
+    work/docs.sqlite                  the indexer's writable store
+
+Snapshots written before the side store have meta.pkl instead of
+docs.sqlite; load() reads those into an in-memory store.
+
+`publish()` writes a snapshot into a temp directory, renames it into
+place and then swaps CURRENT with os.replace, so a reader sees either the
+old snapshot or the complete new one, never a partial write. Only the
+newest KEEP snapshots are kept on disk; a reader that still has a pruned
+snapshot open keeps reading the unlinked files.
+
+Readers open index.faiss with IO_FLAG_MMAP (IVF inverted lists are then
+paged in on demand rather than copied into the heap) and docs.sqlite
+read-only with mmap.
+
+Env:
+RAG_INDEX_DIR      snapshot directory (default src/rag/index)
+RAG_EMBED_MODEL    sentence-transformers model used by indexer and retriever
+RAG_SNAPSHOTS_KEEP snapshots kept on disk (default 3)
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from typing import Optional, Tuple
+
+import faiss
+
+from src.rag import ann
+from src.rag.docstore import DocStore
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+BASE_DIR = os.path.dirname(__file__)
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", os.path.join(BASE_DIR, "index"))
+EMBED_MODEL = os.getenv("RAG_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+KEEP = int(os.getenv("RAG_SNAPSHOTS_KEEP", "3"))
+
+# the static index shipped with the repo, used until a snapshot exists
+STATIC_INDEX_PATH = os.path.join(BASE_DIR, "index.faiss")
+STATIC_META_PATH = os.path.join(BASE_DIR, "meta.pkl")
+
+
+def doc_id(key: str) -> int:
+    """Stable 63-bit FAISS id for a document key such as "post:t3_abc"."""
+    return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], "big") & (2**63 - 1)
+
+
+def _snap_root(index_dir: str) -> str:
+    return os.path.join(index_dir, "snapshots")
+
+
+def current_version(index_dir: str = INDEX_DIR) -> Optional[str]:
+    try:
+        with open(os.path.join(index_dir, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_path(version: str, index_dir: str = INDEX_DIR) -> str:
+    return os.path.join(_snap_root(index_dir), version)
+
+
+def read_index(path: str, mmap: bool = True):
+    if mmap:
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP)
+        except RuntimeError:
+            pass  # index types without mmap support
+    return faiss.read_index(path)
+
+
+def load(version: str, index_dir: str = INDEX_DIR, mmap: bool = True) -> Tuple[object, DocStore, dict]:
+    """(faiss index, doc store, manifest) of one snapshot. mmap=False for an
+    index that will be modified."""
+    path = snapshot_path(version, index_dir)
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    index = read_index(os.path.join(path, "index.faiss"), mmap)
+    if os.path.exists(os.path.join(path, "docs.sqlite")):
+        store = DocStore(os.path.join(path, "docs.sqlite"))
+    else:
+        with open(os.path.join(path, "meta.pkl"), "rb") as f:
+            store = DocStore.in_memory(pickle.load(f))
+    return index, store, manifest
+
+
+def load_current(index_dir: str = INDEX_DIR, mmap: bool = True):
+    """load() of the live snapshot, or None if nothing was published yet."""
+    version = current_version(index_dir)
+    return load(version, index_dir, mmap) if version else None
+
+
+def load_static() -> Tuple[object, list]:
+    """The shipped index.faiss / meta.pkl (positional ids, list metadata)."""
+    index = faiss.read_index(STATIC_INDEX_PATH)
+    with open(STATIC_META_PATH, "rb") as f:
+        docs = pickle.load(f)
+    return index, docs
+
+
+def load_static_store() -> Tuple[object, DocStore]:
+    index, docs = load_static()
+    return index, DocStore.in_memory(dict(enumerate(docs)))
+
+
+def work_store(index_dir: str = INDEX_DIR) -> DocStore:
+    os.makedirs(os.path.join(index_dir, "work"), exist_ok=True)
+    return DocStore(os.path.join(index_dir, "work", "docs.sqlite"), writable=True)
+
+
+def publish(index, store: DocStore, state: dict, index_dir: str = INDEX_DIR) -> str:
+    """Write a snapshot of index + store and make it current. Returns its version."""
+    root = _snap_root(index_dir)
+    os.makedirs(root, exist_ok=True)
+    now_ns = time.time_ns()
+    version = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now_ns // 10**9)) + f"-{now_ns % 10**9:09d}"
+
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=root)
+    try:
+        faiss.write_index(index, os.path.join(tmp, "index.faiss"))
+        store.backup_to(os.path.join(tmp, "docs.sqlite"))
+        manifest = {
+            "version": version, "created": time.time(), "model": EMBED_MODEL,
+            "kind": ann.kind_of(index), "dim": index.d, "vectors": index.ntotal,
+            "docs": len(store), "state": state,
+        }
+        with open(os.path.join(tmp, "manifest.json"), "w") as f:
+            json.dump(manifest, f, default=str)
+        os.rename(tmp, os.path.join(root, version))
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    pointer = os.path.join(index_dir, f".CURRENT.{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer, os.path.join(index_dir, "CURRENT"))
+    prune(index_dir)
+    return version
+
+
+def prune(index_dir: str = INDEX_DIR, keep: int = KEEP):
+    root = _snap_root(index_dir)
+    live = current_version(index_dir)
+    versions = sorted(v for v in os.listdir(root) if not v.startswith("."))
+    for v in versions[:-keep] if keep > 0 else []:
+        if v != live:
+            shutil.rmtree(os.path.join(root, v), ignore_errors=True)
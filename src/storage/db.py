@@ -1,15 +1,22 @@
 import os
-from sqlalchemy import create_engine, Table, Column, Integer, Float, String, MetaData, DateTime, Text, select
+import time
+from sqlalchemy import Table, Column, Integer, Float, String, MetaData, DateTime, Text, Index, select, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql import func
 from datetime import datetime
+from itertools import islice
+
+from src.observability import metrics, readiness, tracing
+from src.storage.sqlite_profile import make_engines
 
 # Use DATABASE_URL env var if present, otherwise sqlite file in project root
 DB_URL = os.getenv("DATABASE_URL", "sqlite:///./crypto.db")
 
-# For sqlite we need check_same_thread=False; for other DBs it's harmless to omit
-connect_args = {"check_same_thread": False} if DB_URL.startswith("sqlite") else {}
-
-engine = create_engine(DB_URL, connect_args=connect_args, echo=False)
+# `engine` is the write engine. On a SQLite file it is a single WAL-mode
+# writer connection and `read_engine` a read-only pool (see sqlite_profile);
+# elsewhere both names refer to the same engine. Use read_engine for queries.
+engine, read_engine = make_engines(DB_URL)
 
 metadata = MetaData()
 
@@ -31,25 +38,192 @@ reddit_posts = Table(
     Column("created_utc", DateTime(timezone=True))
 )
 
-# create tables if they don't exist
-metadata.create_all(engine)
+# Indexes for the hot scans: per-symbol "latest N" reads, ts range scans
+# (aggregator) and post windows by created_utc. Existing databases get
+# them from `python -m src.storage.migrations`.
+Index("ix_tickers_symbol_ts", tickers.c.symbol, tickers.c.ts)
+Index("ix_tickers_ts", tickers.c.ts)
+Index("ix_reddit_posts_created_utc", reddit_posts.c.created_utc)
+
+# create tables if they don't exist: on first write / read through this
+# module (or the startup warm-up), not at import
+schema = readiness.component("db.schema", lambda: metadata.create_all(engine))
+
+
+def ensure_schema():
+    schema.get()
+
 
 def insert_ticker(symbol, price, volume=None, ts=None):
     ts = ts or datetime.utcnow()
+    ensure_schema()
     with engine.begin() as conn:
         conn.execute(
             tickers.insert().values(symbol=symbol, price=price, volume=volume, ts=ts)
         )
 
 def insert_reddit_post(post_id, subreddit, text, sentiment, created_utc):
+    ensure_schema()
     with engine.begin() as conn:
         conn.execute(
             reddit_posts.insert().values(id=post_id, subreddit=subreddit, text=text, sentiment=sentiment, created_utc=created_utc)
         )
 
+# ---------------------------------------------------
+# Bulk writes
+# ---------------------------------------------------
+BULK_CHUNK = 1000  # rows per INSERT statement / transaction
+
+DB_WRITE_SECONDS = metrics.histogram("db_write_seconds", "bulk_insert time per chunk", ["table"])
+DB_WRITE_ROWS = metrics.histogram("db_write_batch_rows", "Rows per bulk_insert chunk", ["table"],
+                                  buckets=metrics.SIZE_BUCKETS)
+DB_ROWS_WRITTEN = metrics.counter("db_rows_written_total", "Rows inserted or updated by bulk_insert", ["table"])
+
+
+def _chunks(rows, size):
+    it = iter(rows)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write_chunk(conn, table, chunk, on_conflict, conflict_cols, update_cols):
+    """Returns the number of rows inserted (or updated, for on_conflict="update")."""
+    dialect = conn.engine.dialect
+    if on_conflict is None:
+        if dialect.name == "postgresql":
+            from src.storage import postgres
+            if postgres.COPY_ENABLED:
+                return postgres.copy_rows(conn, table, chunk)
+        conn.execute(insert(table), chunk)
+        return len(chunk)
+
+    if dialect.name in ("sqlite", "postgresql"):
+        ins = (sqlite if dialect.name == "sqlite" else postgresql).insert(table)
+        if on_conflict == "update":
+            stmt = ins.on_conflict_do_update(
+                index_elements=conflict_cols,
+                set_={c: ins.excluded[c] for c in update_cols},
+            )
+        else:
+            stmt = ins.on_conflict_do_nothing(index_elements=conflict_cols)
+        if dialect.insert_executemany_returning:
+            # RETURNING yields exactly the rows written; executemany rowcount is not portable
+            return len(conn.execute(stmt.returning(*table.primary_key.columns), chunk).all())
+        return conn.execute(stmt, chunk).rowcount
+
+    # other dialects: try the chunk, fall back to row-by-row under savepoints
+    try:
+        with conn.begin_nested():
+            conn.execute(insert(table), chunk)
+        return len(chunk)
+    except IntegrityError:
+        written = 0
+        for row in chunk:
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(table), [row])
+                written += 1
+            except IntegrityError:
+                pass
+        return written
+
+
+def bulk_insert(
+    table,
+    rows,
+    on_conflict=None,
+    conflict_cols=None,
+    update_cols=None,
+    chunk_size=BULK_CHUNK,
+    conn=None,
+):
+    """
+    Insert an iterable of row dicts in chunks of `chunk_size`, one
+    executemany per chunk (COPY on Postgres for rows that cannot conflict).
+
+    on_conflict: None (plain insert, a duplicate raises), "nothing"
+    (duplicates on `conflict_cols` are skipped) or "update" (they are
+    overwritten with `update_cols`, default every non-key column).
+    `conflict_cols` defaults to the primary key. Rows repeating a key
+    within one chunk count as skipped.
+
+    With `conn` everything runs in the caller's transaction; otherwise
+    each chunk commits on its own. Returns {"inserted", "skipped"}; with
+    "update", rows that replaced an existing one count as inserted.
+    """
+    conflict_cols = list(conflict_cols or [c.name for c in table.primary_key.columns])
+    if on_conflict == "update" and update_cols is None:
+        update_cols = [c.name for c in table.columns if c.name not in conflict_cols]
+
+    def write(c, chunk):
+        if on_conflict is None:
+            return _write_chunk(c, table, chunk, None, conflict_cols, update_cols)
+        # rows without a key (autoincrement ids) cannot conflict: plain insert.
+        # One statement may not touch the same key twice (Postgres rejects it).
+        keyed, fresh = {}, []
+        for r in chunk:
+            key = tuple(r.get(col) for col in conflict_cols)
+            if None in key:
+                fresh.append(r)
+            else:
+                keyed[key] = r
+        n = _write_chunk(c, table, fresh, None, conflict_cols, update_cols) if fresh else 0
+        if keyed:
+            n += _write_chunk(c, table, list(keyed.values()), on_conflict, conflict_cols, update_cols)
+        return n
+
+    if conn is None:
+        # a caller passing `conn` may hold the only SQLite writer connection,
+        # which create_all would wait for; writers call ensure_schema() at startup
+        ensure_schema()
+    seconds, sizes, written = (m.labels(table.name) for m in (DB_WRITE_SECONDS, DB_WRITE_ROWS, DB_ROWS_WRITTEN))
+    inserted = skipped = 0
+    for chunk in _chunks(rows, chunk_size):
+        t0 = time.perf_counter()
+        if conn is not None:
+            n = write(conn, chunk)
+        else:
+            with engine.begin() as c:
+                n = write(c, chunk)
+        seconds.observe(time.perf_counter() - t0)
+        sizes.observe(len(chunk))
+        written.inc(n)
+        inserted += n
+        skipped += len(chunk) - n
+    return {"inserted": inserted, "skipped": skipped}
+
+
+def insert_tickers_bulk(rows, chunk_size=BULK_CHUNK, conn=None):
+    """
+    Insert ticker dicts (symbol, price, volume, ts). Rows that carry an
+    existing `id` are skipped. Returns {"inserted", "skipped"}.
+    """
+    rows = (r if r.get("ts") is not None else {**r, "ts": datetime.utcnow()} for r in rows)
+    return bulk_insert(tickers, rows, on_conflict="nothing", chunk_size=chunk_size, conn=conn)
+
+
+def upsert_reddit_posts_bulk(rows, update=False, chunk_size=BULK_CHUNK, conn=None):
+    """
+    Insert reddit_posts dicts (id, subreddit, text, sentiment, created_utc).
+    Posts already stored are skipped, or overwritten when `update` is set
+    (e.g. after re-scoring sentiment). Returns {"inserted", "skipped"}.
+    """
+    return bulk_insert(
+        reddit_posts, rows,
+        on_conflict="update" if update else "nothing",
+        chunk_size=chunk_size, conn=conn,
+    )
+
+
+@tracing.traced("get_recent_aggregates")
 def get_recent_aggregates(symbol="BTC-USD", limit=200):
+    ensure_schema()
     stmt = select(tickers).where(tickers.c.symbol == symbol).order_by(tickers.c.ts.desc()).limit(limit)
-    with engine.connect() as conn:
+    with tracing.span("sql"), read_engine.connect() as conn:
         res = conn.execute(stmt).all()
-    rows = [dict(r._mapping) for r in res][::-1]
+    with tracing.span("rows_to_dicts", rows=len(res)):
+        rows = [dict(r._mapping) for r in res][::-1]
     return rows
@@ -0,0 +1,79 @@
+"""
+Schema migrations for existing databases.
+
+metadata.create_all only creates indexes together with a brand-new table,
+so databases created before an index was added to the schema never get
+it. `ensure_indexes` creates every index declared on the managed tables
+that the database does not have yet, then refreshes planner statistics.
+Applying from the command line first creates any managed table that is
+missing (tables are no longer created at import).
+
+Run:
+python -m src.storage.migrations            # apply
+python -m src.storage.migrations --dry-run  # list what would be created
+"""
+
+import argparse
+import time
+from typing import List, Optional
+
+from sqlalchemy import Table, inspect, text
+
+from src.storage import db as dbmod
+
+
+def managed_tables() -> List[Table]:
+    """Tables whose indexes this module keeps in sync."""
+    from src.processing import aggregator as agg
+    from src.processing import rollups
+
+    return [dbmod.tickers, dbmod.reddit_posts, agg.aggregates] + [
+        rollups.TABLES[r] for r in rollups.RESOLUTIONS
+    ]
+
+
+def missing_indexes(eng=None, tables: Optional[List[Table]] = None):
+    eng = eng if eng is not None else dbmod.engine
+    insp = inspect(eng)
+    out = []
+    for table in tables if tables is not None else managed_tables():
+        if not insp.has_table(table.name):
+            continue  # create_all makes it, indexes included
+        existing = {ix["name"] for ix in insp.get_indexes(table.name)}
+        out.extend(ix for ix in sorted(table.indexes, key=lambda i: i.name) if ix.name not in existing)
+    return out
+
+
+def ensure_indexes(eng=None, tables: Optional[List[Table]] = None, analyze: bool = True) -> List[str]:
+    """Create missing managed indexes. Returns the names of the indexes created."""
+    eng = eng if eng is not None else dbmod.engine
+    todo = missing_indexes(eng, tables)
+    for ix in todo:
+        t0 = time.perf_counter()
+        with eng.begin() as conn:
+            ix.create(conn)
+        print(f"[migrations] created {ix.name} on {ix.table.name} ({time.perf_counter() - t0:.1f}s)")
+    if todo and analyze:
+        with eng.begin() as conn:
+            if eng.dialect.name == "sqlite":
+                conn.execute(text("ANALYZE"))
+            else:
+                for name in sorted({ix.table.name for ix in todo}):
+                    conn.execute(text(f"ANALYZE {name}"))
+    return [ix.name for ix in todo]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="apply index migrations")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    if args.dry_run:
+        for ix in missing_indexes():
+            print(f"{ix.table.name}: {ix.name} ({', '.join(c.name for c in ix.columns)})")
+    else:
+        from src.processing import rollups
+
+        rollups.ensure_schema()  # the managed tables themselves, on an empty database
+        created = ensure_indexes()
+        print(f"[migrations] {len(created)} index(es) created" if created else "[migrations] up to date")
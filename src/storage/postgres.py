@@ -0,0 +1,295 @@
+"""
+Postgres / TimescaleDB backend.
+
+- `copy_rows`: COPY ... FROM STDIN for plain bulk inserts; db.bulk_insert
+  uses it automatically on Postgres (PG_COPY=0 turns it off).
+- `enable_timescale`: turns `tickers` into a hypertable partitioned by ts
+  (existing rows are migrated). Unique keys on a hypertable must include
+  the time column, so the primary key becomes (id, ts).
+- `create_continuous_aggregate`: `tickers_1m`, a continuous aggregate with
+  1-minute OHLCV per symbol, refreshed by a Timescale policy, real-time
+  (the unmaterialized tail is computed on read).
+- `sync_aggregates` / `run_loop`: fill `aggregates` from `tickers_1m` with
+  one INSERT ... SELECT on the server, then add post sentiment (keyword
+  matching stays in Python). Selected with AGGREGATOR_MODE=timescale and
+  replaces shipping raw ticks to the Python aggregator.
+
+Pool size/overflow are set in sqlite_profile.make_engines (DB_POOL_*).
+
+Local test:
+docker run -d --name fingpt-pg -p 5432:5432 -e POSTGRES_PASSWORD=pg timescale/timescaledb:latest-pg16
+export DATABASE_URL=postgresql+psycopg2://postgres:pg@localhost:5432/postgres
+python -m src.storage.postgres setup --timescale --continuous-aggregate
+python scripts/pg_smoke.py --timescale
+
+Run:
+AGGREGATOR_MODE=timescale python -m src.processing.aggregator
+python -m src.storage.postgres sync --since 2024-01-01T00:00
+"""
+
+import argparse
+import csv
+import io
+import os
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import text
+
+from src.storage import db as dbmod
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+COPY_ENABLED = os.getenv("PG_COPY", "1") != "0"
+CHUNK_INTERVAL = os.getenv("TIMESCALE_CHUNK_INTERVAL", "1 day")
+CAGG_NAME = "tickers_1m"
+CAGG_START_OFFSET = "2 hours"      # refresh policy window
+CAGG_END_OFFSET = "1 minute"
+CAGG_SCHEDULE = "30 seconds"
+SYNC_LOOKBACK_MINUTES = 10         # bars re-synced (and re-scored) per cycle
+CYCLE_SECONDS = 30
+
+
+def is_postgres(eng=None) -> bool:
+    eng = eng if eng is not None else dbmod.engine
+    return eng.dialect.name == "postgresql"
+
+
+def _require_postgres(eng):
+    if not is_postgres(eng):
+        raise RuntimeError(f"needs a PostgreSQL DATABASE_URL, got {eng.dialect.name}")
+
+
+# ---------------------------------------------------
+# COPY ingestion
+# ---------------------------------------------------
+def _csv_value(v):
+    if isinstance(v, datetime) and v.tzinfo is None:
+        return v.replace(tzinfo=timezone.utc)  # naive timestamps are UTC in this codebase
+    return v
+
+
+def copy_rows(conn, table, rows) -> int:
+    """
+    Write `rows` (dicts with the same keys) with COPY FROM STDIN inside
+    `conn`'s transaction. Works with psycopg2 and psycopg 3.
+    """
+    if not rows:
+        return 0
+    cols = list(rows[0].keys())
+    buf = io.StringIO()
+    # non-numeric values are quoted, so "" is an empty string and an
+    # unquoted empty field (None) is NULL
+    w = csv.writer(buf, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n")
+    for r in rows:
+        w.writerow([_csv_value(r.get(c)) for c in cols])
+
+    q = conn.dialect.identifier_preparer.quote
+    sql = f"COPY {q(table.name)} ({', '.join(q(c) for c in cols)}) FROM STDIN WITH (FORMAT csv)"
+    cur = conn.connection.dbapi_connection.cursor()
+    try:
+        if hasattr(cur, "copy_expert"):        # psycopg2
+            buf.seek(0)
+            cur.copy_expert(sql, buf)
+        else:                                  # psycopg 3
+            with cur.copy(sql) as cp:
+                cp.write(buf.getvalue())
+    finally:
+        cur.close()
+    return len(rows)
+
+
+# ---------------------------------------------------
+# TimescaleDB schema
+# ---------------------------------------------------
+def enable_timescale(eng=None, chunk_interval: str = CHUNK_INTERVAL) -> bool:
+    """Make `tickers` a hypertable. Returns False if it already was one."""
+    eng = eng if eng is not None else dbmod.engine
+    _require_postgres(eng)
+    with eng.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS timescaledb"))
+        done = conn.execute(text(
+            "SELECT 1 FROM timescaledb_information.hypertables WHERE hypertable_name = 'tickers'"
+        )).first()
+        if done:
+            return False
+        pk = conn.execute(text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = 'tickers'::regclass AND contype = 'p'"
+        )).scalar()
+        if pk:
+            conn.execute(text(f'ALTER TABLE tickers DROP CONSTRAINT "{pk}"'))
+        conn.execute(text("ALTER TABLE tickers ALTER COLUMN ts SET NOT NULL"))
+        conn.execute(text("ALTER TABLE tickers ADD PRIMARY KEY (id, ts)"))
+        conn.execute(
+            text("SELECT create_hypertable('tickers', 'ts', "
+                 "chunk_time_interval => CAST(:chunk AS INTERVAL), migrate_data => true)"),
+            {"chunk": chunk_interval},
+        )
+    print(f"[postgres] tickers is now a hypertable (chunks of {chunk_interval})")
+    return True
+
+
+def create_continuous_aggregate(eng=None, policy: bool = True):
+    eng = eng if eng is not None else dbmod.engine
+    _require_postgres(eng)
+    # continuous aggregates cannot be created inside a transaction block
+    with eng.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"""
+            CREATE MATERIALIZED VIEW IF NOT EXISTS {CAGG_NAME}
+            WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+            SELECT time_bucket(INTERVAL '1 minute', ts) AS bucket,
+                   symbol,
+                   first(price, ts) AS open_price,
+                   last(price, ts)  AS close_price,
+                   max(price)       AS high_price,
+                   min(price)       AS low_price,
+                   sum(volume)      AS volume,
+                   count(*)         AS ticks
+            FROM tickers
+            GROUP BY 1, 2
+            WITH NO DATA
+        """))
+        if policy:
+            conn.execute(text(f"""
+                SELECT add_continuous_aggregate_policy('{CAGG_NAME}',
+                    start_offset => INTERVAL '{CAGG_START_OFFSET}',
+                    end_offset => INTERVAL '{CAGG_END_OFFSET}',
+                    schedule_interval => INTERVAL '{CAGG_SCHEDULE}',
+                    if_not_exists => true)
+            """))
+    print(f"[postgres] continuous aggregate {CAGG_NAME} ready (policy={'on' if policy else 'off'})")
+
+
+def refresh_continuous_aggregate(start: datetime, end: datetime, eng=None):
+    """Materialize [start, end) now, e.g. after a bulk historical load."""
+    eng = eng if eng is not None else dbmod.engine
+    with eng.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"CALL refresh_continuous_aggregate('{CAGG_NAME}', :s, :e)"),
+                      {"s": start, "e": end})
+
+
+# ---------------------------------------------------
+# aggregates from the continuous aggregate
+# ---------------------------------------------------
+_SYNC_SQL = f"""
+INSERT INTO aggregates (ts, symbol, open_price, close_price, high_price, low_price,
+                        volume, price_change_pct, post_count)
+SELECT bucket, symbol, open_price, close_price, high_price, low_price, volume,
+       CASE WHEN open_price <> 0 THEN (close_price - open_price) / open_price * 100 ELSE 0 END,
+       0
+FROM {CAGG_NAME}
+WHERE bucket >= :since
+ON CONFLICT (ts, symbol) DO UPDATE SET
+    open_price = EXCLUDED.open_price,
+    close_price = EXCLUDED.close_price,
+    high_price = EXCLUDED.high_price,
+    low_price = EXCLUDED.low_price,
+    volume = EXCLUDED.volume,
+    price_change_pct = EXCLUDED.price_change_pct
+RETURNING ts, symbol
+"""
+
+_SENTIMENT_SQL = """
+UPDATE aggregates
+SET avg_sentiment = :avg_sentiment, sentiment_strength = :sentiment_strength, post_count = :post_count
+WHERE ts = :ts AND symbol = :symbol
+"""
+
+
+def sync_aggregates(since: Optional[datetime] = None) -> int:
+    """
+    Upsert 1-minute bars at or after `since` (default: latest tick minus
+    SYNC_LOOKBACK_MINUTES) from the continuous aggregate, then set their
+    sentiment with the same rule as aggregate_minute. Returns bars written.
+    """
+    from src.processing import aggregator as agg
+
+    _require_postgres(dbmod.engine)
+    if since is None:
+        latest = agg.get_latest_ticker_time()
+        if latest is None:
+            return 0
+        since = agg.floor_to_minute(latest) - timedelta(minutes=SYNC_LOOKBACK_MINUTES)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+
+    with dbmod.engine.begin() as conn:
+        keys = conn.execute(text(_SYNC_SQL), {"since": since}).all()
+        by_minute = {}
+        for ts, sym in keys:
+            by_minute.setdefault(ts, []).append(sym)
+
+        updates = []
+        for minute, symbols in sorted(by_minute.items()):
+            df_posts = agg._fetch_posts_window(conn, minute, minute + timedelta(minutes=1))
+            per_symbol, fallback = agg.posts_sentiment(df_posts)
+            for sym in symbols:
+                avg, strength, n = per_symbol.get(sym, fallback)
+                updates.append({"ts": minute, "symbol": sym, "avg_sentiment": avg,
+                                "sentiment_strength": strength, "post_count": n})
+        if updates:
+            conn.execute(text(_SENTIMENT_SQL), updates)
+    return len(keys)
+
+
+def run_loop(cycle_seconds: float = CYCLE_SECONDS):
+    from src.observability import metrics, tracing
+    from src.processing import aggregator as agg
+    from src.processing import rollups
+
+    agg.ensure_schema()
+    metrics.serve_from_env()
+    print("Timescale aggregator running...")
+    while True:
+        t0 = time.perf_counter()
+        try:
+            with tracing.span("timescale.cycle"):
+                with tracing.span("sync_aggregates"):
+                    n = sync_aggregates()
+                with tracing.span("rollups"):
+                    rolled = rollups.update_rollups() if n else {}
+            agg.BARS_WRITTEN.labels("timescale").inc(n)
+            agg.CYCLE_SECONDS.labels("timescale").observe(time.perf_counter() - t0)
+            print(f"[postgres] synced {n} bars from {CAGG_NAME} in "
+                  f"{(time.perf_counter() - t0) * 1000:.0f} ms rollups={rolled}")
+        except Exception:
+            traceback.print_exc()
+        time.sleep(cycle_seconds)
+
+
+def _parse_dt(s: str) -> datetime:
+    return datetime.fromisoformat(s.replace("Z", "+00:00"))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Postgres / TimescaleDB setup and sync")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("setup", help="create schema and indexes; optionally Timescale objects")
+    s.add_argument("--timescale", action="store_true", help="make tickers a hypertable")
+    s.add_argument("--continuous-aggregate", action="store_true",
+                   help=f"create the {CAGG_NAME} continuous aggregate (implies --timescale)")
+    y = sub.add_parser("sync", help="one aggregates sync from the continuous aggregate")
+    y.add_argument("--since", type=_parse_dt, default=None)
+    sub.add_parser("run", help="sync loop (same as AGGREGATOR_MODE=timescale)")
+    args = ap.parse_args()
+
+    if args.cmd == "setup":
+        from src.processing import rollups
+        from src.storage import migrations
+
+        _require_postgres(dbmod.engine)
+        rollups.ensure_schema()  # rollup tables, and through it aggregates and tickers / reddit_posts
+        print("[postgres] indexes created:", migrations.ensure_indexes())
+        if args.timescale or args.continuous_aggregate:
+            enable_timescale()
+        if args.continuous_aggregate:
+            create_continuous_aggregate()
+    elif args.cmd == "sync":
+        if args.since is not None:
+            refresh_continuous_aggregate(args.since, datetime.now(timezone.utc))
+        print(f"[postgres] synced {sync_aggregates(args.since)} bars")
+    else:
+        run_loop()
@@ -0,0 +1,136 @@
+"""
+SQLite production profile.
+
+Several processes (websocket ingestion, aggregator, Reddit poller, API,
+Streamlit) share one database file. With the default rollback journal a
+writer blocks every reader and concurrent writers fail with "database is
+locked". The profile:
+
+- sets WAL journaling, synchronous=NORMAL, mmap_size, cache_size and
+  busy_timeout on every new connection (connect-event hook);
+- gives the process ONE writer connection (pool of size 1) whose
+  transactions start with BEGIN IMMEDIATE, so in-process writers queue on
+  the pool instead of racing for the file lock, and cross-process writers
+  wait up to busy_timeout instead of failing on a lock upgrade;
+- gives readers a separate pool of read-only (mode=ro, query_only)
+  connections, which under WAL never block on the writer.
+
+Server databases (Postgres) get one engine for both, with a tuned
+QueuePool (size/overflow/timeout/recycle, pre-ping). In-memory SQLite
+gets a plain engine.
+
+Env:
+SQLITE_PROFILE=wal|off   (default wal)
+SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_KB, SQLITE_MMAP_BYTES, SQLITE_READ_POOL
+DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE   (server DBs)
+"""
+
+import os
+from typing import Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+PROFILE = os.getenv("SQLITE_PROFILE", "wal").lower()
+BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "65536"))               # 64 MB page cache
+MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+READ_POOL = int(os.getenv("SQLITE_READ_POOL", "8"))
+WRITER_POOL_TIMEOUT = 60  # seconds a thread waits for the writer connection
+
+# server databases
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+
+
+def is_file_sqlite(url: str) -> bool:
+    u = make_url(url)
+    return u.get_backend_name() == "sqlite" and u.database not in (None, "", ":memory:")
+
+
+def _pragmas(readonly: bool):
+    p = [
+        f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+        f"PRAGMA cache_size=-{CACHE_KB}",
+        f"PRAGMA mmap_size={MMAP_BYTES}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if readonly:
+        p.append("PRAGMA query_only=ON")
+    else:
+        # journal_mode is persistent in the file; synchronous is per connection
+        p = ["PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"] + p
+    return p
+
+
+def apply_profile(engine: Engine, readonly: bool = False) -> Engine:
+    """Install the pragma hooks on `engine` (and BEGIN IMMEDIATE for writers)."""
+    pragmas = _pragmas(readonly)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        # let SQLAlchemy emit BEGIN itself (pysqlite otherwise defers it)
+        dbapi_conn.isolation_level = None
+        cur = dbapi_conn.cursor()
+        for p in pragmas:
+            cur.execute(p)
+        cur.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN" if readonly else "BEGIN IMMEDIATE")
+
+    return engine
+
+
+def make_engines(url: str, profile: Optional[str] = None) -> Tuple[Engine, Engine]:
+    """
+    (write_engine, read_engine) for `url`. With the "wal" profile on a file
+    SQLite database these are a single-connection writer and a read-only
+    pool; otherwise both are the same engine.
+    """
+    profile = (profile or PROFILE).lower()
+    sqlite = url.startswith("sqlite")
+    connect_args = {"check_same_thread": False} if sqlite else {}
+
+    if not sqlite:
+        engine = create_engine(
+            url,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+            pool_pre_ping=True,
+            echo=False,
+        )
+        return engine, engine
+
+    if not (profile == "wal" and is_file_sqlite(url)):
+        engine = create_engine(url, connect_args=connect_args, echo=False)
+        return engine, engine
+
+    writer = create_engine(
+        url,
+        connect_args=connect_args,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=WRITER_POOL_TIMEOUT,
+        echo=False,
+    )
+    apply_profile(writer)
+
+    path = os.path.abspath(make_url(url).database)
+    reader = create_engine(
+        f"sqlite:///file:{path}?mode=ro&uri=true",
+        connect_args=connect_args,
+        pool_size=READ_POOL,
+        max_overflow=READ_POOL,
+        echo=False,
+    )
+    apply_profile(reader, readonly=True)
+    return writer, reader
@@ -0,0 +1,305 @@
+"""
+Tiered tick storage: recent ticks in the `tickers` table, older ticks in
+Parquet files, one per (UTC day, symbol).
+
+`compact()` moves every complete day older than the retention window out
+of the database: each day's ticks are written per symbol to
+    <TICK_ARCHIVE_DIR>/date=YYYY-MM-DD/symbol=<SYMBOL>/ticks.parquet
+(merged with an existing file, deduplicated on tick id), recorded in the
+`tick_partitions` manifest with row count and min/max ts/price, and only
+then deleted from `tickers`. A crash between the two steps leaves
+duplicates, never gaps; the next run merges them away.
+
+`read_ticks()` answers a time range from both tiers: the manifest prunes
+archive files by symbol and min/max ts, the remainder comes from the DB.
+
+Env:
+TICK_RETENTION_DAYS           (default 7) days of raw ticks kept in the DB
+TICK_ARCHIVE_DIR              (default ./data/ticks)
+
+Run:
+python -m src.storage.tick_archive compact [--retention-days 7] [--dry-run]
+python -m src.storage.tick_archive info
+python -m src.storage.tick_archive query --from 2024-01-01 --to 2024-01-02 --symbols BTC-USD
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Table, Column, String, DateTime, Integer, Float, select, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.observability import readiness
+from src.storage import db as dbmod
+
+# ---------------------------------------------------
+# Config
+# ---------------------------------------------------
+RETENTION_DAYS = int(os.getenv("TICK_RETENTION_DAYS", "7"))
+ARCHIVE_DIR = os.getenv("TICK_ARCHIVE_DIR", os.path.join(".", "data", "ticks"))
+
+TICK_COLUMNS = ["id", "symbol", "price", "volume", "ts"]
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("symbol", pa.string()),
+    ("price", pa.float64()),
+    ("volume", pa.float64()),
+    ("ts", pa.timestamp("us", tz="UTC")),
+])
+
+tick_partitions = Table(
+    "tick_partitions", dbmod.metadata,
+    Column("day", String, primary_key=True),        # YYYY-MM-DD (UTC)
+    Column("symbol", String, primary_key=True),
+    Column("path", String),                         # relative to ARCHIVE_DIR
+    Column("rows", Integer),
+    Column("min_ts", DateTime(timezone=True)),
+    Column("max_ts", DateTime(timezone=True)),
+    Column("min_price", Float),
+    Column("max_price", Float),
+    Column("compacted_at", DateTime(timezone=True)),
+)
+
+
+def _create_tables():
+    dbmod.ensure_schema()
+    dbmod.metadata.create_all(dbmod.engine, tables=[tick_partitions])
+
+
+schema = readiness.component("db.tick_archive", _create_tables)
+
+
+def ensure_schema():
+    schema.get()
+
+
+def _db_ts(dt: datetime) -> datetime:
+    """Naive UTC for SQLite, aware UTC elsewhere."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    if dbmod.engine.dialect.name != "sqlite":
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _naive_utc(s: pd.Series) -> pd.Series:
+    # Parquet gives datetime64[us]; keep ns like values read from the DB
+    return pd.to_datetime(s, utc=True).dt.tz_convert(None).astype("datetime64[ns]")
+
+
+def partition_path(day: str, symbol: str) -> str:
+    return os.path.join(f"date={day}", f"symbol={symbol}", "ticks.parquet")
+
+
+# ---------------------------------------------------
+# Compaction
+# ---------------------------------------------------
+def _write_partition(day: str, symbol: str, df: pd.DataFrame) -> dict:
+    rel = partition_path(day, symbol)
+    path = os.path.join(ARCHIVE_DIR, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        old = pq.read_table(path).to_pandas()
+        old["ts"] = _naive_utc(old["ts"])
+        df = pd.concat([old, df], ignore_index=True).drop_duplicates("id", keep="last")
+    df = df.sort_values(["ts", "id"], kind="stable").reset_index(drop=True)
+
+    table = pa.Table.from_pandas(
+        df.assign(ts=df["ts"].dt.tz_localize("UTC"))[TICK_COLUMNS],
+        schema=SCHEMA, preserve_index=False,
+    )
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp, compression="zstd", write_statistics=True)
+    os.replace(tmp, path)  # readers never see a half-written file
+    return {
+        "day": day,
+        "symbol": symbol,
+        "path": rel,
+        "rows": len(df),
+        "min_ts": _db_ts(df["ts"].iloc[0].to_pydatetime()),
+        "max_ts": _db_ts(df["ts"].iloc[-1].to_pydatetime()),
+        "min_price": float(df["price"].min()),
+        "max_price": float(df["price"].max()),
+        "compacted_at": datetime.now(timezone.utc),
+    }
+
+
+def _upsert_manifest(conn, rows: List[dict]):
+    dialect = conn.engine.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        ins = (sqlite if dialect == "sqlite" else postgresql).insert(tick_partitions)
+        conn.execute(
+            ins.on_conflict_do_update(
+                index_elements=["day", "symbol"],
+                set_={c: ins.excluded[c] for c in ("path", "rows", "min_ts", "max_ts",
+                                                   "min_price", "max_price", "compacted_at")},
+            ),
+            rows,
+        )
+    else:
+        for r in rows:
+            conn.execute(delete(tick_partitions).where(
+                tick_partitions.c.day == r["day"], tick_partitions.c.symbol == r["symbol"]))
+        conn.execute(tick_partitions.insert(), rows)
+
+
+def compact(retention_days: Optional[int] = None, dry_run: bool = False) -> dict:
+    """Archive and delete every complete UTC day older than the retention window."""
+    ensure_schema()
+    retention_days = RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).replace(
+        hour=0, minute=0, second=0, microsecond=0)
+    t = dbmod.tickers
+
+    with dbmod.read_engine.connect() as conn:
+        oldest = conn.execute(select(func.min(t.c.ts))).scalar()
+    if oldest is None:
+        return {"days": 0, "partitions": 0, "rows": 0}
+    if oldest.tzinfo is None:
+        oldest = oldest.replace(tzinfo=timezone.utc)
+    day = oldest.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    days = partitions = moved = 0
+    t0 = time.perf_counter()
+    while day < cutoff:
+        start, end = _db_ts(day), _db_ts(day + timedelta(days=1))
+        with dbmod.read_engine.connect() as conn:
+            res = conn.execute(
+                select(t.c.id, t.c.symbol, t.c.price, t.c.volume, t.c.ts)
+                .where(t.c.ts >= start, t.c.ts < end)
+            ).all()
+        df = pd.DataFrame(res, columns=TICK_COLUMNS)
+        label = day.strftime("%Y-%m-%d")
+        if not df.empty:
+            if dry_run:
+                print(f"[tick_archive] would archive {label}: {len(df)} ticks, "
+                      f"{df['symbol'].nunique()} symbols")
+            else:
+                df["ts"] = _naive_utc(df["ts"])
+                df["volume"] = pd.to_numeric(df["volume"], errors="coerce")
+                manifest = [_write_partition(label, sym, g) for sym, g in df.groupby("symbol", sort=True)]
+                max_id = int(df["id"].max())
+                with dbmod.engine.begin() as conn:
+                    _upsert_manifest(conn, manifest)
+                    # only rows we read; ticks inserted meanwhile wait for the next run
+                    conn.execute(delete(t).where(t.c.ts >= start, t.c.ts < end, t.c.id <= max_id))
+                print(f"[tick_archive] archived {label}: {len(df)} ticks in {len(manifest)} partitions")
+                partitions += len(manifest)
+            moved += len(df)
+            days += 1
+        day += timedelta(days=1)
+
+    return {"days": days, "partitions": partitions, "rows": moved,
+            "elapsed_s": round(time.perf_counter() - t0, 2), "dry_run": dry_run}
+
+
+# ---------------------------------------------------
+# Reading across tiers
+# ---------------------------------------------------
+def _archived(start: datetime, end: datetime, symbols, columns) -> pd.DataFrame:
+    ensure_schema()
+    p = tick_partitions
+    q = select(p.c.path).where(p.c.min_ts < _db_ts(end), p.c.max_ts >= _db_ts(start))
+    if symbols:
+        q = q.where(p.c.symbol.in_(symbols))
+    with dbmod.read_engine.connect() as conn:
+        paths = [r[0] for r in conn.execute(q.order_by(p.c.day, p.c.symbol)).all()]
+
+    lo = pd.Timestamp(start).tz_localize("UTC") if start.tzinfo is None else pd.Timestamp(start)
+    hi = pd.Timestamp(end).tz_localize("UTC") if end.tzinfo is None else pd.Timestamp(end)
+    filters = [("ts", ">=", lo), ("ts", "<", hi)]
+    need = list(dict.fromkeys(columns + ["id", "ts"]))
+    frames = []
+    for rel in paths:
+        path = os.path.join(ARCHIVE_DIR, rel)
+        if os.path.exists(path):
+            frames.append(pq.read_table(path, columns=need, filters=filters).to_pandas())
+    if not frames:
+        return pd.DataFrame(columns=need)
+    df = pd.concat(frames, ignore_index=True)
+    df["ts"] = _naive_utc(df["ts"])
+    return df
+
+
+def read_ticks(
+    start: datetime,
+    end: datetime,
+    symbols: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Ticks with start <= ts < end from the archive and the live table,
+    sorted by (ts, id), ts as naive UTC. `columns` defaults to all.
+    """
+    columns = list(columns or TICK_COLUMNS)
+    need = list(dict.fromkeys(columns + ["id", "ts"]))
+    t = dbmod.tickers
+    q = select(*[t.c[c] for c in need]).where(t.c.ts >= _db_ts(start), t.c.ts < _db_ts(end))
+    if symbols:
+        q = q.where(t.c.symbol.in_(symbols))
+    with dbmod.read_engine.connect() as conn:
+        live = pd.DataFrame(conn.execute(q).all(), columns=need)
+    if not live.empty:
+        live["ts"] = _naive_utc(live["ts"])
+
+    archived = _archived(start, end, symbols, columns)
+    parts = [d for d in (archived, live) if not d.empty]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    # a row can be in both tiers if compaction stopped between write and delete
+    df = df.drop_duplicates("id", keep="last").sort_values(["ts", "id"], kind="stable")
+    return df[columns].reset_index(drop=True)
+
+
+def info() -> dict:
+    ensure_schema()
+    p = tick_partitions
+    with dbmod.read_engine.connect() as conn:
+        live_rows, live_min, live_max = conn.execute(
+            select(func.count(), func.min(dbmod.tickers.c.ts), func.max(dbmod.tickers.c.ts))
+        ).one()
+        n_parts, arch_rows, arch_min, arch_max = conn.execute(
+            select(func.count(), func.sum(p.c.rows), func.min(p.c.min_ts), func.max(p.c.max_ts))
+        ).one()
+    return {
+        "live": {"rows": live_rows, "min_ts": live_min, "max_ts": live_max},
+        "archive": {"dir": os.path.abspath(ARCHIVE_DIR), "partitions": n_parts,
+                    "rows": arch_rows or 0, "min_ts": arch_min, "max_ts": arch_max},
+        "retention_days": RETENTION_DAYS,
+    }
+
+
+def _parse_dt(s: str) -> datetime:
+    return datetime.fromisoformat(s.replace("Z", "+00:00"))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="tiered tick storage")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("compact", help="archive days older than the retention window")
+    c.add_argument("--retention-days", type=int, default=None)
+    c.add_argument("--dry-run", action="store_true")
+    sub.add_parser("info", help="row counts and time span per tier")
+    q = sub.add_parser("query", help="read a range across both tiers")
+    q.add_argument("--from", dest="start", required=True, type=_parse_dt)
+    q.add_argument("--to", dest="end", required=True, type=_parse_dt)
+    q.add_argument("--symbols", default=None, help="comma-separated, default all")
+    args = ap.parse_args()
+
+    if args.cmd == "compact":
+        print(compact(args.retention_days, args.dry_run))
+    elif args.cmd == "info":
+        print(info())
+    else:
+        syms = [s for s in args.symbols.split(",") if s] if args.symbols else None
+        t0 = time.perf_counter()
+        df = read_ticks(args.start, args.end, syms)
+        print(df)
+        print(f"{len(df)} ticks in {time.perf_counter() - t0:.2f}s")